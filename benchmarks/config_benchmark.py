@@ -0,0 +1,123 @@
+"""
+Counts how many times config.json is read and written per user action, before and after the in-memory config store.
+
+Run from the repository root with `python benchmarks/config_benchmark.py`.
+
+-----------
+
+Classes list:
+
+- LegacyConfig.__init__(self, path: Path)
+
+-----------
+
+Functions list:
+
+- startup(save_key: Callable, load_key: Callable) -> None
+- open_project(save_key: Callable, load_key: Callable, path: Path) -> None
+- show_error(save_key: Callable, load_key: Callable) -> None
+- main() -> None
+
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import json
+import tempfile
+from typing import Any, Callable
+from project_tools.config_store import ConfigStore
+
+
+class LegacyConfig:
+    """
+    The old GUI.save_key and GUI.load_key, which parse (and rewrite) the whole file on every call.
+    """
+    def __init__(self, path: Path):
+        self.path = path
+        self.reads = 0
+        self.writes = 0
+
+    def save_key(self, key: str, value: Any) -> None:
+        if not self.path.exists():
+            self.path.write_text("{}")
+            self.writes += 1
+        try:
+            old_json = json.loads(self.path.read_text())
+        except json.decoder.JSONDecodeError:
+            old_json = {}
+        self.reads += 1
+        old_json[key] = value
+        self.path.write_text(json.dumps(old_json, sort_keys=True, indent=4))
+        self.writes += 1
+
+    def load_key(self, key: str) -> Any:
+        if not self.path.exists():
+            self.path.write_text("{}")
+            self.writes += 1
+        self.reads += 1
+        try:
+            return json.loads(self.path.read_text())[key]
+        except (json.decoder.JSONDecodeError, KeyError):
+            return None
+
+
+def startup(save_key: Callable, load_key: Callable) -> None:
+    """
+    What GUI.create_config does.
+    """
+    if not load_key("show_traceback_in_error_messages"):
+        save_key("show_traceback_in_error_messages", False)
+    if not load_key("unix_drive_mount_point"):
+        save_key("unix_drive_mount_point", "/media")
+
+
+def open_project(save_key: Callable, load_key: Callable, path: Path) -> None:
+    """
+    What GUI.add_recent_project does, plus the drive refresh that happens when the project is shown.
+    """
+    save_key("last_dir_opened", str(path.parent.parent))
+    recent_projects = load_key("opened_recent") or []
+    if str(path) in recent_projects:
+        recent_projects.remove(str(path))
+    recent_projects.insert(0, str(path))
+    save_key("opened_recent", recent_projects[:10])
+    load_key("opened_recent")
+    load_key("unix_drive_mount_point")
+
+
+def show_error(save_key: Callable, load_key: Callable) -> None:
+    """
+    What every error dialog does through GUI.show_traceback.
+    """
+    load_key("show_traceback_in_error_messages")
+
+
+def main() -> None:
+    actions = [
+        ("startup", lambda s, l: startup(s, l)),
+        ("open project", lambda s, l: open_project(s, l, Path("/projects/blink/.cpypmconfig"))),
+        ("open another project", lambda s, l: open_project(s, l, Path("/projects/neopixel/.cpypmconfig"))),
+        ("show an error", lambda s, l: show_error(s, l)),
+    ]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        legacy = LegacyConfig(Path(temp_dir) / "legacy.json")
+        store = ConfigStore(Path(temp_dir) / "store.json", write_delay=60)
+        print(f"{'Action':<24}{'Before (R/W)':>16}{'After (R/W)':>16}")
+        for name, action in actions:
+            legacy_reads, legacy_writes = legacy.reads, legacy.writes
+            action(legacy.save_key, legacy.load_key)
+            store_reads, store_writes = store.reads, store.writes
+            action(store.set, store.get)
+            # The write-behind timer batches everything from a single action into one write
+            store.flush()
+            print(f"{name:<24}"
+                  f"{f'{legacy.reads - legacy_reads}/{legacy.writes - legacy_writes}':>16}"
+                  f"{f'{store.reads - store_reads}/{store.writes - store_writes}':>16}")
+        print(f"{'Total':<24}{f'{legacy.reads}/{legacy.writes}':>16}{f'{store.reads}/{store.writes}':>16}")
+
+
+if __name__ == "__main__":
+    main()
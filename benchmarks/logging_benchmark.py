@@ -0,0 +1,130 @@
+"""
+Measures how long the logging thread spends inside logging calls with the old synchronous handlers and with the
+shared queue-based pipeline from create_logger.
+
+Run from the repository root with `python benchmarks/logging_benchmark.py 2>/dev/null` (the console handler writes to
+stderr in both setups).
+
+-----------
+
+Classes list:
+
+No classes!
+
+-----------
+
+Functions list:
+
+- legacy_handlers(log_path: Path) -> list[logging.Handler]
+- make_project(parent: Path, file_count: int) -> Path
+- time_records(logger: logging.Logger, count: int) -> float
+- time_sync(cpypm_config_path: Path) -> float
+- main() -> None
+
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import logging
+import shutil
+import tempfile
+from time import perf_counter, sleep
+from project_tools import create_logger as create_logger_module
+from project_tools import project
+from project_tools.project_config import ProjectConfig
+
+RECORDS = 20000
+FILES = 500
+
+
+def legacy_handlers(log_path: Path) -> list[logging.Handler]:
+    """
+    The handlers create_logger used to attach to every logger - formatted and written in the calling thread.
+    """
+    formatter = logging.Formatter(create_logger_module.LOG_FORMAT)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(fmt=formatter)
+    file_handler = logging.FileHandler(filename=log_path)
+    file_handler.setFormatter(fmt=formatter)
+    return [console_handler, file_handler]
+
+
+def make_project(parent: Path, file_count: int) -> Path:
+    """
+    Make a project with a lot of small library files and a device to sync it to.
+    """
+    cpypm_config_path = project.make_new_project(parent, "Benchmark")
+    lib = cpypm_config_path.parent / "lib"
+    for index in range(file_count):
+        (lib / f"module_{index}.py").write_text("print('hello')\n" * 20)
+    device = parent / "device"
+    device.mkdir()
+    ProjectConfig.load(cpypm_config_path).replace(sync_location=device).save(cpypm_config_path)
+    return cpypm_config_path
+
+
+def time_records(logger: logging.Logger, count: int) -> float:
+    """
+    Log like the download loop does - a couple of DEBUG records per chunk.
+    """
+    start = perf_counter()
+    for index in range(count):
+        logger.debug("Length of data currently is %d", index * 1024)
+    return perf_counter() - start
+
+
+def time_sync(cpypm_config_path: Path) -> float:
+    """
+    Sync the project to an empty device.
+    """
+    # Start from an empty device every time so every run copies the same amount
+    device = ProjectConfig.load(cpypm_config_path).sync_location
+    shutil.rmtree(device)
+    device.mkdir()
+    start = perf_counter()
+    project.sync_project(cpypm_config_path, record_history=False)
+    return perf_counter() - start
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        cpypm_config_path = make_project(temp_dir, FILES)
+        loggers = [logging.getLogger(name) for name in ("project_tools.project", "project_tools.project_model",
+                                                        "project_tools.project_config")]
+        queue_handlers = [list(logger.handlers) for logger in loggers]
+        bench_logger = create_logger_module.create_logger("benchmark")
+
+        results = {}
+        time_sync(cpypm_config_path)
+        for setup in ("synchronous", "queue", "queue, DEBUG off"):
+            if setup == "synchronous":
+                handlers = legacy_handlers(temp_dir / "legacy.log")
+                for logger in loggers + [bench_logger]:
+                    logger.handlers = list(handlers)
+            else:
+                for logger, original in zip(loggers, queue_handlers):
+                    logger.handlers = original
+                bench_logger.handlers = list(queue_handlers[0])
+            for logger in loggers + [bench_logger]:
+                logger.setLevel(logging.INFO if setup == "queue, DEBUG off" else logging.DEBUG)
+            records = time_records(bench_logger, RECORDS)
+            # Let the listener catch up so it doesn't compete with the sync for the GIL
+            while not create_logger_module._queue.empty():
+                sleep(0.001)
+            results[setup] = (records, time_sync(cpypm_config_path))
+            if setup == "synchronous":
+                for handler in handlers:
+                    handler.close()
+        create_logger_module.flush_logs()
+
+    print(f"{'Setup':<18}{f'{RECORDS} DEBUG records':>22}{f'Sync of {FILES} files':>22}")
+    for setup, (records, sync) in results.items():
+        print(f"{setup:<18}{records * 1000:>19.1f} ms{sync * 1000:>19.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
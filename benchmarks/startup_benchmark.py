@@ -0,0 +1,149 @@
+"""
+Measures startup - how long the command line interface takes to run, how long importing the GUI takes (with
+-X importtime) and how long main.py takes to show its first window - and fails (exit code 1) if any of them goes over
+its budget, if the command line interface imports GUI modules or if the GUI imports something that should wait until
+it is used.
+
+Run from the repository root with `python benchmarks/startup_benchmark.py`. The first window is only timed when there
+is a display.
+
+-----------
+
+Classes list:
+
+No classes!
+
+-----------
+
+Functions list:
+
+- time_command(args: list[str], runs: int) -> float
+- imported_modules(args: list[str]) -> dict[str, int]
+- time_first_window() -> Optional[tuple[float, float]]
+- print_slowest(modules: dict[str, int], count: int = 10) -> None
+- main() -> int
+
+"""
+
+import sys
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+import os
+import re
+import statistics
+import subprocess
+import tempfile
+from time import perf_counter
+from typing import Optional
+
+RUNS = 10
+# Median wall time of `python cli.py drives`, including starting the interpreter
+CLI_BUDGET_SECONDS = 0.3
+# Cumulative -X importtime of the gui module
+GUI_IMPORT_BUDGET_SECONDS = 0.3
+# From the top of main.py to the first window being drawn
+FIRST_WINDOW_BUDGET_SECONDS = 1.0
+# Modules the command line interface must never load
+GUI_MODULES = ("tkinter", "gui", "gui_tools", "markdown", "pymdownx", "requests")
+# Modules the GUI only needs once a README is opened or a file is downloaded
+DEFERRED_MODULES = ("markdown", "pymdownx", "requests", "webbrowser")
+
+
+def time_command(args: list[str], runs: int) -> float:
+    """
+    The median wall time of running a Python command, in seconds.
+    """
+    times = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for _ in range(runs):
+            start = perf_counter()
+            subprocess.run([sys.executable] + args, cwd=temp_dir, stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL, check=True)
+            times.append(perf_counter() - start)
+    return statistics.median(times)
+
+
+def imported_modules(args: list[str]) -> dict[str, int]:
+    """
+    Every module a Python command imports, with its cumulative import time in microseconds, from -X importtime.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        result = subprocess.run([sys.executable, "-X", "importtime"] + args, cwd=temp_dir, capture_output=True,
+                                text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)", line)
+        if match is not None:
+            modules[match.group(3)] = int(match.group(1))
+    return modules
+
+
+def time_first_window() -> Optional[tuple[float, float]]:
+    """
+    Run main.py until its first window is drawn.
+
+    :return: A tuple of (seconds main.py reports from its first line to the first window, wall seconds including the
+     interpreter starting and shutting down), or None if there is no display.
+    """
+    if sys.platform.startswith("linux") and not os.environ.get("DISPLAY"):
+        return None
+    with tempfile.TemporaryDirectory() as temp_dir:
+        start = perf_counter()
+        result = subprocess.run([sys.executable, str(REPO / "main.py"), "--startup-benchmark"], cwd=temp_dir,
+                                capture_output=True, text=True, check=True)
+        wall = perf_counter() - start
+    match = re.search(r"First window after ([\d.]+) ms", result.stdout)
+    return float(match.group(1)) / 1000, wall
+
+
+def print_slowest(modules: dict[str, int], count: int = 10) -> None:
+    for name, microseconds in sorted(modules.items(), key=lambda item: item[1], reverse=True)[:count]:
+        print(f"  {microseconds / 1000:8.1f} ms  {name}")
+
+
+def main() -> int:
+    failed = []
+    bare = time_command(["-c", "pass"], RUNS)
+    print(f"Interpreter alone:   {bare * 1000:8.1f} ms")
+
+    cli = [str(REPO / "cli.py"), "drives", "--mount-point", str(REPO / "benchmarks")]
+    modules = imported_modules(cli)
+    seconds = time_command(cli, RUNS)
+    print(f"cli.py drives:       {seconds * 1000:8.1f} ms (budget {CLI_BUDGET_SECONDS * 1000:.0f} ms)")
+    print_slowest(modules)
+    gui_modules = sorted(name for name in modules if name.split(".")[0] in GUI_MODULES)
+    if gui_modules:
+        failed.append(f"cli.py imported GUI modules: {', '.join(gui_modules)}")
+    if seconds > CLI_BUDGET_SECONDS:
+        failed.append("cli.py startup is over budget")
+
+    modules = imported_modules(["-c", f"import sys; sys.path.insert(0, {repr(str(REPO))}); import gui"])
+    seconds = modules.get("gui", 0) / 1000 ** 2
+    print(f"import gui:          {seconds * 1000:8.1f} ms (budget {GUI_IMPORT_BUDGET_SECONDS * 1000:.0f} ms)")
+    print_slowest(modules)
+    deferred = sorted(name for name in modules if name.split(".")[0] in DEFERRED_MODULES)
+    if deferred:
+        failed.append(f"gui imported modules it should only import on first use: {', '.join(deferred)}")
+    if seconds > GUI_IMPORT_BUDGET_SECONDS:
+        failed.append("importing gui is over budget")
+
+    first_window = time_first_window()
+    if first_window is None:
+        print("First window:        skipped, no display")
+    else:
+        seconds, wall = first_window
+        print(f"First window:        {seconds * 1000:8.1f} ms (budget {FIRST_WINDOW_BUDGET_SECONDS * 1000:.0f} ms), "
+              f"{wall * 1000:.1f} ms including the interpreter")
+        if seconds > FIRST_WINDOW_BUDGET_SECONDS:
+            failed.append("the first window is over budget")
+
+    for message in failed:
+        print(f"FAIL: {message}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Checks that syncing leaves a device exactly matching the project in tricky layouts - files_to_sync entries inside
+other entries, and entries inside directories the project's patterns leave out - and that syncing again changes
+nothing. Exits with a non-zero code if a check fails.
+
+Run from the repository root with `python benchmarks/sync_check.py`.
+
+-----------
+
+Classes list:
+
+No classes!
+
+-----------
+
+Functions list:
+
+- make_project(parent: Path, files_to_sync: list[str], exclude: list[str]) -> Path
+- device_files(device: Path) -> dict[str, str]
+- check(name: str, files_to_sync: list[str], exclude: list[str], expected: set[str]) -> bool
+- main() -> None
+
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import tempfile
+from project_tools import project
+from project_tools.project_config import ProjectConfig
+
+FILES = frozenset(("code.py", "lib/a.py", "lib/sub/b.py", "lib/sub/c.py", "lib/tests/t.py", "lib/tests/keep/k.py"))
+
+
+def make_project(parent: Path, files_to_sync: list[str], exclude: list[str]) -> Path:
+    """
+    Make a project with a few files in nested directories and a device to sync it to.
+    """
+    root = parent / "project"
+    for file in FILES:
+        (root / file).parent.mkdir(parents=True, exist_ok=True)
+        (root / file).write_text(f"print({repr(file)})\n")
+    device = parent / "device"
+    device.mkdir()
+    cpypm_config_path = root / ".cpypmconfig"
+    ProjectConfig(project_name="Check", project_root=root, sync_location=device, files_to_sync=files_to_sync,
+                  exclude=exclude).save(cpypm_config_path)
+    return cpypm_config_path
+
+
+def device_files(device: Path) -> dict[str, str]:
+    """
+    Every file on the device and what is in it.
+    """
+    return {path.relative_to(device).as_posix(): path.read_text() for path in device.rglob("*") if path.is_file()}
+
+
+def check(name: str, files_to_sync: list[str], exclude: list[str], expected: set[str]) -> bool:
+    """
+    Sync a project three times - once to a device with just lib/tests/on_device.py on it, once with nothing changed
+    and once after editing every file - checking the device after each one. on_device.py should only be left alone
+    when lib/tests is left out.
+    """
+    failures = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cpypm_config_path = make_project(Path(temp_dir), files_to_sync, exclude)
+        root = cpypm_config_path.parent
+        device = Path(temp_dir) / "device"
+        (device / "lib" / "tests").mkdir(parents=True)
+        (device / "lib" / "tests" / "on_device.py").write_text("left alone\n")
+        for run in ("first", "unchanged", "edited"):
+            if run == "edited":
+                for file in FILES:
+                    (root / file).write_text(f"print({repr(file)}, 'edited')\n")
+            report = project.sync(cpypm_config_path, project.SyncOptions(record_history=False))
+            if not report.succeeded:
+                failures.append(f"{run} sync failed: {report.error}")
+                break
+            if run == "unchanged" and (report.copied or report.deleted):
+                failures.append(f"unchanged sync copied {report.copied} and deleted {report.deleted} file(s)")
+            if project.diff_project(cpypm_config_path):
+                failures.append(f"diff after the {run} sync: {project.diff_project(cpypm_config_path)}")
+            on_device = device_files(device)
+            if set(on_device) != expected:
+                failures.append(f"after the {run} sync the device has {sorted(on_device)}")
+            stale = [file for file in expected & set(FILES) if on_device.get(file) != (root / file).read_text()]
+            if stale:
+                failures.append(f"after the {run} sync these are out of date: {stale}")
+    print(f"{'ok' if not failures else 'FAILED':<8}{name}")
+    for failure in failures:
+        print(f"        {failure}")
+    return not failures
+
+
+def main() -> None:
+    everything = set(FILES)
+    results = [
+        check("one directory", ["code.py", "lib"], [], everything),
+        check("a directory inside another", ["code.py", "lib", "lib/sub"], [], everything),
+        check("a file inside a directory", ["lib/sub/b.py", "lib"], [], everything - {"code.py"}),
+        check("the same item twice", ["lib", "lib"], [], everything - {"code.py"}),
+        check("left out directory", ["lib"], ["tests/"],
+              {"lib/a.py", "lib/sub/b.py", "lib/sub/c.py", "lib/tests/on_device.py"}),
+        check("an item inside a left out directory", ["lib", "lib/tests/keep"], ["tests/"],
+              {"lib/a.py", "lib/sub/b.py", "lib/sub/c.py", "lib/tests/keep/k.py", "lib/tests/on_device.py"}),
+    ]
+    raise SystemExit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
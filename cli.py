@@ -0,0 +1,288 @@
+"""
+The command line interface - creates projects, syncs them, shows what a sync would change, watches projects and lists
+drives without opening a window. Nothing here imports tkinter or the GUI modules, so it works on machines without a
+display.
+
+    python cli.py sync path/to/.cpypmconfig --json
+    python cli.py sync path/to/.cpypmconfig --dry-run
+    python cli.py watch path/to/.cpypmconfig
+    python cli.py drives
+
+Syncs, dry runs and drive lists can go through the sync daemon (see project_tools/daemon.py), which keeps projects and
+drives in memory between runs. Start it with `python cli.py daemon` and pass --daemon to send requests to it - without
+a running daemon they run in this process as usual.
+
+Exit codes: 0 for success (or nothing to sync with --dry-run), 1 if something failed, 2 for bad arguments, 3 if
+--dry-run found changes, 4 if the device isn't connected and 130 if interrupted.
+
+-----------
+
+Classes list:
+
+No classes!
+
+-----------
+
+Functions list:
+
+- make_parser() -> ArgumentParser
+- output(args: Namespace, result: dict, text: str, error: bool = False) -> None
+- run_request(args: Namespace, request: dict, service: SyncService = None) -> dict
+- report(args: Namespace, answer: dict, text: str = None) -> int
+- command_new(args: Namespace) -> int
+- command_sync(args: Namespace) -> int
+- command_watch(args: Namespace) -> int
+- command_drives(args: Namespace) -> int
+- command_daemon(args: Namespace) -> int
+- main(argv: list[str] = None) -> int
+
+"""
+
+from project_tools.create_logger import create_logger, set_console_level
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from time import sleep
+from typing import TYPE_CHECKING, Optional
+import json
+import logging
+import os
+import sys
+
+# Keep the console for results - log records only show up with -v (everything still goes to log.log)
+set_console_level(logging.WARNING)
+
+# Only the socket client is imported up front, so a request to the daemon doesn't pay for loading the sync code
+from project_tools import local_socket
+
+if TYPE_CHECKING:
+    from project_tools.daemon import SyncService
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_CHANGES = 3
+EXIT_NO_DEVICE = 4
+EXIT_INTERRUPTED = 130
+
+# Exit codes for the results that aren't a plain success
+RESULT_EXIT_CODES = {"failed": EXIT_FAILED, "no device": EXIT_NO_DEVICE, "changes": EXIT_CHANGES}
+# How long to wait for the daemon to pick up before running a request here instead
+DAEMON_CONNECT_TIMEOUT = 0.5
+
+DEFAULT_HIERARCHY = Path(__file__).resolve().parent / "default_circuitpython_hierarchy"
+
+
+def make_parser() -> ArgumentParser:
+    """
+    Make the argument parser.
+
+    :return: An argparse.ArgumentParser.
+    """
+    parser = ArgumentParser(description="CircuitPython Project Manager (command line)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="show log records on the console (-v for info, -vv for debug)")
+    parser.add_argument("--daemon", action="store_true",
+                        help="send requests to the sync daemon (run here if it isn't running)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    new_parser = subparsers.add_parser("new", help="create a new project")
+    new_parser.add_argument("parent", type=Path, help="the directory to create the project in")
+    new_parser.add_argument("--name", default="Untitled", help="the project name")
+    new_parser.add_argument("--description", default="", help="the project description")
+    new_parser.add_argument("--no-gitignore", action="store_true", help="don't generate a .gitignore")
+    new_parser.set_defaults(function=command_new)
+
+    for name, help_text in (("sync", "sync a project to its device"),
+                            ("watch", "sync a project whenever its files change")):
+        sync_parser = subparsers.add_parser(name, help=help_text)
+        sync_parser.add_argument("path", type=Path, help="the project's .cpypmconfig file")
+        sync_parser.add_argument("--to", type=Path, default=None, metavar="DEVICE",
+                                 help="sync here instead of the project's sync location")
+        sync_parser.add_argument("--no-history", action="store_true", help="don't record syncs in the sync history")
+    sync_parser = subparsers.choices["sync"]
+    sync_parser.add_argument("--dry-run", action="store_true",
+                             help="list what would be copied and deleted without touching the device")
+    sync_parser.set_defaults(function=command_sync)
+    watch_parser = subparsers.choices["watch"]
+    watch_parser.add_argument("--interval", type=float, default=1.0, metavar="SECONDS",
+                              help="how often to check for changes (default: 1)")
+    watch_parser.set_defaults(function=command_watch)
+
+    drives_parser = subparsers.add_parser("drives", help="list connected drives")
+    drives_parser.add_argument("--all", action="store_true", help="include drives that aren't CircuitPython devices")
+    drives_parser.add_argument("--mount-point", type=Path, default=Path("/media"),
+                               help="where drives are mounted on Linux (default: /media)")
+    drives_parser.set_defaults(function=command_drives)
+
+    daemon_parser = subparsers.add_parser("daemon", help="run the sync daemon until stopped")
+    daemon_parser.add_argument("--stop", action="store_true", help="stop the running daemon instead")
+    daemon_parser.set_defaults(function=command_daemon)
+    return parser
+
+
+def output(args: Namespace, result: dict, text: str, error: bool = False) -> None:
+    """
+    Print a result, as one line of JSON on stdout with --json or as text otherwise.
+
+    :param args: The parsed arguments.
+    :param result: A dict - the machine-readable result.
+    :param text: A str - the human-readable result.
+    :param error: A bool - whether the text goes to stderr. Defaults to False.
+    :return: None.
+    """
+    if args.json:
+        print(json.dumps(result), flush=True)
+    else:
+        print(text, file=sys.stderr if error else sys.stdout, flush=True)
+
+
+def run_request(args: Namespace, request: dict, service: "SyncService" = None) -> dict:
+    """
+    Answer a request (see SyncService) - through the daemon with --daemon, otherwise in this process.
+
+    :param args: The parsed arguments.
+    :param request: A dict with a "command" key.
+    :param service: The SyncService to use in this process. Defaults to a new one.
+    :return: A dict with a "result" key.
+    """
+    if args.daemon:
+        answer = local_socket.request(local_socket.DAEMON_SOCKET, request, DAEMON_CONNECT_TIMEOUT)
+        if answer is not None:
+            return answer
+        logger.warning("The daemon isn't running, running here instead")
+    if service is None:
+        from project_tools.daemon import SyncService
+        service = SyncService()
+    return service.handle(request)
+
+
+def report(args: Namespace, answer: dict, text: str = None) -> int:
+    """
+    Print an answer from run_request.
+
+    :param args: The parsed arguments.
+    :param answer: A dict with a "result" key.
+    :param text: A str - the human-readable result on success. Failures describe themselves.
+    :return: An int - the exit code.
+    """
+    code = RESULT_EXIT_CODES.get(answer["result"], EXIT_OK)
+    if answer["result"] == "failed":
+        text = answer["error"]
+    elif answer["result"] == "no device":
+        text = f"{answer['device']} is not connected"
+    output(args, answer, text, error=code in (EXIT_FAILED, EXIT_NO_DEVICE))
+    return code
+
+
+def command_new(args: Namespace) -> int:
+    from project_tools import project
+    path = project.make_new_project(args.parent, args.name, args.description, not args.no_gitignore,
+                                    DEFAULT_HIERARCHY)
+    output(args, {"result": "created", "path": str(path)}, f"Created {path}")
+    return EXIT_OK
+
+
+def _sync_request(args: Namespace) -> dict:
+    return {"command": "diff" if getattr(args, "dry_run", False) else "sync", "path": str(args.path.absolute()),
+            "to": None if args.to is None else str(args.to.absolute()), "record_history": not args.no_history}
+
+
+def _sync_text(answer: dict) -> Optional[str]:
+    if answer["result"] == "success":
+        return (f"Synced {answer['project']} to {answer['device']}: {answer['copied']} copied "
+                f"({answer['bytes'] / 1024:.1f} kB), {answer['skipped']} unchanged, {answer['deleted']} deleted in "
+                f"{answer['seconds']:.2f}s")
+    if answer["result"] in ("changes", "in sync"):
+        lines = [f"{'+' if change['action'] == 'copy' else '-'} {change['path']}" for change in answer["changes"]]
+        return "\n".join(lines) if lines else f"{answer['project']} is in sync with {answer['device']}"
+    return None
+
+
+def command_sync(args: Namespace) -> int:
+    answer = run_request(args, _sync_request(args))
+    return report(args, answer, _sync_text(answer))
+
+
+def command_watch(args: Namespace) -> int:
+    """
+    Sync, then sync again whenever the project changes (once it has stayed the same for one interval, so a save in
+    progress isn't synced half way). Runs until interrupted.
+    """
+    from project_tools.daemon import SyncService
+    service = SyncService()
+    model = service.model(args.path)
+    request = _sync_request(args)
+    pending = True
+    connected = True
+    logger.info(f"Watching {repr(args.path)}")
+    while True:
+        changed = model.refresh()
+        changed = service.project_index(model).refresh() > 0 or changed
+        if changed:
+            pending = True
+        elif pending:
+            answer = run_request(args, request, service)
+            if answer["result"] != "no device":
+                connected = True
+                report(args, answer, _sync_text(answer))
+                # A failed sync isn't retried until something changes again
+                pending = False
+            elif connected:
+                # Say so once, then sync as soon as it is plugged back in
+                connected = False
+                report(args, answer)
+        sleep(args.interval)
+
+
+def command_drives(args: Namespace) -> int:
+    answer = run_request(args, {"command": "drives", "all": args.all, "mount_point": str(args.mount_point)})
+    if answer["result"] != "success":
+        return report(args, answer)
+    return report(args, answer, "\n".join(answer["drives"]) if answer["drives"] else "No drives found")
+
+
+def command_daemon(args: Namespace) -> int:
+    if args.stop:
+        answer = local_socket.request(local_socket.DAEMON_SOCKET, {"command": "stop"}, DAEMON_CONNECT_TIMEOUT)
+        if answer is None:
+            answer = {"result": "failed", "error": "The daemon isn't running"}
+        return report(args, answer, "Stopping the daemon")
+    from project_tools import daemon
+    output(args, {"result": "listening", "pid": os.getpid()},
+           f"Daemon running as process {os.getpid()} - stop it with `cli.py daemon --stop` or Ctrl+C")
+    daemon.serve()
+    return EXIT_OK
+
+
+def main(argv: list[str] = None) -> int:
+    """
+    Run the command line interface.
+
+    :param argv: A list of str arguments. Defaults to sys.argv[1:].
+    :return: An int - the exit code.
+    """
+    args = make_parser().parse_args(argv)
+    if args.verbose:
+        set_console_level(logging.DEBUG if args.verbose > 1 else logging.INFO)
+    logger.debug(f"Arguments are {repr(args)}")
+    try:
+        return args.function(args)
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+    except (OSError, ValueError, RuntimeError) as error:
+        from project_tools.project_config import ConfigValidationError
+        if isinstance(error, ConfigValidationError):
+            message = f"{args.path} is not a valid .cpypmconfig file: {error}"
+        else:
+            message = f"{type(error).__name__}: {error}"
+        # The traceback goes in log.log - the console just gets the message
+        logger.debug("Uh oh, an exception has occurred!", exc_info=True)
+        output(args, {"result": "failed", "error": message}, message, error=True)
+        return EXIT_FAILED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
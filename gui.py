@@ -11,7 +11,7 @@ Classes list:
 
 Functions list:
 
-No functions!
+- open_application(url: str) -> bool
 
 """
 
@@ -20,28 +20,48 @@ from tkinter import ttk
 from tkinter import messagebox as mbox
 from tkinter import filedialog as fd
 from gui_tools.right_click.entry import EntryWithRightClick
-from gui_tools.right_click.spinbox import SpinboxWithRightClick
 from gui_tools.right_click.combobox import ComboboxWithRightClick
 from gui_tools.right_click.listbox import ListboxWithRightClick
 from gui_tools.right_click.text import TextWithRightClick
 from gui_tools.idlelib_clone import tooltip
-from gui_tools.scrollable_frame import VerticalScrolledFrame
-from gui_tools.clickable_label import ClickableLabel
+from gui_tools import reactive
 from gui_tools import download_dialog
-from threading import Thread
+from gui_tools.task_scheduler import QUEUED, Task, TaskCancelled, TaskScheduler
 from pathlib import Path
 import traceback
-import json
-from webbrowser import open as open_application
-from markdown import markdown as markdown_to_html
-from pathlib import Path
-from project_tools import drives, os_detect, project
+import sqlite3
+from project_tools import drives, os_detect, profiling, project, single_instance, sync_history, sync_status, workspace
+from project_tools.config_store import ConfigStore
+from project_tools.project_config import ConfigValidationError, ProjectConfig
+from project_tools.project_index import ProjectIndex
+from project_tools.project_model import ProjectModel
+from project_tools.recent_projects import RecentProjects
 from typing import Union, Any, Callable
 import logging
-from project_tools.create_logger import create_logger
+from project_tools.create_logger import create_logger, configure_log_rotation, DEFAULT_MAX_BYTES, DEFAULT_BACKUP_COUNT
 
 logger = create_logger(name=__name__, level=logging.DEBUG)
 
+# How often the sync dialog redraws its progress, no matter how fast files are copied
+SYNC_PROGRESS_MS = 100
+# How often other instances are checked for where Tk can't watch the socket (Windows)
+INSTANCE_POLL_MS = 250
+# How many rows the project tree adds per trip through the main loop, so expanding a big directory doesn't freeze
+# the window
+TREE_ROWS_PER_CHUNK = 200
+
+
+def open_application(url: str) -> bool:
+    """
+    Open a file or a web page in its default application. webbrowser is only imported the first time this is called,
+    since it is slow to import and most sessions never need it.
+
+    :param url: A str - the path or URL to open.
+    :return: A bool - whether an application could be started.
+    """
+    from webbrowser import open as open_url
+    return open_url(url)
+
 
 class GUI(tk.Tk):
     """
@@ -52,7 +72,13 @@ class GUI(tk.Tk):
         self.title("CircuitPython Project Manager")
         self.resizable(False, False)
         self.config_path = Path.cwd() / "config.json"
-        self.disable_closing = False
+        self.config_store = ConfigStore(self.config_path)
+        self.recent = RecentProjects(self.config_store)
+        self.scheduler = TaskScheduler(self)
+        # Kept between project tree views so unchanged project directories aren't listed again (never used for the
+        # device, whose directory times can't be trusted)
+        self.sync_status_index = sync_status.DirectoryIndex()
+        self.project_index = None
         self.protocol("WM_DELETE_WINDOW", self.try_to_close)
 
     def __enter__(self):
@@ -65,7 +91,7 @@ class GUI(tk.Tk):
         :return: None.
         """
         logger.debug("User requested closing window...")
-        if self.disable_closing:
+        if self.scheduler.busy():
             logger.warning("Currently in the middle of doing something!")
             if mbox.askokcancel("CircuitPython Project Manager: Confirmation",
                                 "Something is happening right now!\n"
@@ -74,44 +100,35 @@ class GUI(tk.Tk):
                                 "Are you sure you want to exit?",
                                 icon="warning", default="cancel"):
                 logger.debug("User continued to close window!")
+                self.config_store.flush()
                 self.destroy()
         else:
             logger.debug("Destroying main window!")
+            self.config_store.flush()
             self.destroy()
 
     def save_key(self, key: str = None, value: Any = None) -> None:
         """
-        Save a key to the config file.
+        Save a key to the config file. The write happens in the background shortly after.
 
         :param key: A string.
         :param value: Something.
         :return: None.
         """
-        if not self.config_path.exists():
-            self.config_path.write_text("{}")
-        try:
-            old_json = json.loads(self.config_path.read_text())
-        except json.decoder.JSONDecodeError:
-            old_json = {}
         logger.debug(f"Setting {repr(key)} to {repr(value)}!")
-        old_json[key] = value
-        self.config_path.write_text(json.dumps(old_json, sort_keys=True, indent=4))
+        self.config_store.set(key, value)
 
     def load_key(self, key: str) -> Any:
         """
-        Retrieves a key from the config file.
+        Retrieves a key from the config file (served from memory after the first read).
 
         :param key: A string.
         :return: Something, or None if it was not found.
         """
-        if not self.config_path.exists():
-            self.config_path.write_text("{}")
-        try:
-            value = json.loads(self.config_path.read_text())[key]
-            return value
-        except (json.decoder.JSONDecodeError, KeyError):
+        if key not in self.config_store:
             logger.warning(f"Could not find {repr(key)} in config!")
             return None
+        return self.config_store.get(key)
 
     def validate_for_number(self, new: str = "") -> bool:
         """
@@ -194,15 +211,7 @@ class GUI(tk.Tk):
         if isinstance(path, Path):
             path = Path(path)
         if path.exists():
-            if convert_to_html:
-                logger.debug(f"Converting markdown to HTML...")
-                html_path = Path.cwd() / (path.stem + ".html")
-                html_path.write_text(markdown_to_html(text=path.read_text(), extensions=["pymdownx.tilde"]))
-                logger.debug(f"Opening HTML in browser...")
-                open_application(url=html_path.as_uri())
-            else:
-                logger.debug(f"Opening {repr(path)} as markdown!")
-                open_application(str(path))
+            self.show_markdown(path, convert_to_html)
         else:
             mbox.showerror("CircuitPython Project Manager: ERROR!",
                            "Oh no! An error occurred while opening this file!\n"
@@ -214,6 +223,28 @@ class GUI(tk.Tk):
                                             show_traceback=self.show_traceback()):
                     self.open_markdown(path=path)
 
+    @staticmethod
+    def show_markdown(path: Path, convert_to_html: bool = True) -> None:
+        """
+        Open an existing markdown file, converting it to HTML first if asked to. Doesn't touch Tk, so it can run as a
+        task.
+
+        :param path: A pathlib.Path to the markdown file.
+        :param convert_to_html: A bool on whether to convert the markdown to HTML or not.
+        :return: None.
+        """
+        if convert_to_html:
+            # Only imported when a README is actually converted - markdown and its extensions are slow to import
+            from markdown import markdown as markdown_to_html
+            logger.debug(f"Converting markdown to HTML...")
+            html_path = Path.cwd() / (path.stem + ".html")
+            html_path.write_text(markdown_to_html(text=path.read_text(), extensions=["pymdownx.tilde"]))
+            logger.debug(f"Opening HTML in browser...")
+            open_application(url=html_path.as_uri())
+        else:
+            logger.debug(f"Opening {repr(path)} as markdown!")
+            open_application(str(path))
+
     def create_config(self) -> None:
         """
         Re-create the config keys if they do not exist.
@@ -224,6 +255,17 @@ class GUI(tk.Tk):
             self.save_key("show_traceback_in_error_messages", False)
         if not self.load_key("unix_drive_mount_point"):
             self.save_key("unix_drive_mount_point", "/media")
+        if self.load_key("prune_missing_recent_projects") is None:
+            self.save_key("prune_missing_recent_projects", True)
+        if self.load_key("log_max_bytes") is None:
+            self.save_key("log_max_bytes", DEFAULT_MAX_BYTES)
+        if self.load_key("log_backup_count") is None:
+            self.save_key("log_backup_count", DEFAULT_BACKUP_COUNT)
+        if self.load_key("compress_old_logs") is None:
+            self.save_key("compress_old_logs", True)
+        configure_log_rotation(max_bytes=self.load_key("log_max_bytes"),
+                               backup_count=self.load_key("log_backup_count"),
+                               compress=self.load_key("compress_old_logs"))
 
     def add_recent_project(self, path: Path) -> None:
         """
@@ -233,18 +275,58 @@ class GUI(tk.Tk):
         :return: None.
         """
         self.save_key("last_dir_opened", str(path.parent.parent))
-        recent_projects = self.load_key("opened_recent")
-        if recent_projects is None:
-            recent_projects = []
-        if str(path) in recent_projects:
-            recent_projects.pop(recent_projects.index(str(path)))
-        recent_projects = [Path(p) for p in recent_projects]
-        while len(recent_projects) > 10:
-            recent_projects.pop()
-        recent_projects.insert(0, str(path))
-        self.save_key("opened_recent", [str(p) for p in recent_projects])
+        config = None
+        if self.project_model is not None and self.project_model.path == path:
+            try:
+                config = self.project_model.config
+            except (OSError, ValueError):
+                logger.warning(f"Could not read {repr(path)} for the recent projects list")
+        self.recent.add(path, config)
         self.update_recent_projects()
 
+    def refresh_recent_projects(self, task: Task) -> None:
+        """
+        Re-read every recent project's metadata from disk - this runs as a task.
+
+        :param task: The Task running this.
+        :return: None.
+        """
+        self.recent.refresh(prune=bool(self.load_key("prune_missing_recent_projects")))
+
+    def start_refresh_recent_projects(self) -> None:
+        """
+        Start refreshing the recent projects in the background, and update the menu when it finishes.
+
+        :return: None.
+        """
+        self.scheduler.submit("Refresh recent projects", self.refresh_recent_projects,
+                              on_done=lambda _: self.update_recent_projects())
+
+    def set_project_path(self, path: Path = None) -> None:
+        """
+        Set the path of the opened .cpypmconfig file and the project model that caches it.
+
+        :param path: The path to the .cpypmconfig file, or None if no project is open.
+        :return: None.
+        """
+        self.cpypmconfig_path = path
+        self.project_model = None if path is None else ProjectModel(path)
+        self.project_index = None
+
+    def get_project_index(self) -> ProjectIndex:
+        """
+        The index of the open project's files, shared by syncing and the sync status so the project is walked once.
+        It is made again if the project's files_to_sync or patterns change. Tasks refresh it before using it.
+
+        :return: A ProjectIndex.
+        """
+        model = self.project_model
+        sync_filter = model.sync_filter
+        if (self.project_index is None or
+                not self.project_index.matches(model.project_root, model.files_to_sync, sync_filter)):
+            self.project_index = ProjectIndex(model.project_root, model.files_to_sync, sync_filter)
+        return self.project_index
+
     def open_project(self, path: Path) -> None:
         """
         Open a project.
@@ -253,10 +335,55 @@ class GUI(tk.Tk):
         :return: None.
         """
         logger.debug(f"Opening project at path {repr(path)}")
-        self.cpypmconfig_path = path
+        self.set_project_path(path)
         self.update_main_gui()
         self.add_recent_project(path)
 
+    def serve_other_instances(self, server: single_instance.InstanceServer) -> None:
+        """
+        Open projects that later launches hand over. Tk watches the socket where it can, so nothing is polled.
+
+        :param server: The InstanceServer from single_instance.listen.
+        :return: None.
+        """
+        def handle(*_) -> None:
+            request = server.accept_request()
+            if request is not None:
+                self.open_requested_project(None if request["open"] is None else Path(request["open"]))
+
+        if hasattr(self.tk, "createfilehandler") and not os_detect.on_windows():
+            self.tk.createfilehandler(server, tk.READABLE, handle)
+        else:
+            def poll() -> None:
+                handle()
+                self.after(INSTANCE_POLL_MS, poll)
+
+            poll()
+
+    def open_requested_project(self, path: Path = None) -> None:
+        """
+        Come to the front and open a project another launch asked for.
+
+        :param path: The path to the .cpypmconfig file, or None to just come to the front.
+        :return: None.
+        """
+        self.deiconify()
+        self.lift()
+        self.focus_force()
+        if path is None or path == self.cpypmconfig_path:
+            return
+        if self.cpypmconfig_path is not None:
+            if self.scheduler.busy():
+                mbox.showwarning("CircuitPython Project Manager: Warning",
+                                 f"Can't open {path} while something is happening!")
+                return
+            if not mbox.askokcancel("CircuitPython Project Manager: Confirm",
+                                    f"Close the current project and open {path}?\n"
+                                    f"Unsaved changes will be lost."):
+                return
+            self.close_project()
+        self.open_project(path)
+
     def open_project_dialog(self) -> None:
         """
         Open a project with a dialog to select a file.
@@ -283,7 +410,7 @@ class GUI(tk.Tk):
         :return: None.
         """
         logger.debug("Closing project...")
-        self.cpypmconfig_path = None
+        self.set_project_path(None)
         self.update_main_gui()
 
     def dismiss_dialog(self, dlg: tk.Toplevel) -> None:
@@ -293,7 +420,7 @@ class GUI(tk.Tk):
         :param dlg: The dialog to destroy.
         :return: None.
         """
-        if self.disable_closing:
+        if self.scheduler.busy():
             logger.warning("Currently in the middle of doing something!")
             if mbox.askokcancel("CircuitPython Project Manager: Confirmation",
                                 "Something is happening right now!\n"
@@ -407,7 +534,7 @@ class GUI(tk.Tk):
 
     def update_new_project_buttons(self) -> None:
         """
-        Update the new project buttons. Will reschedule itself automatically.
+        Update the new project buttons. This is called (debounced) whenever the title or location changes.
 
         :return: None.
         """
@@ -429,8 +556,6 @@ class GUI(tk.Tk):
             self.make_new_project_button.config(state=tk.NORMAL if enable else tk.DISABLED)
         except tk.TclError:
             pass
-        else:
-            self.after(ms=100, func=self.update_new_project_buttons)
 
     def create_new_project_buttons(self) -> None:
         """
@@ -441,13 +566,19 @@ class GUI(tk.Tk):
         self.project_buttons_frame = ttk.Frame(master=self.new_project_frame)
         self.project_buttons_frame.grid(row=2, column=0, padx=1, pady=1, sticky=tk.N)
         self.make_new_project_button = ttk.Button(master=self.project_buttons_frame, text="Make new project",
-                                                  command=self.start_create_new_project_thread)
+                                                  command=self.start_create_new_project)
         self.make_new_project_button.grid(row=0, column=0, padx=1, pady=1, sticky=tk.N)
         self.add_tooltip(self.make_new_project_button, "Make a new project.")
         self.cancel_new_project_button = ttk.Button(master=self.project_buttons_frame, text="Cancel",
                                                     command=lambda: self.dismiss_dialog(self.new_project_window))
         self.cancel_new_project_button.grid(row=0, column=1, padx=1, pady=1, sticky=tk.N)
         self.add_tooltip(self.cancel_new_project_button, "Close this dialog without creating a new project.")
+        # Checking the location touches the file system, so wait until the user stops typing
+        check_later = reactive.Debouncer(self.new_project_frame, 150, self.update_new_project_buttons)
+        reactive.from_variable(self.project_title_var).subscribe(check_later, call_now=False)
+        reactive.from_variable(self.project_location_var).subscribe(check_later, call_now=False)
+        # The directory may have changed behind our back while the user was in another window
+        self.new_project_window.bind("<FocusIn>", check_later, add="+")
         self.update_new_project_buttons()
 
     def set_childrens_state(self, frame, enabled: bool = True) -> None:
@@ -468,44 +599,70 @@ class GUI(tk.Tk):
                 except tk.TclError:
                     pass
 
-    def start_create_new_project_thread(self) -> None:
+    def start_create_new_project(self) -> None:
         """
-        Start the create new project thread.
+        Start creating the new project as a task.
 
         :return: None.
         """
-        thread = Thread(target=self.create_new_project, args=(), daemon=True)
-        logger.debug(f"Starting create new project thread {repr(thread)}")
-        thread.start()
+        self.project_status.stop = True
+        self.project_status.config(text="Creating project...")
+        self.set_childrens_state(self.new_project_frame, False)
+        self.scheduler.submit("Create project", self.create_new_project,
+                              parent_directory=Path(self.project_location_var.get()),
+                              project_name=self.project_title_var.get(),
+                              project_description=self.project_description_text.get("1.0", tk.END),
+                              autogen_gitignore=self.project_autogen_var.get(),
+                              on_done=self.finish_create_new_project, on_error=self.create_new_project_failed,
+                              blocks_close=True)
 
-    def create_new_project(self) -> None:
+    @staticmethod
+    def create_new_project(task: Task, **kwargs) -> Path:
         """
-        Create a new project - this will block.
+        Create a new project - this runs as a task.
 
+        :param task: The Task running this.
+        :param kwargs: The arguments to project.make_new_project.
+        :return: A pathlib.Path to the new .cpypmconfig file.
+        """
+        with profiling.profiled("create project"):
+            return project.make_new_project(**kwargs)
+
+    def finish_create_new_project(self, cpypmconfig_path: Path) -> None:
+        """
+        Open the project that was just created.
+
+        :param cpypmconfig_path: A pathlib.Path to the new .cpypmconfig file.
         :return: None.
         """
-        self.project_status.stop = True
-        self.project_status.config(text="Creating project...")
-        self.disable_closing = True
-        self.set_childrens_state(self.new_project_frame, False)
-        try:
-            self.cpypmconfig_path = project.make_new_project(parent_directory=Path(self.project_location_var.get()),
-                                                             project_name=self.project_title_var.get(),
-                                                             project_description=self.project_description_text.get("1.0", tk.END),
-                                                             autogen_gitignore=self.project_autogen_var.get())
-        except FileExistsError:
-            mbox.showerror("CircuitPython Project Manager: Error!",
-                           "A project already exists under the same name!\n"
-                           "Please try creating a project with a different name or try creating it somewhere else!"
-                           "\n\n" + (traceback.format_exc() if self.show_traceback() else ""))
-            self.disable_closing = False
-            return
+        self.set_project_path(cpypmconfig_path)
         self.update_main_gui()
-        self.disable_closing = False
         self.dismiss_dialog(self.new_project_window)
         self.add_recent_project(self.cpypmconfig_path)
         self.update_recent_projects()
 
+    def create_new_project_failed(self, error: Exception, formatted_traceback: str) -> None:
+        """
+        Tell the user the project couldn't be created, and let them try again.
+
+        :param error: The exception raised.
+        :param formatted_traceback: A str - the formatted traceback.
+        :return: None.
+        """
+        if isinstance(error, FileExistsError):
+            message = ("A project already exists under the same name!\n"
+                       "Please try creating a project with a different name or try creating it somewhere else!")
+        else:
+            message = "Uh oh! An unknown exception occurred!"
+        mbox.showerror("CircuitPython Project Manager: Error!",
+                       message + "\n\n" + (formatted_traceback if self.show_traceback() else ""))
+        try:
+            self.set_childrens_state(self.new_project_frame, True)
+        except tk.TclError:
+            return
+        self.project_status.stop = False
+        self.update_new_project_buttons()
+
     def open_create_new_project(self) -> None:
         """
         Create a new project. This will open a new window.
@@ -531,7 +688,7 @@ class GUI(tk.Tk):
         if mbox.askokcancel("CircuitPython Project Manager: Confirm",
                             "Are you sure you want to clear all recent projects?"):
             logger.debug("Clearing all recent projects!")
-            self.save_key("opened_recent", [])
+            self.recent.clear()
             self.update_recent_projects()
         else:
             logger.debug("User canceled clearing all recent projects!")
@@ -543,13 +700,10 @@ class GUI(tk.Tk):
         :return: None.
         """
         self.opened_recent_menu.delete(0, tk.END)
-        self.recent_projects = self.load_key("opened_recent")
-        if self.recent_projects is None:
-            self.recent_projects = []
-        self.recent_projects = [Path(p) for p in self.recent_projects]
+        self.recent_projects = self.recent.paths()
         for path in self.recent_projects:
-            self.opened_recent_menu.add_command(label=str(path),
-                                                state=tk.NORMAL if path.exists() else tk.DISABLED,
+            self.opened_recent_menu.add_command(label=self.recent.label(path),
+                                                state=tk.NORMAL if self.recent.metadata(path)["exists"] else tk.DISABLED,
                                                 command=lambda path=path: self.open_project(path))
         if len(self.recent_projects) == 0:
             self.opened_recent_menu.add_command(label="No recent projects!", state=tk.DISABLED)
@@ -635,9 +789,9 @@ class GUI(tk.Tk):
                                    command=lambda: self.open_file(str(self.cpypmconfig_path.parent)), underline=23)
         self.edit_menu.add_separator()
         self.edit_menu.add_command(label="Open project root file location",
-                                   command=lambda: self.open_file(self.cpypmconfig["project_root"]), underline=13)
+                                   command=lambda: self.open_file(str(self.cpypmconfig.project_root)), underline=13)
         self.edit_menu.add_command(label="Copy project root file location",
-                                   command=lambda: self.copy_to_clipboard(self.cpypmconfig["project_root"]))
+                                   command=lambda: self.copy_to_clipboard(str(self.cpypmconfig.project_root)))
         self.edit_menu.add_separator()
         self.edit_menu.add_command(label="Save changes", command=self.save_modified, underline=0,
                                    accelerator=self.make_key_bind(ctrl_cmd=True, mac_ctrl=False, shift=False,
@@ -656,31 +810,387 @@ class GUI(tk.Tk):
         """
         self.sync_menu = tk.Menu(self.menu_bar)
         self.menu_bar.add_cascade(menu=self.sync_menu, label="Sync", underline=0)
-        self.sync_menu.add_command(label="Sync files", command=self.start_sync_thread, underline=0,
+        self.sync_menu.add_command(label="Sync files", command=self.start_sync, underline=0,
                                    accelerator=self.make_key_bind(ctrl_cmd=True, mac_ctrl=False, shift=False,
                                                                   alt_option=False, letter="r",
-                                                                  callback=lambda _: None if self.sync_menu.entrycget("Sync files", "state") == tk.DISABLED else self.start_sync_thread()))
+                                                                  callback=lambda _: None if self.sync_menu.entrycget("Sync files", "state") == tk.DISABLED else self.start_sync()))
+        self.sync_menu.add_separator()
+        self.sync_menu.add_command(label="Add project to workspace...", command=self.add_project_to_workspace,
+                                   underline=0)
+        self.sync_menu.add_command(label="Sync workspace...", command=self.open_sync_workspace_dialog, underline=5)
+        self.sync_menu.add_separator()
+        self.sync_menu.add_command(label="Project files...", command=self.open_project_tree, underline=0)
+        self.sync_menu.add_command(label="Sync history...", command=self.open_sync_history, underline=5)
 
-    def open_readme(self) -> None:
+    def add_project_to_workspace(self) -> None:
         """
-        Open the README, this may block on slow systems.
+        Add the opened project to a workspace file, creating the workspace if it doesn't exist.
 
         :return: None.
         """
-        self.open_markdown(Path.cwd() / "README.md", convert_to_html=self.convert_to_md_var.get(),
-                           download_url="https://raw.githubusercontent.com/UnsignedArduino/CircuitPython-Project-Manager/main/README.md")
-        self.disable_open_readme = False
+        logger.debug("Adding project to workspace...")
+        previous_path = self.load_key("last_dir_opened")
+        path = fd.asksaveasfilename(initialdir=str(Path.cwd()) if previous_path is None else previous_path,
+                                    title="CircuitPython Project Manager: Select or create a workspace file",
+                                    defaultextension=".cpypmworkspace", confirmoverwrite=False,
+                                    filetypes=((".cpypmworkspace files", "*.cpypmworkspace"), ("All files", "*.*")))
+        if not path:
+            logger.debug("User canceled adding project to workspace!")
+            return
+        path = Path(path)
+        try:
+            ws = workspace.Workspace.load(path) if path.exists() else workspace.Workspace(path)
+            ws.add_project(self.cpypmconfig_path)
+            ws.save()
+        except (OSError, ValueError):
+            logger.exception("Uh oh, an exception has occurred!")
+            mbox.showerror("CircuitPython Project Manager: Error!",
+                           "Could not add the project to that workspace!"
+                           "\n\n" + (traceback.format_exc() if self.show_traceback() else ""))
+            return
+        logger.info(f"Added {repr(self.cpypmconfig_path)} to workspace {repr(path)}")
+        self.save_key("last_workspace_opened", str(path))
 
-    def start_open_readme_thread(self) -> None:
+    def open_sync_workspace_dialog(self) -> None:
         """
-        Start the open README thread.
+        Ask for a workspace file and sync every project in it that changed.
 
         :return: None.
         """
+        previous_path = self.load_key("last_workspace_opened")
+        path = fd.askopenfilename(initialdir=str(Path.cwd()) if previous_path is None else str(Path(previous_path).parent),
+                                  title="CircuitPython Project Manager: Select a .cpypmworkspace file",
+                                  filetypes=((".cpypmworkspace files", "*.cpypmworkspace"), ("All files", "*.*")))
+        if not path:
+            logger.debug("User canceled syncing workspace!")
+            return
+        path = Path(path)
+        self.save_key("last_workspace_opened", str(path))
+        self.sync_menu.entryconfigure("Sync workspace...", state=tk.DISABLED)
+        self.workspace_dialog = self.create_dialog("CircuitPython Project Manager: Syncing workspace...")
+        self.workspace_dialog.protocol("WM_DELETE_WINDOW", None)
+        ttk.Label(master=self.workspace_dialog, text="Syncing workspace...").grid(row=0, column=0, padx=1, pady=1,
+                                                                               sticky=tk.NW)
+        self.scheduler.submit("Sync workspace", self.sync_workspace, path, on_done=self.finish_sync_workspace,
+                              on_error=self.sync_workspace_failed, blocks_close=True)
+
+    @staticmethod
+    def sync_workspace(task: Task, path: Path) -> workspace.WorkspaceReport:
+        """
+        Sync a workspace - this runs as a task.
+
+        :param task: The Task running this.
+        :param path: A pathlib.Path to the workspace file.
+        :return: A workspace.WorkspaceReport.
+        """
+        return workspace.sync_workspace(workspace.Workspace.load(path))
+
+    def finish_sync_workspace(self, report: workspace.WorkspaceReport = None) -> None:
+        """
+        Close the workspace sync dialog and show the report, if there is one.
+
+        :param report: A workspace.WorkspaceReport, or None if the sync failed.
+        :return: None.
+        """
+        self.sync_menu.entryconfigure("Sync workspace...", state=tk.NORMAL)
+        self.dismiss_dialog(self.workspace_dialog)
+        if report is not None:
+            self.show_workspace_report(report)
+
+    def sync_workspace_failed(self, error: Exception, formatted_traceback: str) -> None:
+        mbox.showerror("CircuitPython Project Manager: Error!",
+                       "Could not sync that workspace!"
+                       "\n\n" + (formatted_traceback if self.show_traceback() else ""))
+        self.finish_sync_workspace()
+
+    def show_workspace_report(self, report: workspace.WorkspaceReport) -> None:
+        """
+        Show the result of a workspace sync.
+
+        :param report: A workspace.WorkspaceReport.
+        :return: None.
+        """
+        dlg = self.create_dialog("CircuitPython Project Manager: Workspace sync report")
+        text = TextWithRightClick(master=dlg, width=80, height=min(20, len(report.results) + 2), wrap=tk.NONE)
+        text.initiate_right_click_menu(disable=["Cut", "Paste", "Delete"])
+        text.insert("1.0", report.format())
+        text.config(state=tk.DISABLED)
+        text.grid(row=0, column=0, padx=1, pady=1, sticky=tk.NW)
+        ttk.Button(master=dlg, text="Close", command=lambda: self.dismiss_dialog(dlg)).grid(row=1, column=0, padx=1,
+                                                                                          pady=1, sticky=tk.N)
+
+    def open_sync_history(self) -> None:
+        """
+        Show recent syncs, daily trends and the slowest files from the sync history database.
+
+        :return: None.
+        """
+        try:
+            history = sync_history.get_history()
+        except sqlite3.Error:
+            logger.exception("Uh oh, an exception has occurred!")
+            mbox.showerror("CircuitPython Project Manager: Error!",
+                           "Could not open the sync history!"
+                           "\n\n" + (traceback.format_exc() if self.show_traceback() else ""))
+            return
+        dlg = self.create_dialog("CircuitPython Project Manager: Sync history")
+        text = TextWithRightClick(master=dlg, width=120, height=30, wrap=tk.NONE)
+        text.initiate_right_click_menu(disable=["Cut", "Paste", "Delete"])
+        text.grid(row=0, column=0, columnspan=2, padx=1, pady=1, sticky=tk.NW)
+        all_projects_var = tk.BooleanVar(value=self.project_model is None)
+
+        def show_report() -> None:
+            project_root = None if all_projects_var.get() else self.project_model.project_root
+            text.config(state=tk.NORMAL)
+            text.delete("1.0", tk.END)
+            text.insert("1.0", history.format_report(project_root))
+            text.config(state=tk.DISABLED)
+
+        ttk.Checkbutton(master=dlg, text="Show all projects", variable=all_projects_var, command=show_report,
+                        state=tk.DISABLED if self.project_model is None else tk.NORMAL).grid(row=1, column=0, padx=1,
+                                                                                             pady=1, sticky=tk.W)
+        ttk.Button(master=dlg, text="Close", command=lambda: self.dismiss_dialog(dlg)).grid(row=1, column=1, padx=1,
+                                                                                          pady=1, sticky=tk.E)
+        show_report()
+
+    @staticmethod
+    def compute_sync_status(task: Task, config: ProjectConfig, project_index: ProjectIndex) -> sync_status.SyncStatus:
+        """
+        Compare the project with the device - this runs as a task.
+
+        :param task: The Task running this.
+        :param config: The ProjectConfig of the project.
+        :param project_index: The ProjectIndex of the project.
+        :return: A SyncStatus.
+        """
+        with profiling.profiled("sync status"):
+            project_index.refresh()
+            return sync_status.compute_sync_status(config, project_index=project_index)
+
+    @staticmethod
+    def list_tree_children(task: Task, root: Path, parent: str, index: sync_status.DirectoryIndex,
+                           project_index: ProjectIndex,
+                           status: sync_status.SyncStatus = None) -> list[tuple[str, bool, str]]:
+        """
+        List a directory for the project tree - this runs as a task. Sizes come from the project index where it has
+        them, so only files outside the synced files and directories are stat'ed.
+
+        :param task: The Task running this.
+        :param root: A pathlib.Path to the project root.
+        :param parent: A str - the directory relative to the project root ("" for the root).
+        :param index: The DirectoryIndex to list the directory with.
+        :param project_index: The ProjectIndex of the project.
+        :param status: The SyncStatus, to add what is only on the device. Defaults to None.
+        :return: A list of tuples of (name, whether it is a directory, size), directories first, then files, both
+         alphabetically.
+        """
+        directory = root / parent
+        children = dict(index.list(directory))
+        if status is not None:
+            for name, is_dir in status.device_only_children(parent).items():
+                children[name] = children.get(name, False) or is_dir
+        rows = []
+        for name, is_dir in sorted(children.items(), key=lambda child: (not child[1], child[0].lower())):
+            size = ""
+            if not is_dir:
+                entry = project_index.entry(f"{parent}/{name}" if parent else name)
+                try:
+                    size = f"{(entry[0] if entry is not None else (directory / name).stat().st_size) / 1024:.1f} kB"
+                except OSError:
+                    pass
+            rows.append((name, is_dir, size))
+        return rows
+
+    def load_tree_children(self, tree: ttk.Treeview, parent: str) -> None:
+        """
+        Fill in a directory's children in the project tree. The directory is listed as a task and its rows are added
+        a chunk at a time. Directories get a placeholder child so they can be expanded, and are only listed when they
+        are.
+
+        :param tree: The ttk.Treeview.
+        :param parent: A str - the item id of the directory, which is its path relative to the project root ("" for the
+         root).
+        :return: None.
+        """
+        load = object()
+        self.project_tree_loads[parent] = load
+        if parent and tree.exists(parent + "/"):
+            tree.item(parent + "/", text="Loading...")
+        self.scheduler.submit(f"List {parent or 'project'}", self.list_tree_children, self.project_model.project_root,
+                              parent, self.sync_status_index, self.get_project_index(), self.project_sync_status,
+                              on_done=lambda rows: self.insert_tree_rows(tree, parent, rows, load))
+
+    def insert_tree_rows(self, tree: ttk.Treeview, parent: str, rows: list[tuple[str, bool, str]], load: object,
+                         start: int = 0) -> None:
+        """
+        Add TREE_ROWS_PER_CHUNK rows of a listed directory to the project tree, then let the main loop breathe before
+        adding the next chunk. Stops if the directory was listed again or went away in the meantime.
+
+        :param tree: The ttk.Treeview.
+        :param parent: A str - the item id of the directory.
+        :param rows: The list from list_tree_children.
+        :param load: The object load_tree_children made for this listing.
+        :param start: An int - the first row to add. Defaults to 0.
+        :return: None.
+        """
+        if self.project_tree_loads.get(parent) is not load:
+            return
+        try:
+            if parent and not tree.exists(parent):
+                self.project_tree_loads.pop(parent, None)
+                return
+            if start == 0:
+                tree.delete(*tree.get_children(parent))
+            for name, is_dir, size in rows[start:start + TREE_ROWS_PER_CHUNK]:
+                item = f"{parent}/{name}" if parent else name
+                tree.insert(parent, tk.END, iid=item, text=name, values=("", size), open=False)
+                if is_dir:
+                    self.project_tree_directories.add(item)
+                    tree.insert(item, tk.END, iid=item + "/", text="...")
+                self.show_tree_item_status(tree, item, is_dir)
+            if start + TREE_ROWS_PER_CHUNK < len(rows):
+                tree.after(1, self.insert_tree_rows, tree, parent, rows, load, start + TREE_ROWS_PER_CHUNK)
+                return
+        except tk.TclError:
+            pass
+        self.project_tree_loads.pop(parent, None)
+
+    def show_tree_item_status(self, tree: ttk.Treeview, item: str, is_dir: bool) -> None:
+        """
+        Show the sync status of one item in the project tree.
+
+        :param tree: The ttk.Treeview.
+        :param item: A str - the item id, which is the path relative to the project root.
+        :param is_dir: A bool - whether the item is a directory.
+        :return: None.
+        """
+        if self.project_sync_status is None:
+            status = "..."
+        elif is_dir:
+            status = self.project_sync_status.directory_summary(item)
+        else:
+            status = self.project_sync_status.status(item)
+        tag = status.split(", ")[0].lstrip("0123456789 ") if is_dir else status
+        tree.set(item, "status", status)
+        tree.item(item, tags=(tag, ))
+
+    def show_project_status(self, tree: ttk.Treeview, status: sync_status.SyncStatus) -> None:
+        """
+        Put the computed sync status on the items that have been loaded so far.
+
+        :param tree: The ttk.Treeview.
+        :param status: The SyncStatus.
+        :return: None.
+        """
+        self.project_sync_status = status
+        try:
+            if not tree.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        expanded = [""]
+        while expanded:
+            parent = expanded.pop()
+            children = tree.get_children(parent)
+            if parent and children == (parent + "/", ):
+                # Not loaded yet - the status is filled in when it is expanded
+                continue
+            for item in children:
+                is_dir = item in self.project_tree_directories
+                self.show_tree_item_status(tree, item, is_dir)
+                if is_dir:
+                    expanded.append(item)
+        # Device-only files only show up once the status is known
+        if status.device_only_children(""):
+            self.load_tree_children(tree, "")
+
+    def open_project_tree(self) -> None:
+        """
+        Show the project's files as a tree, with whether each one is in sync with the device. Directories are listed
+        when they are expanded and the sync status is worked out in the background, so big projects open quickly.
+
+        :return: None.
+        """
+        if self.project_model is None:
+            return
+        self.project_sync_status = None
+        self.project_tree_directories = set()
+        # Item id of a directory being listed -> the object that identifies that listing
+        self.project_tree_loads = {}
+        dlg = self.create_dialog("CircuitPython Project Manager: Project files")
+        dlg.resizable(True, True)
+        dlg.columnconfigure(0, weight=1)
+        dlg.rowconfigure(0, weight=1)
+        tree = ttk.Treeview(master=dlg, columns=("status", "size"), height=20, selectmode=tk.BROWSE)
+        tree.heading("#0", text="File")
+        tree.heading("status", text="Sync status")
+        tree.heading("size", text="Size")
+        tree.column("#0", width=300)
+        tree.column("status", width=200)
+        tree.column("size", width=80, anchor=tk.E)
+        tree.tag_configure(sync_status.MODIFIED, foreground="dark orange")
+        tree.tag_configure(sync_status.NEW, foreground="blue")
+        tree.tag_configure(sync_status.DEVICE_ONLY, foreground="red")
+        tree.tag_configure(sync_status.NOT_SYNCED, foreground="gray")
+        tree.tag_configure(sync_status.EXCLUDED, foreground="gray")
+        tree.grid(row=0, column=0, padx=1, pady=1, sticky=tk.NSEW)
+        scrollbar = ttk.Scrollbar(master=dlg, command=tree.yview)
+        scrollbar.grid(row=0, column=1, padx=0, pady=1, sticky=tk.NS)
+        tree.config(yscrollcommand=scrollbar.set)
+
+        def expanded(_) -> None:
+            item = tree.focus()
+            if tree.get_children(item) == (item + "/", ) and item not in self.project_tree_loads:
+                self.load_tree_children(tree, item)
+
+        def refresh() -> None:
+            self.project_sync_status = None
+            self.load_tree_children(tree, "")
+            self.scheduler.submit("Check sync status", self.compute_sync_status, self.project_model.config,
+                                  self.get_project_index(),
+                                  on_done=lambda status: self.show_project_status(tree, status))
+
+        tree.bind("<<TreeviewOpen>>", expanded)
+        buttons_frame = ttk.Frame(master=dlg)
+        buttons_frame.grid(row=1, column=0, columnspan=2, padx=1, pady=1, sticky=tk.NSEW)
+        buttons_frame.columnconfigure(1, weight=1)
+        ttk.Button(master=buttons_frame, text="Refresh", command=refresh).grid(row=0, column=0, padx=1, pady=1,
+                                                                              sticky=tk.W)
+        ttk.Button(master=buttons_frame, text="Close",
+                   command=lambda: self.dismiss_dialog(dlg)).grid(row=0, column=2, padx=1, pady=1, sticky=tk.E)
+        refresh()
+
+    def open_readme(self, task: Task, path: Path, convert_to_html: bool) -> None:
+        """
+        Render and open the README - this runs as a task.
+
+        :param task: The Task running this.
+        :param path: A pathlib.Path to the README.
+        :param convert_to_html: A bool on whether to convert the markdown to HTML or not.
+        :return: None.
+        """
+        with profiling.profiled("render README"):
+            self.show_markdown(path, convert_to_html)
+
+    def start_open_readme(self) -> None:
+        """
+        Open the README. Rendering happens as a task - if the README is missing, the download dialogs are shown
+        right away instead.
+
+        :return: None.
+        """
+        path = Path.cwd() / "README.md"
+        if not path.exists():
+            self.open_markdown(path, convert_to_html=self.convert_to_md_var.get(),
+                               download_url="https://raw.githubusercontent.com/UnsignedArduino/CircuitPython-Project-Manager/main/README.md")
+            return
         self.disable_open_readme = True
-        thread = Thread(target=self.open_readme, args=(), daemon=True)
-        logger.debug(f"Starting open README thread {repr(thread)}")
-        thread.start()
+
+        def finished(*_) -> None:
+            self.disable_open_readme = False
+
+        self.scheduler.submit("Open README", self.open_readme, path, self.convert_to_md_var.get(),
+                              on_done=finished, on_error=finished)
 
     def create_help_menu(self) -> None:
         """
@@ -694,12 +1204,15 @@ class GUI(tk.Tk):
         self.help_menu.add_command(label="Open logs", command=lambda: self.open_file(str(Path.cwd() / "log.log")), underline=5)
         self.help_menu.add_separator()
         self.help_menu.add_command(label="Open README.md",
-                                   command=self.start_open_readme_thread, underline=5,
+                                   command=self.start_open_readme, underline=5,
                                    accelerator="F1")
-        self.bind("<F1>", func=lambda _: None if self.help_menu.entrycget("Open README.md", "state") == tk.DISABLED else self.start_open_readme_thread())
+        self.bind("<F1>", func=lambda _: None if self.help_menu.entrycget("Open README.md", "state") == tk.DISABLED else self.start_open_readme())
         self.convert_to_md_var = tk.BooleanVar(value=True)
         self.disable_open_readme = False
         self.help_menu.add_checkbutton(label="Convert Markdown to HTML", variable=self.convert_to_md_var, onvalue=True, offvalue=False)
+        self.profile_var = tk.BooleanVar(value=profiling.is_enabled())
+        self.help_menu.add_checkbutton(label="Profile operations", variable=self.profile_var, onvalue=True,
+                                       offvalue=False, command=lambda: profiling.set_enabled(self.profile_var.get()))
         self.help_menu.add_command(label="Open project on GitHub",
                                    command=lambda: self.open_file("https://github.com/UnsignedArduino/CircuitPython-Project-Manager"),
                                    underline=5)
@@ -734,8 +1247,14 @@ class GUI(tk.Tk):
                                       state=tk.DISABLED if self.cpypmconfig_path is None else tk.NORMAL)
         self.edit_menu.entryconfigure("Discard changes",
                                       state=tk.DISABLED if self.cpypmconfig_path is None else tk.NORMAL)
+        self.sync_menu.entryconfigure("Add project to workspace...",
+                                      state=tk.DISABLED if self.cpypmconfig_path is None else tk.NORMAL)
+        self.sync_menu.entryconfigure("Project files...",
+                                      state=tk.DISABLED if self.cpypmconfig_path is None else tk.NORMAL)
         try:
-            if self.cpypmconfig_path is None or json.loads(self.cpypmconfig_path.read_text())["sync_location"] is None:
+            if self.project_model is not None:
+                self.project_model.refresh()
+            if self.project_model is None or self.project_model.sync_location is None:
                 self.sync_menu.entryconfigure("Sync files", state=tk.DISABLED)
             else:
                 self.sync_menu.entryconfigure("Sync files", state=tk.NORMAL)
@@ -745,6 +1264,12 @@ class GUI(tk.Tk):
             mbox.showerror("CircuitPython Project Manager: Error!",
                            "Your project's .cpypmconfig file cannot be accessed, closing project!"
                            "\n\n" + (traceback.format_exc() if self.show_traceback() else ""))
+        except ConfigValidationError:
+            logger.exception("Uh oh, an exception has occurred!")
+            self.close_project()
+            mbox.showerror("CircuitPython Project Manager: Error!",
+                           "Your project's .cpypmconfig file is not valid, closing project!"
+                           "\n\n" + (traceback.format_exc() if self.show_traceback() else ""))
         self.help_menu.entryconfigure("Open README.md", state=tk.DISABLED if self.disable_open_readme else tk.NORMAL)
         self.help_menu.entryconfigure("Convert Markdown to HTML", state=tk.DISABLED if self.disable_open_readme else tk.NORMAL)
 
@@ -761,7 +1286,7 @@ class GUI(tk.Tk):
         self.create_edit_menu()
         self.create_sync_menu()
         self.create_help_menu()
-        self.cpypmconfig_path = None
+        self.set_project_path(None)
         self.update_menu_state()
 
     def destroy_all_children(self, widget):
@@ -820,21 +1345,40 @@ class GUI(tk.Tk):
 
     def update_drives(self) -> None:
         """
-        Update all the drives connected.
+        Update all the drives connected. The drives are listed as a task.
 
         :return: None.
         """
+        self.scheduler.submit("Refresh drives", self.list_drives, not self.drive_selector_show_all_var.get(),
+                              Path(self.load_key("unix_drive_mount_point")), on_done=self.show_drives,
+                              on_error=self.list_drives_failed)
+
+    @staticmethod
+    def list_drives(task: Task, circuitpython_only: bool, drive_mount_point: Path) -> list[Path]:
+        """
+        List the connected drives - this runs as a task.
+
+        :param task: The Task running this.
+        :param circuitpython_only: A bool telling whether to filter out non-CircuitPython drives.
+        :param drive_mount_point: A pathlib.Path to where drives are mounted.
+        :return: A list of pathlib.Path.
+        """
+        with profiling.profiled("refresh drives"):
+            return drives.list_connected_drives(circuitpython_only, drive_mount_point)
+
+    def show_drives(self, connected_drives: list[Path]) -> None:
+        logger.debug(f"Connected drives: {repr(connected_drives)}")
         try:
-            connected_drives = drives.list_connected_drives(not self.drive_selector_show_all_var.get(),
-                                                            Path(self.load_key("unix_drive_mount_point")))
-        except OSError:
-            logger.error(f"Could not get connected drives!\n\n{traceback.format_exc()}")
-            mbox.showerror("CircuitPython Project Manager: ERROR!",
-                           "Oh no! An error occurred while getting a list of connected drives!"
-                           "\n\n" + (traceback.format_exc() if self.show_traceback() else ""))
+            self.drive_selector_combobox["values"] = connected_drives
+        except tk.TclError:
+            # The project was closed while the drives were being listed
             return
-        logger.debug(f"Connected drives: {repr(connected_drives)}")
-        self.drive_selector_combobox["values"] = connected_drives
+        self.check_sync_device_later()
+
+    def list_drives_failed(self, error: Exception, formatted_traceback: str) -> None:
+        mbox.showerror("CircuitPython Project Manager: ERROR!",
+                       "Oh no! An error occurred while getting a list of connected drives!"
+                       "\n\n" + (formatted_traceback if self.show_traceback() else ""))
 
     def make_drive_selector(self, drive: Path) -> None:
         """
@@ -865,7 +1409,6 @@ class GUI(tk.Tk):
                                                                 variable=self.drive_selector_show_all_var, command=self.update_drives)
         self.drive_selector_show_all_checkbtn.grid(row=0, column=3, padx=1, pady=1, sticky=tk.NW)
         self.add_tooltip(self.drive_selector_show_all_checkbtn, "Whether to show all drives in the list of connected drives instead of just CircuitPython drives.")
-        self.update_drives()
 
     def update_listbox_context(self):
         """
@@ -906,18 +1449,28 @@ class GUI(tk.Tk):
         self.to_sync_scrollbar.grid(row=1, column=1, padx=0, pady=1, sticky=tk.NSEW)
         self.to_sync_listbox.config(yscrollcommand=self.to_sync_scrollbar.set)
 
-    def update_file_sync_buttons(self) -> None:
+    def update_file_sync_buttons(self, selection: tuple = ()) -> None:
         """
-        Update the file sync buttons.
+        Update the file sync buttons. This is called whenever the selection in the listbox changes.
 
+        :param selection: A tuple of the selected indices.
         :return: None.
         """
         try:
-            self.to_sync_remove_btn.config(state=tk.NORMAL if len(self.to_sync_listbox.curselection()) > 0 else tk.DISABLED)
+            self.to_sync_remove_btn.config(state=tk.NORMAL if len(selection) > 0 else tk.DISABLED)
+        except tk.TclError:
+            pass
+
+    def update_to_sync_selection(self, *_) -> None:
+        """
+        Copy the listbox's selection into its observable.
+
+        :return: None.
+        """
+        try:
+            self.to_sync_selection.set(tuple(self.to_sync_listbox.curselection()))
         except tk.TclError:
             pass
-        else:
-            self.after(ms=100, func=self.update_file_sync_buttons)
 
     def add_file_to_sync(self) -> None:
         """
@@ -926,13 +1479,13 @@ class GUI(tk.Tk):
         :return: None.
         """
         logger.debug("Opening file to sync...")
-        path = fd.askopenfilename(initialdir=self.cpypmconfig["project_root"],
+        path = fd.askopenfilename(initialdir=str(self.cpypmconfig.project_root),
                                   title="CircuitPython Project Manager: Select a file to sync")
         if path:
             path = Path(path)
             logger.debug(f"Returned valid path! Path is {repr(path)}")
             try:
-                relative_path = path.relative_to(Path(self.cpypmconfig["project_root"]))
+                relative_path = path.relative_to(self.cpypmconfig.project_root)
             except ValueError:
                 logger.warning(f"{repr(path)} is not in the project!")
                 mbox.showerror("CircuitPython Project Manager: Error",
@@ -940,15 +1493,15 @@ class GUI(tk.Tk):
                                "\n\n" + (traceback.format_exc() if self.show_traceback() else ""))
                 return
             logger.debug(f"Relative path is {repr(relative_path)}")
-            logger.debug(f"Files and directories to sync: {repr(self.cpypmconfig['files_to_sync'])}")
-            if str(relative_path) in self.cpypmconfig["files_to_sync"]:
-                logger.warning(f"{repr(relative_path)} is already in {repr(self.cpypmconfig['files_to_sync'])}")
+            logger.debug(f"Files and directories to sync: {repr(self.files_to_sync)}")
+            if relative_path.as_posix() in self.files_to_sync:
+                logger.warning(f"{repr(relative_path)} is already in {repr(self.files_to_sync)}")
                 mbox.showwarning("CircuitPython Project Manager: Warning",
                                  "That file has already been added!")
             else:
-                self.cpypmconfig["files_to_sync"].append(str(relative_path))
-                self.to_sync_var.set(self.cpypmconfig["files_to_sync"])
-                self.to_sync_listbox.see(len(self.cpypmconfig["files_to_sync"]) - 1)
+                self.files_to_sync.append(relative_path.as_posix())
+                self.to_sync_var.set(self.files_to_sync)
+                self.to_sync_listbox.see(len(self.files_to_sync) - 1)
         else:
             logger.debug("User canceled adding file to sync!")
 
@@ -959,13 +1512,13 @@ class GUI(tk.Tk):
         :return: None.
         """
         logger.debug("Opening file to sync...")
-        path = fd.askdirectory(initialdir=self.cpypmconfig["project_root"],
+        path = fd.askdirectory(initialdir=str(self.cpypmconfig.project_root),
                                title="CircuitPython Project Manager: Select a directory to sync")
         if path:
             path = Path(path)
             logger.debug(f"Returned valid path! Path is {repr(path)}")
             try:
-                relative_path = path.relative_to(Path(self.cpypmconfig["project_root"]))
+                relative_path = path.relative_to(self.cpypmconfig.project_root)
             except ValueError:
                 logger.warning(f"{repr(path)} is not in the project!")
                 mbox.showerror("CircuitPython Project Manager: Error",
@@ -973,15 +1526,15 @@ class GUI(tk.Tk):
                                "\n\n" + (traceback.format_exc() if self.show_traceback() else ""))
                 return
             logger.debug(f"Relative path is {repr(relative_path)}")
-            logger.debug(f"Files and directories to sync: {repr(self.cpypmconfig['files_to_sync'])}")
-            if str(relative_path) in self.cpypmconfig["files_to_sync"]:
-                logger.warning(f"{repr(relative_path)} is already in {repr(self.cpypmconfig['files_to_sync'])}")
+            logger.debug(f"Files and directories to sync: {repr(self.files_to_sync)}")
+            if relative_path.as_posix() in self.files_to_sync:
+                logger.warning(f"{repr(relative_path)} is already in {repr(self.files_to_sync)}")
                 mbox.showwarning("CircuitPython Project Manager: Warning",
                                  "That directory has already been added!")
             else:
-                self.cpypmconfig["files_to_sync"].append(str(relative_path))
-                self.to_sync_var.set(self.cpypmconfig["files_to_sync"])
-                self.to_sync_listbox.see(len(self.cpypmconfig["files_to_sync"]) - 1)
+                self.files_to_sync.append(relative_path.as_posix())
+                self.to_sync_var.set(self.files_to_sync)
+                self.to_sync_listbox.see(len(self.files_to_sync) - 1)
         else:
             logger.debug("User canceled adding directory to sync!")
 
@@ -996,8 +1549,8 @@ class GUI(tk.Tk):
         if mbox.askokcancel("CircuitPython Project Manager: Confirm",
                            f"Are you sure you want to remove {repr(item)} from being synced?"):
             logger.debug(f"Removing item {repr(item)} (at index {repr(self.to_sync_listbox.curselection()[0])}")
-            self.cpypmconfig["files_to_sync"].pop(self.to_sync_listbox.curselection()[0])
-            self.to_sync_var.set(self.cpypmconfig["files_to_sync"])
+            self.files_to_sync.pop(self.to_sync_listbox.curselection()[0])
+            self.to_sync_var.set(self.files_to_sync)
         else:
             logger.debug(f"User canceled removal!")
 
@@ -1021,7 +1574,10 @@ class GUI(tk.Tk):
                                              command=self.remove_thing_to_sync)
         self.to_sync_remove_btn.grid(row=2, column=0, padx=1, pady=1, sticky=tk.NW)
         self.add_tooltip(self.to_sync_remove_btn, "Remove a file/directory from being synced.")
-        self.update_file_sync_buttons()
+        self.to_sync_selection = reactive.Observable(())
+        self.to_sync_selection.subscribe(self.update_file_sync_buttons)
+        self.to_sync_listbox.bind("<<ListboxSelect>>", self.update_to_sync_selection, add="+")
+        reactive.from_variable(self.to_sync_var).subscribe(self.update_to_sync_selection, call_now=False)
 
     def save_modified(self) -> None:
         """
@@ -1030,15 +1586,17 @@ class GUI(tk.Tk):
         :return: None.
         """
         self.set_childrens_state(frame=self.main_frame, enabled=False)
-        self.disable_closing = True
         self.edit_menu.entryconfigure("Save changes", state=tk.DISABLED)
         self.edit_menu.entryconfigure("Discard changes", state=tk.DISABLED)
         logger.debug(f"Saving .cpypmconfig to {repr(self.cpypmconfig_path)}")
-        self.cpypmconfig["project_name"] = self.title_var.get()
-        self.cpypmconfig["description"] = self.description_text.get("1.0", tk.END)
-        self.cpypmconfig["sync_location"] = self.drive_selector_combobox.get()
+        self.cpypmconfig = self.cpypmconfig.replace(project_name=self.title_var.get(),
+                                                    description=self.description_text.get("1.0", "end-1c"),
+                                                    sync_location=self.drive_selector_combobox.get(),
+                                                    files_to_sync=self.files_to_sync)
         try:
-            self.cpypmconfig_path.write_text(json.dumps(self.cpypmconfig, indent=4))
+            self.project_model.save(self.cpypmconfig)
+            self.saved_sync_location.set(self.cpypmconfig.sync_location)
+            self.check_sync_device_later()
         except FileNotFoundError:
             logger.exception("Uh oh, an exception has occurred!")
             self.close_project()
@@ -1047,7 +1605,6 @@ class GUI(tk.Tk):
                            "\n\n" + (traceback.format_exc() if self.show_traceback() else ""))
         else:
             self.set_childrens_state(frame=self.main_frame, enabled=True)
-            self.disable_closing = False
             self.edit_menu.entryconfigure("Save changes", state=tk.NORMAL)
             self.edit_menu.entryconfigure("Discard changes", state=tk.NORMAL)
 
@@ -1071,54 +1628,140 @@ class GUI(tk.Tk):
                            "Your project's .cpypmconfig file cannot be accessed, closing project!"
                            "\n\n" + (traceback.format_exc() if self.show_traceback() else ""))
 
-    def sync(self) -> None:
+    def sync(self, task: Task, model: ProjectModel, index: ProjectIndex) -> None:
         """
-        Sync the files - this will block.
+        Sync the files - this runs as a task.
 
+        :param task: The Task running this.
+        :param model: The ProjectModel of the project to sync.
+        :param index: The ProjectIndex of the project.
+        :raise TaskCancelled: Raises TaskCancelled if the user cancelled the sync.
         :return: None.
         """
-        try:
-            project.sync_project(self.cpypmconfig_path)
-        except ValueError:
-            logger.exception("Uh oh, an exception has occurred!")
-            mbox.showerror("CircuitPython Project Manager: Error!",
-                           "The sync location has not been set!"
-                           "\n\n" + (traceback.format_exc() if self.show_traceback() else ""))
-        except Exception as _:
-            mbox.showerror("CircuitPython Project Manager: Error!",
-                           "Uh oh! An unknown exception occurred!"
-                           "\n\n" + (traceback.format_exc() if self.show_traceback() else ""))
+        with profiling.profiled("sync"):
+            try:
+                index.refresh()
+                project.sync_project(model, progress=self.store_sync_progress, should_cancel=lambda: task.cancelled,
+                                     index=index)
+            except project.SyncCancelled as error:
+                raise TaskCancelled(str(error)) from error
+        self.recent.add(model.path, model.config)
+        self.recent.record_sync(model.path, model.sync_location)
+
+    def store_sync_progress(self, progress: project.SyncProgress) -> None:
+        """
+        Keep the latest progress of the sync. Called on the sync's thread for every file, so it does nothing else -
+        update_sync_progress picks it up at a fixed rate.
+
+        :param progress: The SyncProgress.
+        :return: None.
+        """
+        self.sync_progress = progress
+
+    def update_sync_progress(self) -> None:
+        """
+        Show the latest sync progress in the sync dialog, then do it again in SYNC_PROGRESS_MS.
+
+        :return: None.
+        """
+        progress = self.sync_progress
+        if progress is not None:
+            self.sync_progress_bar.config(value=progress.fraction * 100)
+            if not self.sync_task.cancelled:
+                self.sync_label.config(text=f"Copying {progress.current_file}" if progress.current_file
+                                       else "Syncing files...")
+            eta = progress.eta_seconds
+            self.sync_stats_label.config(
+                text=f"{progress.files_done} of {progress.files_total} files, "
+                     f"{progress.bytes_done / 1024:.1f} of {progress.bytes_total / 1024:.1f} kB, "
+                     f"{progress.bytes_per_second / 1024:.1f} kB/s" +
+                     ("" if eta is None else f", about {eta:.0f}s left")
+            )
+        self.sync_progress_after = self.after(SYNC_PROGRESS_MS, self.update_sync_progress)
+
+    def cancel_sync(self) -> None:
+        """
+        Ask the sync to stop after the file it is copying.
+
+        :return: None.
+        """
+        logger.info("Cancelling sync")
+        self.sync_task.cancel()
+        self.sync_cancel_btn.config(state=tk.DISABLED)
+        self.sync_label.config(text="Cancelling after the current file...")
+
+    def finish_sync(self, *_) -> None:
+        """
+        Close the sync dialog and let the user work on the project again.
+
+        :return: None.
+        """
+        self.after_cancel(self.sync_progress_after)
+        self.update_recent_projects()
         self.set_childrens_state(self.main_frame, True)
-        self.disable_closing = False
         self.sync_menu.entryconfigure("Sync files", state=tk.NORMAL)
         self.dismiss_dialog(self.sync_dialog)
 
-    def start_sync_thread(self) -> None:
+    def sync_failed(self, error: Exception, formatted_traceback: str) -> None:
+        if isinstance(error, ConfigValidationError):
+            message = f"The .cpypmconfig file is not valid: {error}"
+        elif isinstance(error, ValueError) and str(error) == project.NO_SYNC_LOCATION:
+            message = "The sync location has not been set!"
+        elif isinstance(error, (OSError, ValueError)):
+            message = f"{type(error).__name__}: {error}"
+        else:
+            message = "Uh oh! An unknown exception occurred!"
+        mbox.showerror("CircuitPython Project Manager: Error!",
+                       message + "\n\n" + (formatted_traceback if self.show_traceback() else ""))
+        self.finish_sync()
+
+    def start_sync(self) -> None:
         """
-        Start the sync files thread.
+        Start syncing the files as a task, with a dialog showing its progress.
 
         :return: None.
         """
         self.set_childrens_state(self.main_frame, False)
-        self.disable_closing = True
         self.sync_menu.entryconfigure("Sync files", state=tk.DISABLED)
         self.sync_dialog = self.create_dialog("CircuitPython Project Manager: Syncing files...")
         self.sync_dialog.protocol("WM_DELETE_WINDOW", None)
-        self.sync_label = ttk.Label(master=self.sync_dialog, text="Syncing files...")
-        self.sync_label.grid(row=0, column=0, padx=1, pady=1, sticky=tk.NW)
-        thread = Thread(target=self.sync, args=(), daemon=True)
-        logger.debug(f"Starting sync thread {repr(thread)}")
-        thread.start()
+        self.sync_label = ttk.Label(master=self.sync_dialog, text="Comparing files...", width=50)
+        self.sync_label.grid(row=0, column=0, columnspan=2, padx=1, pady=1, sticky=tk.NW)
+        self.sync_progress_bar = ttk.Progressbar(master=self.sync_dialog, orient=tk.HORIZONTAL, length=350,
+                                                 mode="determinate", maximum=100)
+        self.sync_progress_bar.grid(row=1, column=0, columnspan=2, padx=1, pady=1, sticky=tk.NW)
+        self.sync_stats_label = ttk.Label(master=self.sync_dialog)
+        self.sync_stats_label.grid(row=2, column=0, padx=1, pady=1, sticky=tk.NW)
+        self.sync_cancel_btn = ttk.Button(master=self.sync_dialog, text="Cancel", command=self.cancel_sync)
+        self.sync_cancel_btn.grid(row=2, column=1, padx=1, pady=1, sticky=tk.NE)
+        self.add_tooltip(self.sync_cancel_btn, "Stop syncing after the file being copied right now.")
+        self.sync_progress = None
+        self.sync_task = self.scheduler.submit("Sync files", self.sync, self.project_model, self.get_project_index(),
+                                               on_done=self.finish_sync, on_error=self.sync_failed,
+                                               on_cancel=self.finish_sync, blocks_close=True)
+        self.update_sync_progress()
+
+    def check_sync_device(self) -> None:
+        """
+        Check whether the saved sync location exists. Called (debounced) when the sync location is saved, when the
+        drives are refreshed and when the user comes back to the window, instead of polling.
 
-    def check_sync_buttons(self) -> None:
+        :return: None.
+        """
+        sync_location = self.saved_sync_location.get()
+        self.sync_device_present.set(sync_location is not None and sync_location.exists())
+
+    def update_sync_buttons(self, can_sync: bool) -> None:
+        """
+        Update the sync button.
+
+        :param can_sync: A bool - whether the device to sync to is set and connected.
+        :return: None.
+        """
         try:
-            self.sync_files_btn.config(
-                state=tk.DISABLED if not self.cpypmconfig["sync_location"] or not Path(self.cpypmconfig["sync_location"]).exists() else tk.NORMAL
-            )
+            self.sync_files_btn.config(state=tk.NORMAL if can_sync else tk.DISABLED)
         except tk.TclError:
             pass
-        else:
-            self.after(ms=100, func=self.check_sync_buttons)
 
     def make_save_and_sync_buttons(self) -> None:
         """
@@ -1132,48 +1775,76 @@ class GUI(tk.Tk):
         self.discard_config_btn = ttk.Button(master=self.right_frame, text="Discard", width=12, command=self.discard_modified)
         self.discard_config_btn.grid(row=5, column=0, padx=1, pady=1, sticky=tk.NW)
         self.add_tooltip(self.discard_config_btn, "Discard changes and reload the .cpypmconfig file from disk")
-        self.sync_files_btn = ttk.Button(master=self.right_frame, text="Sync", width=12, command=self.start_sync_thread)
+        self.sync_files_btn = ttk.Button(master=self.right_frame, text="Sync", width=12, command=self.start_sync)
         self.sync_files_btn.grid(row=6, column=0, padx=1, pady=1, sticky=tk.NW)
         self.add_tooltip(self.sync_files_btn, "Sync the files to the CircuitPython drive.")
-        self.check_sync_buttons()
+        self.can_sync.subscribe(self.update_sync_buttons)
+
+    def show_project(self, config: ProjectConfig) -> None:
+        """
+        Put a project's config on screen, changing only the widgets that show something different.
+
+        :param config: The ProjectConfig to show.
+        :return: None.
+        """
+        self.cpypmconfig = config
+        changed = []
+        if self.title_var.get() != config.project_name:
+            self.title_var.set(config.project_name)
+            changed.append("title")
+        if self.description_text.get("1.0", "end-1c") != config.description:
+            self.description_text.delete("1.0", tk.END)
+            self.description_text.insert("1.0", config.description)
+            changed.append("description")
+        sync_location = "" if config.sync_location is None else str(config.sync_location)
+        if self.drive_selector_var.get() != sync_location:
+            self.drive_selector_var.set(sync_location)
+            changed.append("drive")
+        if self.files_to_sync != list(config.files_to_sync):
+            self.files_to_sync = list(config.files_to_sync)
+            self.to_sync_var.set(self.files_to_sync)
+            changed.append("files to sync")
+        self.saved_sync_location.set(config.sync_location)
+        self.check_sync_device()
+        logger.debug(f"Changed on screen: {', '.join(changed) if changed else 'nothing'}")
 
     def update_main_gui(self) -> None:
         """
-        Update the main GUI.
+        Show the opened project, or that no project is open. The widgets are only created once - this just updates
+        the ones whose values changed.
 
         :return: None.
         """
-        self.disable_closing = True
         self.update_menu_state()
-        logger.debug("Updating main GUI...")
-        self.destroy_all_children(widget=self.main_frame)
-        self.after(ms=200, func=self.create_main_gui)
+        logger.debug(f"Updating main GUI for {repr(self.cpypmconfig_path)}...")
+        if self.cpypmconfig_path is None:
+            logger.info("No project is open!")
+            self.main_frame.grid_remove()
+            self.no_project_label.grid()
+            self.displayed_project_path = None
+            return
+        self.project_model.refresh()
+        self.show_project(self.project_model.config)
+        self.no_project_label.grid_remove()
+        self.main_frame.grid()
+        if self.displayed_project_path != self.cpypmconfig_path:
+            logger.info(f"Showing project {repr(self.cpypmconfig_path)}")
+            self.displayed_project_path = self.cpypmconfig_path
+            self.update_drives()
 
     def create_main_gui(self) -> None:
         """
-        Create the main GUI.
+        Create the main GUI's widgets, empty. update_main_gui fills them in.
 
         :return: None.
         """
-        logger.debug(f"self.cpypmconfig_path: {repr(self.cpypmconfig_path)}")
-        if self.cpypmconfig_path is None:
-            logger.info("No project is open!")
-            ttk.Label(
-                master=self.main_frame,
-                text="No project is open! Use the file menu to create\na new project or open an existing project!"
-            ).grid(row=0, column=0, sticky=tk.NW)
-        else:
-            logger.info("Project is open - (re)loading everything!")
-            logger.debug(f"Parsing {repr(self.cpypmconfig_path)}")
-            self.cpypmconfig = json.loads(self.cpypmconfig_path.read_text())
-            self.make_title(self.cpypmconfig["project_name"])
-            self.make_description(self.cpypmconfig["description"])
-            self.make_drive_selector(self.cpypmconfig["sync_location"])
-            self.make_file_sync_listbox(self.cpypmconfig["files_to_sync"], Path(self.cpypmconfig["project_root"]))
-            self.make_file_sync_buttons()
-            ttk.Separator(master=self.right_frame, orient=tk.HORIZONTAL).grid(row=3, column=0, padx=1, pady=1, sticky=tk.NW + tk.E)
-            self.make_save_and_sync_buttons()
-        self.disable_closing = False
+        self.make_title("")
+        self.make_description("")
+        self.make_drive_selector(None)
+        self.make_file_sync_listbox(self.files_to_sync, None)
+        self.make_file_sync_buttons()
+        ttk.Separator(master=self.right_frame, orient=tk.HORIZONTAL).grid(row=3, column=0, padx=1, pady=1, sticky=tk.NW + tk.E)
+        self.make_save_and_sync_buttons()
 
     def make_main_gui(self, cpypmconfig_path: Path = None) -> None:
         """
@@ -1184,9 +1855,55 @@ class GUI(tk.Tk):
         """
         self.main_frame = ttk.Frame(master=self)
         self.main_frame.grid(row=0, column=0, sticky=tk.NW)
-        self.cpypmconfig_path = cpypmconfig_path
+        self.no_project_label = ttk.Label(
+            master=self,
+            text="No project is open! Use the file menu to create\na new project or open an existing project!"
+        )
+        self.no_project_label.grid(row=0, column=0, sticky=tk.NW)
+        self.files_to_sync = []
+        self.displayed_project_path = None
+        self.saved_sync_location = reactive.Observable(None)
+        self.sync_device_present = reactive.Observable(False)
+        self.can_sync = reactive.Derived([self.saved_sync_location, self.sync_device_present],
+                                         lambda sync_location, present: sync_location is not None and present)
+        self.check_sync_device_later = reactive.Debouncer(self, 250, self.check_sync_device)
+        # A device could have been plugged in while the user was in another window
+        self.bind("<FocusIn>", self.check_sync_device_later, add="+")
+        self.create_main_gui()
+        self.set_project_path(cpypmconfig_path)
         self.update_main_gui()
 
+    def update_task_status(self, tasks: tuple[Task, ...]) -> None:
+        """
+        Show the queued and running tasks in the status bar.
+
+        :param tasks: A tuple of the queued and running Tasks.
+        :return: None.
+        """
+        if not tasks:
+            self.task_status_label.config(text="Ready")
+            return
+        descriptions = []
+        for task in tasks:
+            description = task.name
+            if task.state == QUEUED:
+                description += " (queued)"
+            elif task.progress is not None:
+                description += f" ({round(task.progress * 100)}%)"
+            descriptions.append(description)
+        self.task_status_label.config(text=", ".join(descriptions))
+
+    def make_task_status(self) -> None:
+        """
+        Make the status bar that shows what tasks are queued and running.
+
+        :return: None.
+        """
+        ttk.Separator(master=self, orient=tk.HORIZONTAL).grid(row=1, column=0, sticky=tk.EW)
+        self.task_status_label = ttk.Label(master=self, text="Ready")
+        self.task_status_label.grid(row=2, column=0, padx=1, pady=1, sticky=tk.SW)
+        self.scheduler.tasks.subscribe(self.update_task_status)
+
     def create_gui(self, cpypmconfig_path: Path = None) -> None:
         """
         Create the GUI.
@@ -1201,8 +1918,10 @@ class GUI(tk.Tk):
         self.create_config()
         self.create_menu()
         self.make_main_gui(cpypmconfig_path)
+        self.make_task_status()
         if cpypmconfig_path is not None:
             self.add_recent_project(cpypmconfig_path)
+        self.start_refresh_recent_projects()
 
     def run(self, cpypmconfig_path: Path = None) -> None:
         """
@@ -1217,6 +1936,9 @@ class GUI(tk.Tk):
         self.mainloop()
 
     def __exit__(self, err_type=None, err_value=None, err_traceback=None):
+        self.scheduler.shutdown()
+        self.config_store.flush()
+        logger.debug(f"UI state engine stats: {repr(reactive.stats())}")
         if err_type is not None:
             mbox.showerror("CircuitPython Project Manager: ERROR!",
                            "Oh no! A fatal error has occurred!\n"
@@ -21,13 +21,20 @@ import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox as mbox
 from pathlib import Path
-import requests
+from time import perf_counter
 import traceback
+from project_tools import metrics, tracing
 from project_tools.create_logger import create_logger
 import logging
 
 logger = create_logger(name=__name__, level=logging.DEBUG)
 
+DOWNLOAD_BYTES = metrics.counter("cpypm_download_bytes_total", "Bytes downloaded")
+DOWNLOAD_DURATION = metrics.histogram("cpypm_download_duration_seconds", "How long downloading a file takes")
+DOWNLOAD_THROUGHPUT = metrics.histogram("cpypm_download_throughput_bytes_per_second", "Download speed per file",
+                                        buckets=(16 * 1024, 64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2,
+                                                 16 * 1024 ** 2, 64 * 1024 ** 2))
+
 
 def close_window(window: tk.Toplevel) -> None:
     """
@@ -41,6 +48,7 @@ def close_window(window: tk.Toplevel) -> None:
     window.destroy()
 
 
+@tracing.traced("download_file")
 def download_file(status_widget: ttk.Label, url: str, path: Path) -> None:
     """
     Downloads a file to somewhere.
@@ -50,28 +58,36 @@ def download_file(status_widget: ttk.Label, url: str, path: Path) -> None:
     :param path: A pathlib.Path object that points to where to download.
     :return: None.
     """
+    import requests
     logger.debug(f"Downloading {repr(url)} to {repr(path)}")
+    start = perf_counter()
     req = requests.get(url=url, stream=True)
     total_length = req.headers.get("content-length")
     logger.debug(f"Length of data is {repr(total_length)}")
     data_length = 0
     if total_length is None:
+        data_length = len(req.content)
         path.write_bytes(req.content)
     else:
         with path.open(mode="wb") as file:
             file.seek(0)
             for chunk in req.iter_content(1024):
                 data_length += len(chunk)
-                logger.debug(f"Length of data currently is {data_length}")
+                logger.debug("Length of data currently is %d", data_length)
                 file.write(chunk)
                 text = f"{round(data_length / 1024, 2)}/{round(int(total_length) / 1024, 2)} kB"
-                logger.debug(f"Updated: {text}")
+                logger.debug("Updated: %s", text)
                 status_widget.config(text=text)
                 status_widget.update_idletasks()
             text = f"Wrote {round(int(total_length) / 1024, 2)} kB"
             logger.debug(f"Updated: {text}")
             status_widget.config(text=text)
             status_widget.update_idletasks()
+    duration = perf_counter() - start
+    DOWNLOAD_BYTES.inc(data_length)
+    DOWNLOAD_DURATION.observe(duration)
+    if duration > 0:
+        DOWNLOAD_THROUGHPUT.observe(data_length / duration)
 
 
 def download(master: tk.Tk, url: str, path: Path, show_traceback: bool = False) -> bool:
@@ -84,6 +100,8 @@ def download(master: tk.Tk, url: str, path: Path, show_traceback: bool = False)
     :param show_traceback: Whether to show tracebacks in the error messages.
     :return: A bool representing whether we succeeded or not downloading the file.
     """
+    # requests takes longer to import than the rest of the GUI, so it waits until something is downloaded
+    import requests
     dialog = tk.Toplevel(master=master)
     dialog.protocol("WM_DELETE_WINDOW", lambda: close_window(window=dialog))
     dialog.transient(master=master)
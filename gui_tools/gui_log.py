@@ -5,7 +5,7 @@ A module that logs to a tk.Text using the standard logging module.
 
 Classes list:
 
-- Logger(logging.Handler).__init__(self, master, row: int = 0, col: int = 0, rows: int = 10, cols: int = 32, scrollback: int = 2000, *args, **kwargs)
+- Logger(logging.Handler).__init__(self, master, row: int = 0, col: int = 0, rows: int = 10, cols: int = 32, scrollback: int = 2000, save_scrollback_callback: Callable = None, buffer_size: int = 10000, *args, **kwargs)
 
 -----------
 
@@ -19,16 +19,29 @@ import tkinter as tk
 from tkinter import ttk
 from gui_tools.right_click import text, spinbox
 from gui_tools.idlelib_clone import tooltip
+from gui_tools import reactive
+from collections import deque
 import logging
 from typing import Callable
 
+# How often (in milliseconds) the buffer is drained into the Text while records are coming in - at most about 20
+# times a second, so records that come in together are written together
+DRAIN_MS = 50
+# How often the buffer is checked once nothing has been logged for IDLE_DRAINS drains in a row
+IDLE_DRAIN_MS = 500
+IDLE_DRAINS = 10
+# The most records written to the Text per drain, so a flood of records can't freeze the window
+MAX_RECORDS_PER_DRAIN = 2000
+
 
 class Logger(logging.Handler):
     """
-    A tk.Tk that acts as a logging.Handler.
+    A tk.Tk that acts as a logging.Handler. It is safe to log to from any thread - emit() only appends the record to a
+    bounded buffer, which the Tk main loop drains on its own timer (slowing down while nothing is logged). If the
+    buffer fills up, the oldest records are dropped and counted in `dropped`.
     """
     def __init__(self, master, row: int = 0, col: int = 0, rows: int = 10, cols: int = 32, scrollback: int = 2000,
-                 save_scrollback_callback: Callable = None, *args, **kwargs):
+                 save_scrollback_callback: Callable = None, buffer_size: int = 10000, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.setLevel(logging.DEBUG)
         self.setFormatter(fmt=logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
@@ -47,9 +60,16 @@ class Logger(logging.Handler):
         self.bottom_frame.grid(row=2, column=0, columnspan=2, padx=1, pady=1)
         self.rows = rows
         self.scrollback = scrollback
+        self.line_count = 0
+        self.buffer = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self.reported_dropped = 0
+        # How many drains in a row found nothing to write
+        self.empty_drains = 0
         self.save_scrollback_callback = save_scrollback_callback
         self.make_scrollback_widgets()
         self.make_autoscroll_widgets()
+        self.log.after(DRAIN_MS, self.drain)
 
     def make_autoscroll_widgets(self) -> None:
         """
@@ -78,18 +98,20 @@ class Logger(logging.Handler):
 
         :return: None.
         """
-        delete_rows = self.log.get("1.0", tk.END).count("\n") - self.rows
+        delete_rows = self.line_count - self.rows
+        if delete_rows <= 0:
+            return
         self.log.config(state=tk.NORMAL)
         self.log.delete("1.0", f"{delete_rows + 1}.0")
         self.log.config(state=tk.DISABLED)
+        self.line_count -= delete_rows
 
     def save_scrollback(self) -> None:
         """
-        Remember the scrollback.
+        Remember the scrollback. This is called (debounced) whenever the scrollback spinbox changes.
 
-        :return:
+        :return: None.
         """
-        self.scrollback_spinbox.after(100, self.save_scrollback)
         if not self.scrollback_spinbox.last_scrollback == self.scrollback_spinbox.get():
             self.scrollback_spinbox.last_scrollback = self.scrollback_spinbox.get()
             try:
@@ -105,31 +127,96 @@ class Logger(logging.Handler):
         """
         ttk.Label(master=self.bottom_frame, text="Scrollback:").grid(row=0, column=0, padx=1, pady=1, sticky=tk.NW)
         self.check_num_wrapper = (self.frame.register(self.validate_for_number), "%P")
+        self.scrollback_var = tk.StringVar()
         self.scrollback_spinbox = spinbox.SpinboxWithRightClick(master=self.bottom_frame, from_=self.rows, to=10000,
                                                                 width=7, validate="key", increment=10,
-                                                                validatecommand=self.check_num_wrapper)
+                                                                validatecommand=self.check_num_wrapper,
+                                                                textvariable=self.scrollback_var)
         self.scrollback_spinbox.initiate_right_click_menu()
         self.scrollback_spinbox.grid(row=0, column=1, padx=1, pady=1, sticky=tk.NW)
         self.scrollback_spinbox.set(self.scrollback)
         self.scrollback_spinbox.last_scrollback = self.scrollback_spinbox.get()
-        self.save_scrollback()
+        self.scrollback_var.trace_add("write", reactive.Debouncer(self.frame, 500, self.save_scrollback))
         tooltip.Hovertip(self.scrollback_spinbox, text="How many lines to keep in the logs.")
         self.clear_scrollback_button = ttk.Button(master=self.bottom_frame, text="Clear", width=9,
                                                   command=self.clear_scrollback)
         self.clear_scrollback_button.grid(row=0, column=2, padx=1, pady=0, sticky=tk.NW)
         tooltip.Hovertip(self.clear_scrollback_button, text="Clear the scrollback.")
 
+    def get_scrollback(self) -> int:
+        """
+        Get how many lines to keep, falling back to the initial scrollback while the spinbox is being edited.
+
+        :return: An int.
+        """
+        try:
+            return max(int(self.scrollback_spinbox.get()), self.rows)
+        except ValueError:
+            return self.scrollback
+
     def emit(self, record) -> None:
         """
-        Log!
+        Log! This never touches Tk, so it can be called from any thread. logging.Handler.handle holds self.lock
+        around this, so the drop counter is exact.
 
         :param record: Something that logging uses to transfer messages.
         :return: None.
         """
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(record)
+
+    def drain(self) -> None:
+        """
+        Move records from the buffer into the Text with a single insert, then trim the scrollback with a single
+        delete. Runs on the Tk main loop and reschedules itself - every DRAIN_MS while records are coming in, every
+        IDLE_DRAIN_MS once it has found nothing IDLE_DRAINS times in a row.
+
+        :return: None.
+        """
+        records = []
+        try:
+            while len(records) < MAX_RECORDS_PER_DRAIN:
+                records.append(self.buffer.popleft())
+        except IndexError:
+            pass
+        lines = []
+        dropped = self.dropped
+        if dropped > self.reported_dropped:
+            lines.append(f"... {dropped - self.reported_dropped} log record(s) dropped because the log could not "
+                         f"keep up ({dropped} in total) ...")
+            self.reported_dropped = dropped
+        for record in records:
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                self.handleError(record)
+        try:
+            if lines:
+                self.write_lines(lines)
+        except tk.TclError:
+            pass
+        self.empty_drains = 0 if lines else self.empty_drains + 1
+        try:
+            self.log.after(DRAIN_MS if self.empty_drains < IDLE_DRAINS else IDLE_DRAIN_MS, self.drain)
+        except tk.TclError:
+            pass
+
+    def write_lines(self, lines: list[str]) -> None:
+        """
+        Append lines to the Text and trim the scrollback.
+
+        :param lines: A list of str.
+        :return: None.
+        """
+        text = "\n".join(lines) + "\n"
         self.log.config(state=tk.NORMAL)
-        self.log.insert(tk.END, self.format(record) + "\n")
+        self.log.insert(tk.END, text)
+        self.line_count += text.count("\n")
+        delete_rows = self.line_count - self.get_scrollback()
+        if delete_rows > 0:
+            self.log.delete("1.0", f"{delete_rows + 1}.0")
+            self.line_count -= delete_rows
         if self.autoscroll_checkbutton_var.get():
             self.log.see(tk.END)
-        while self.log.get("1.0", tk.END).count("\n") > int(self.scrollback_spinbox.get()):
-            self.log.delete("1.0", "2.0")
         self.log.config(state=tk.DISABLED)
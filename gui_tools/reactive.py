@@ -0,0 +1,177 @@
+"""
+A small reactive state layer so widget state is recomputed only when one of its inputs changes, instead of polling.
+
+-----------
+
+Classes list:
+
+- Observable.__init__(self, value: Any = None)
+- Derived(Observable).__init__(self, inputs: list[Observable], compute: Callable)
+- Debouncer.__init__(self, widget: tk.Widget, delay: int, callback: Callable)
+
+-----------
+
+Functions list:
+
+- from_variable(variable: tk.Variable) -> Observable
+- stats() -> dict
+
+"""
+
+import tkinter as tk
+from time import process_time
+from typing import Any, Callable
+
+_counters = {
+    "notifications": 0,
+    "recomputes": 0,
+    "debounced_calls": 0
+}
+
+
+def stats() -> dict:
+    """
+    How much work the reactive layer has done, to check that the UI stays idle when nothing happens.
+
+    :return: A dict with the number of notifications, recomputes and debounced calls, plus the process CPU time.
+    """
+    return dict(_counters, cpu_seconds=round(process_time(), 3))
+
+
+class Observable:
+    """
+    A value that tells its subscribers when it changes. Setting the same value again does nothing.
+    """
+    def __init__(self, value: Any = None):
+        self._value = value
+        self._subscribers = []
+
+    def get(self) -> Any:
+        return self._value
+
+    def set(self, value: Any) -> None:
+        """
+        Change the value and notify subscribers if it is different.
+
+        :param value: The new value.
+        :return: None.
+        """
+        if value == self._value:
+            return
+        self._value = value
+        self.notify()
+
+    def notify(self) -> None:
+        """
+        Tell every subscriber the current value, even if it didn't change.
+
+        :return: None.
+        """
+        _counters["notifications"] += 1
+        for callback in list(self._subscribers):
+            callback(self._value)
+
+    def subscribe(self, callback: Callable, call_now: bool = True) -> Callable:
+        """
+        Call something whenever the value changes.
+
+        :param callback: A function that takes the new value.
+        :param call_now: A bool - whether to also call it right away with the current value. Defaults to True.
+        :return: A function that unsubscribes when called.
+        """
+        self._subscribers.append(callback)
+        if call_now:
+            callback(self._value)
+        return lambda: self._subscribers.remove(callback) if callback in self._subscribers else None
+
+
+class Derived(Observable):
+    """
+    An Observable computed from other Observables. It is recomputed only when one of its inputs changes.
+    """
+    def __init__(self, inputs: list[Observable], compute: Callable):
+        """
+        :param inputs: A list of Observables this value depends on.
+        :param compute: A function that takes the inputs' values (in order) and returns the derived value.
+        """
+        self.inputs = inputs
+        self.compute = compute
+        super().__init__(self._compute())
+        for observable in inputs:
+            observable.subscribe(lambda _: self.recompute(), call_now=False)
+
+    def _compute(self) -> Any:
+        _counters["recomputes"] += 1
+        return self.compute(*[observable.get() for observable in self.inputs])
+
+    def recompute(self) -> None:
+        """
+        Recompute the value now. Useful when something the inputs can't see (like the file system) changed.
+
+        :return: None.
+        """
+        self.set(self._compute())
+
+
+def from_variable(variable: tk.Variable) -> Observable:
+    """
+    Make an Observable that follows a Tk variable (StringVar, BooleanVar...).
+
+    :param variable: The tk.Variable to follow.
+    :return: An Observable.
+    """
+    observable = Observable(variable.get())
+
+    def changed(*_):
+        try:
+            observable.set(variable.get())
+        except tk.TclError:
+            pass
+
+    variable.trace_add("write", changed)
+    return observable
+
+
+class Debouncer:
+    """
+    Calls a function once, a short time after the last of a burst of requests. Used for anything that touches the
+    file system so typing in an entry doesn't stat a directory on every key press.
+    """
+    def __init__(self, widget: tk.Widget, delay: int, callback: Callable):
+        """
+        :param widget: A tk.Widget to schedule on. Pending calls are dropped when it is destroyed.
+        :param delay: An int - how many milliseconds to wait after the last request.
+        :param callback: A function to call with no arguments.
+        """
+        self.widget = widget
+        self.delay = delay
+        self.callback = callback
+        self._after_id = None
+
+    def __call__(self, *_) -> None:
+        self.cancel()
+        try:
+            self._after_id = self.widget.after(self.delay, self._fire)
+        except tk.TclError:
+            self._after_id = None
+
+    def _fire(self) -> None:
+        self._after_id = None
+        _counters["debounced_calls"] += 1
+        try:
+            self.callback()
+        except tk.TclError:
+            pass
+
+    def cancel(self) -> None:
+        """
+        Drop a pending call, if there is one.
+
+        :return: None.
+        """
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
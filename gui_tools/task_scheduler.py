@@ -0,0 +1,302 @@
+"""
+A module that runs slow work (syncing, creating projects, scanning drives...) on a bounded pool of worker threads and
+hands the results back to the Tk main loop through a queue, so Tk is only ever touched from the main thread.
+
+    scheduler = TaskScheduler(root)
+    scheduler.submit("Sync files", sync, model, on_done=show_done, on_error=show_error, blocks_close=True)
+
+-----------
+
+Classes list:
+
+- TaskCancelled(Exception)
+- Task.__init__(self, task_id: int, name: str, scheduler: "TaskScheduler", blocks_close: bool = False)
+- TaskScheduler.__init__(self, root: tk.Misc, max_workers: int = 4)
+
+-----------
+
+Functions list:
+
+No functions!
+
+"""
+
+import tkinter as tk
+from itertools import count
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Optional
+import queue
+import traceback
+from gui_tools import reactive
+from project_tools.create_logger import create_logger
+import logging
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+# How often results are moved to the main loop while tasks are outstanding. Nothing is polled while idle.
+DRAIN_MS = 50
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class TaskCancelled(Exception):
+    """
+    Raised inside a task (by Task.check_cancelled) to stop it early.
+    """
+    pass
+
+
+class Task:
+    """
+    One piece of work submitted to a TaskScheduler. The function doing the work gets this as its first argument, to
+    report progress and check for cancellation.
+    """
+    __slots__ = ("id", "name", "state", "progress", "message", "blocks_close", "error", "traceback", "_scheduler",
+                 "_cancel_event")
+
+    def __init__(self, task_id: int, name: str, scheduler: "TaskScheduler", blocks_close: bool = False):
+        self.id = task_id
+        self.name = name
+        self.state = QUEUED
+        # A float from 0 to 1, or None if the task can't tell how far along it is
+        self.progress = None
+        self.message = ""
+        self.blocks_close = blocks_close
+        self.error = None
+        self.traceback = ""
+        self._scheduler = scheduler
+        self._cancel_event = Event()
+
+    def __repr__(self) -> str:
+        return f"<Task {self.id} {repr(self.name)} {self.state}>"
+
+    def cancel(self) -> None:
+        """
+        Ask the task to stop. A queued task never starts, and a running one stops when it next checks.
+
+        :return: None.
+        """
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self) -> None:
+        """
+        Call this at safe points in a long task.
+
+        :raise TaskCancelled: Raises TaskCancelled if the task was asked to stop.
+        :return: None.
+        """
+        if self._cancel_event.is_set():
+            raise TaskCancelled(f"{self.name} was cancelled")
+
+    def report(self, progress: Optional[float] = None, message: str = None) -> None:
+        """
+        Update the task's progress from its worker thread. The UI is told on the main loop.
+
+        :param progress: A float from 0 to 1, or None if unknown.
+        :param message: A str - what the task is doing right now. Defaults to leaving it unchanged.
+        :return: None.
+        """
+        self.progress = progress
+        if message is not None:
+            self.message = message
+        self._scheduler._post(self._scheduler._notify_tasks)
+
+    def call_in_ui(self, callback: Callable, *args) -> None:
+        """
+        Run something on the Tk main loop from the worker thread, without waiting for it.
+
+        :param callback: The function to call.
+        :param args: Arguments to pass to it.
+        :return: None.
+        """
+        self._scheduler._post(callback, *args)
+
+
+class TaskScheduler:
+    """
+    A bounded pool of worker threads for a Tk application. Callbacks (on_done, on_error and anything posted with
+    Task.call_in_ui) always run on the Tk main loop.
+    """
+    def __init__(self, root: tk.Misc, max_workers: int = 4):
+        """
+        Create a task scheduler. Worker threads are started as they are needed.
+
+        :param root: A Tk widget whose main loop runs the callbacks.
+        :param max_workers: An int - the most tasks that run at the same time. Defaults to 4.
+        """
+        self.root = root
+        self.max_workers = max_workers
+        # The queued and running tasks, in the order they were submitted
+        self.tasks = reactive.Observable(())
+        self._ids = count(1)
+        self._work = queue.SimpleQueue()
+        self._results = queue.SimpleQueue()
+        self._workers = []
+        self._idle_workers = 0
+        # Tasks put on the work queue that no worker has picked up yet
+        self._pending = 0
+        self._lock = Lock()
+        self._draining = False
+        self._shut_down = False
+
+    def submit(self, name: str, function: Callable, *args, on_done: Callable = None, on_error: Callable = None,
+               on_cancel: Callable = None, blocks_close: bool = False, **kwargs) -> Task:
+        """
+        Queue a function to run on a worker thread. Must be called from the Tk main loop.
+
+        :param name: A str - what to call the task in the UI.
+        :param function: The function to run. It is called with the Task, then args and kwargs.
+        :param on_done: A function to call with the result when the function returns. Defaults to None.
+        :param on_error: A function to call with the exception and the formatted traceback if the function raises.
+         Errors without on_error are logged. Defaults to None.
+        :param on_cancel: A function to call with no arguments if the task is cancelled, whether or not it had
+         started. Defaults to None.
+        :param blocks_close: A bool - whether closing the app should ask for confirmation while this task is queued
+         or running. Defaults to False.
+        :return: The Task.
+        """
+        if self._shut_down:
+            raise RuntimeError("The task scheduler has been shut down")
+        task = Task(next(self._ids), name, self, blocks_close=blocks_close)
+        logger.debug(f"Queueing {repr(task)}")
+        self.tasks.set(self.tasks.get() + (task, ))
+        with self._lock:
+            self._pending += 1
+        self._work.put((task, function, args, kwargs, on_done, on_error, on_cancel))
+        self._start_worker_if_needed()
+        self._start_draining()
+        return task
+
+    def cancel(self, task_id: int) -> bool:
+        """
+        Ask a task to stop.
+
+        :param task_id: An int - the task's id.
+        :return: A bool - whether a queued or running task had that id.
+        """
+        for task in self.tasks.get():
+            if task.id == task_id:
+                task.cancel()
+                return True
+        return False
+
+    def busy(self) -> bool:
+        """
+        Whether a task that shouldn't be interrupted is queued or running.
+
+        :return: A bool.
+        """
+        return any(task.blocks_close for task in self.tasks.get())
+
+    def shutdown(self) -> None:
+        """
+        Cancel every task and stop the workers once they finish what they are running. Worker threads are daemons, so
+        they don't keep the process alive.
+
+        :return: None.
+        """
+        self._shut_down = True
+        for task in self.tasks.get():
+            task.cancel()
+        for _ in self._workers:
+            self._work.put(None)
+
+    def _start_worker_if_needed(self) -> None:
+        with self._lock:
+            if self._pending <= self._idle_workers or len(self._workers) >= self.max_workers:
+                return
+            thread = Thread(target=self._worker, name=f"task-worker-{len(self._workers) + 1}", daemon=True)
+            self._workers.append(thread)
+            self._idle_workers += 1
+        thread.start()
+
+    def _worker(self) -> None:
+        while True:
+            item = self._work.get()
+            if item is None:
+                return
+            with self._lock:
+                self._pending -= 1
+                self._idle_workers -= 1
+            self._run(*item)
+            with self._lock:
+                self._idle_workers += 1
+
+    def _run(self, task: Task, function: Callable, args: tuple, kwargs: dict, on_done: Optional[Callable],
+             on_error: Optional[Callable], on_cancel: Optional[Callable]) -> None:
+        callbacks = (on_done, on_error, on_cancel)
+        if task.cancelled:
+            self._post(self._finish, task, CANCELLED, None, *callbacks)
+            return
+        task.state = RUNNING
+        self._post(self._notify_tasks)
+        logger.debug(f"Running {repr(task)}")
+        try:
+            result = function(task, *args, **kwargs)
+        except TaskCancelled:
+            self._post(self._finish, task, CANCELLED, None, *callbacks)
+        except Exception as error:
+            task.error = error
+            task.traceback = traceback.format_exc()
+            self._post(self._finish, task, FAILED, None, *callbacks)
+        else:
+            self._post(self._finish, task, DONE, result, *callbacks)
+
+    def _post(self, callback: Callable, *args) -> None:
+        self._results.put((callback, args))
+
+    def _notify_tasks(self) -> None:
+        self.tasks.notify()
+
+    def _finish(self, task: Task, state: str, result: Any, on_done: Optional[Callable],
+                on_error: Optional[Callable], on_cancel: Optional[Callable]) -> None:
+        """
+        Wrap up a task on the main loop - it is no longer listed by the time its callbacks run.
+        """
+        task.state = state
+        self.tasks.set(tuple(t for t in self.tasks.get() if t is not task))
+        if state == DONE:
+            logger.debug(f"{repr(task)} finished")
+            if on_done is not None:
+                on_done(result)
+        elif state == FAILED:
+            logger.error(f"{repr(task)} raised an exception!\n{task.traceback}")
+            if on_error is not None:
+                on_error(task.error, task.traceback)
+        else:
+            logger.info(f"{repr(task)} was cancelled")
+            if on_cancel is not None:
+                on_cancel()
+
+    def _start_draining(self) -> None:
+        if not self._draining:
+            self._draining = True
+            self.root.after(DRAIN_MS, self._drain)
+
+    def _drain(self) -> None:
+        """
+        Run everything the workers posted. Reschedules itself only while tasks are outstanding.
+        """
+        while True:
+            try:
+                callback, args = self._results.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception:
+                logger.exception("Uh oh, an exception has occurred in a task callback!")
+        self._draining = False
+        if self.tasks.get() or not self._results.empty():
+            try:
+                self._start_draining()
+            except tk.TclError:
+                pass
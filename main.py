@@ -17,32 +17,105 @@ No functions!
 
 # TODO: Make binaries like in CPY Bundle Manager
 
-import gui
+from time import perf_counter
+
+STARTED = perf_counter()
+
+from project_tools.create_logger import create_logger, start_log_session
+from project_tools import single_instance
 from pathlib import Path
-from sys import argv
-from project_tools.create_logger import create_logger
+from argparse import ArgumentParser, SUPPRESS
 import logging
 
-LEVEL = logging.DEBUG
+parser = ArgumentParser(description="CircuitPython Project Manager")
+parser.add_argument("path", nargs="?", default=None, help="a .cpypmconfig file to open")
+parser.add_argument("--trace", action="store_true", help="record a Chrome trace of this session in ./traces")
+parser.add_argument("--profile", action="store_true",
+                    help="profile syncs, project creation, drive refreshes and README rendering into ./profiles")
+parser.add_argument("--stats", action="store_true", help="print the collected metrics when the application exits")
+parser.add_argument("--metrics-port", type=int, default=None, metavar="PORT",
+                    help="serve metrics in the Prometheus text format at http://127.0.0.1:PORT/metrics")
+parser.add_argument("--history", action="store_true",
+                    help="print the sync history (of the given project, if a path is passed) and exit")
+parser.add_argument("--new-instance", action="store_true",
+                    help="start a separate instance instead of handing the path to the one already running")
+# Used by benchmarks/startup_benchmark.py - print how long the first window took to show up, then quit
+parser.add_argument("--startup-benchmark", action="store_true", help=SUPPRESS)
+args = parser.parse_args()
+
+if args.history:
+    import sqlite3
+    import sys
+    from project_tools import sync_history
+    from project_tools.project_config import ConfigValidationError
+    from project_tools.project_model import ProjectModel
+    try:
+        project_root = None if args.path is None else ProjectModel(Path(args.path)).project_root
+        print(sync_history.get_history().format_report(project_root))
+    except ConfigValidationError as error:
+        print(f"{args.path} is not a valid .cpypmconfig file: {error}", file=sys.stderr)
+        raise SystemExit(1)
+    except (OSError, ValueError, sqlite3.Error) as error:
+        print(f"{type(error).__name__}: {error}", file=sys.stderr)
+        raise SystemExit(1)
+    raise SystemExit(0)
+
+path = None
+if args.path is not None:
+    path = Path(args.path)
+    if path.is_dir():
+        path = None
+
+# Hand the project to the running instance before touching log.log or importing the GUI, so this is quick
+instance_server = None
+if not args.new_instance and not args.startup_benchmark:
+    for _ in range(2):
+        if single_instance.hand_off(path):
+            raise SystemExit(0)
+        instance_server = single_instance.listen()
+        if instance_server is not None:
+            break
+
+# Rotate before anything else logs, so this session's log starts in a fresh file
+start_log_session()
 
-log_path = Path.cwd() / "log.log"
-log_path.write_text("")
+from project_tools import metrics, profiling, tracing
+
+if args.trace:
+    tracing.enable()
+if args.profile:
+    profiling.set_enabled()
+
+import gui
+
+LEVEL = logging.DEBUG
 
 logger = create_logger(name=__name__, level=LEVEL)
 
-logger.debug(f"Found {len(argv)} argument(s)")
-logger.debug(f"({repr(argv)})")
+logger.debug(f"Arguments are {repr(args)}")
 
-path = None
-if len(argv) > 1:
+if args.metrics_port is not None:
+    metrics.serve(args.metrics_port)
+
+if path is not None:
     logger.debug("Path to .cpypmconfig was passed in!")
-    logger.debug(f"Path is {repr(argv[1])}")
-    path = Path(argv[1])
-    if path.is_dir():
-        path = None
+    logger.debug(f"Path is {repr(path)}")
 
 logger.debug(f"Starting application...")
 logger.info(f"Log level is {repr(LEVEL)}")
 with gui.GUI() as gui:
+    if args.startup_benchmark:
+        def first_window_shown() -> None:
+            print(f"First window after {(perf_counter() - STARTED) * 1000:.1f} ms", flush=True)
+            gui.destroy()
+
+        # after_idle runs once everything pending (including drawing the window) is done
+        gui.after(0, lambda: gui.after_idle(first_window_shown))
+    if instance_server is not None:
+        gui.serve_other_instances(instance_server)
     gui.run(cpypmconfig_path=path)
+if instance_server is not None:
+    instance_server.close()
 logger.warning(f"Application stopped!")
+if args.stats:
+    print(metrics.format_stats())
@@ -0,0 +1,192 @@
+"""
+A module that keeps a JSON configuration file in memory and writes it back lazily.
+
+-----------
+
+Classes list:
+
+- ConfigStore.__init__(self, path: Path, write_delay: float = 0.5)
+
+-----------
+
+Functions list:
+
+No functions!
+
+"""
+
+from pathlib import Path
+from threading import Lock, Timer
+from typing import Any
+import atexit
+import copy
+import json
+import os
+import tempfile
+from project_tools import metrics, tracing
+from project_tools.create_logger import create_logger
+import logging
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+CONFIG_READS = metrics.counter("cpypm_config_reads_total", "Times config.json was read from disk")
+CONFIG_WRITES = metrics.counter("cpypm_config_writes_total", "Times config.json was written to disk")
+
+
+class ConfigStore:
+    """
+    A JSON object stored in a file that is loaded once and served from memory. Changes are batched and written back
+    after a short delay (write-behind) using an atomic temp-file-and-rename, and anything pending is flushed on exit.
+    """
+    def __init__(self, path: Path, write_delay: float = 0.5):
+        """
+        Create a config store. Nothing is read until the first key is requested.
+
+        :param path: A pathlib.Path to the JSON file.
+        :param write_delay: A float - how many seconds to wait after a change before writing to disk. Defaults to 0.5.
+        """
+        self.path = path
+        self.write_delay = write_delay
+        self.reads = 0
+        self.writes = 0
+        self._data = None
+        self._dirty = False
+        self._timer = None
+        self._lock = Lock()
+        atexit.register(self.flush)
+
+    def _load(self) -> dict:
+        """
+        Read and parse the file. Must be called with the lock held.
+
+        :return: A dict of the file's contents, or an empty dict if it is missing or broken.
+        """
+        try:
+            text = self.path.read_text()
+        except FileNotFoundError:
+            logger.debug(f"{repr(self.path)} does not exist, starting with an empty config")
+            return {}
+        self.reads += 1
+        CONFIG_READS.inc()
+        try:
+            data = json.loads(text)
+        except json.decoder.JSONDecodeError:
+            logger.warning(f"Could not parse {repr(self.path)}, starting with an empty config")
+            return {}
+        if not isinstance(data, dict):
+            logger.warning(f"{repr(self.path)} does not contain a JSON object, starting with an empty config")
+            return {}
+        return data
+
+    def _ensure_loaded(self) -> None:
+        """
+        Load the file if we haven't yet. Must be called with the lock held.
+
+        :return: None.
+        """
+        if self._data is None:
+            logger.debug(f"Loading {repr(self.path)} into memory")
+            with tracing.span("load config", path=str(self.path)):
+                self._data = self._load()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Get a value from memory. Mutable values are copied so callers can't change the store behind its back.
+
+        :param key: A str - the key to look up.
+        :param default: What to return if the key doesn't exist. Defaults to None.
+        :return: The value, or default.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if key not in self._data:
+                return default
+            return copy.deepcopy(self._data[key])
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            self._ensure_loaded()
+            return key in self._data
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Set a value in memory and schedule a write to disk. Setting a key to the value it already has does nothing.
+
+        :param key: A str - the key to set.
+        :param value: Something that can be turned into JSON.
+        :return: None.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if key in self._data and self._data[key] == value:
+                return
+            self._data[key] = copy.deepcopy(value)
+            self._dirty = True
+            self._schedule_write()
+
+    def _schedule_write(self) -> None:
+        """
+        Start the write-behind timer if it isn't running. Must be called with the lock held.
+
+        :return: None.
+        """
+        if self._timer is None:
+            self._timer = Timer(self.write_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _write(self, text: str) -> None:
+        """
+        Atomically replace the file with some text by writing to a temporary file next to it and renaming it over.
+
+        :param text: A str - what to write.
+        :return: None.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.write(text)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def flush(self) -> None:
+        """
+        Write pending changes to disk right now, if there are any.
+
+        :return: None.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+            try:
+                with tracing.span("save config", path=str(self.path)):
+                    self._write(json.dumps(self._data, sort_keys=True, indent=4))
+            except OSError:
+                logger.exception(f"Could not write {repr(self.path)}!")
+                self._dirty = True
+                return
+            self.writes += 1
+            CONFIG_WRITES.inc()
+        logger.debug(f"Wrote {repr(self.path)} ({self.reads} read(s), {self.writes} write(s) so far)")
+
+    def reload(self) -> None:
+        """
+        Throw away what's in memory (after flushing it) and read the file again on next access.
+
+        :return: None.
+        """
+        self.flush()
+        with self._lock:
+            self._data = None
@@ -1,24 +1,242 @@
 """
 A module that creates a simple logger and returns it.
 
+Every logger made here shares one logging.handlers.QueueHandler. The records are written to the console and to
+log.log by a single background thread (a logging.handlers.QueueListener), so the thread that logs never waits on
+formatting or disk writes. log.log is rotated when it gets too big and at the start of every session, and only a
+limited number of (optionally gzipped) old segments are kept.
+
 -----------
 
 Classes list:
 
-No classes!
+- LazyQueueHandler(QueueHandler)
+- SessionRotatingFileHandler(RotatingFileHandler).__init__(self, filename: Path, max_bytes: int = DEFAULT_MAX_BYTES,
+                                                            backup_count: int = DEFAULT_BACKUP_COUNT,
+                                                            compress: bool = True)
 
 -----------
 
 Functions list:
 
+- configure_log_rotation(max_bytes: int = None, backup_count: int = None, compress: bool = None) -> None
+- start_log_session() -> None
+- set_console_level(level: int) -> None
 - create_logger(name: str = __name__, level: int = logging.DEBUG) -> logging.getLogger
+- flush_logs() -> None
 
 """
 
 from pathlib import Path
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from threading import Lock, Thread
+import atexit
+import gzip
+import os
+import queue
+import re
+import shutil
 import logging
 
 LOG_LOCATION = Path.cwd() / "log.log"
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Rotate log.log once it reaches this many bytes, and keep this many old segments
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+
+# Argument types that can't change between logging a record and the listener formatting it
+IMMUTABLE_ARG_TYPES = (str, int, float, bool, bytes, type(None), Path)
+
+_queue = queue.SimpleQueue()
+_queue_handler = None
+_file_handler = None
+_console_handler = None
+_listener = None
+_lock = Lock()
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    A QueueHandler that leaves formatting to the listener thread. The stock QueueHandler formats every record in the
+    thread that logs it.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Get a record ready to be queued. The message is only merged with its arguments here if an argument could
+        change before the listener gets to it.
+
+        :param record: A logging.LogRecord.
+        :return: The logging.LogRecord to queue.
+        """
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, IMMUTABLE_ARG_TYPES) for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+class SessionRotatingFileHandler(RotatingFileHandler):
+    """
+    A RotatingFileHandler that can gzip rotated segments in a background thread and deletes segments past the
+    retention limit, even ones left over from a bigger limit or a different compression setting.
+    """
+    def __init__(self, filename: Path, max_bytes: int = DEFAULT_MAX_BYTES, backup_count: int = DEFAULT_BACKUP_COUNT,
+                 compress: bool = True):
+        # delay=True - don't open the file until the first record is written
+        super().__init__(filename=filename, maxBytes=max_bytes, backupCount=max(backup_count, 1), delay=True)
+        self.compress = compress
+        self.compression_thread = None
+        self.namer = self.name_segment
+        self.rotator = self.rotate_segment
+
+    def name_segment(self, name: str) -> str:
+        return name + ".gz" if self.compress else name
+
+    def rotate_segment(self, source: str, dest: str) -> None:
+        """
+        Move the current log out of the way. With compression on, the gzip happens in a background thread so the
+        listener can keep writing.
+
+        :param source: A str - the log file.
+        :param dest: A str - the first rotated segment.
+        :return: None.
+        """
+        if not os.path.exists(source):
+            return
+        if not self.compress:
+            os.replace(source, dest)
+            return
+        pending = dest + ".pending"
+        os.replace(source, pending)
+        self.compression_thread = Thread(target=self.compress_segment, args=(pending, dest),
+                                         name="log-compression")
+        self.compression_thread.start()
+
+    @staticmethod
+    def compress_segment(source: str, dest: str) -> None:
+        try:
+            with open(source, "rb") as in_file, gzip.open(dest, "wb") as out_file:
+                shutil.copyfileobj(in_file, out_file)
+            os.remove(source)
+        except OSError:
+            # Keep the uncompressed segment rather than losing it
+            os.replace(source, dest[:-len(".gz")])
+
+    def wait_for_compression(self) -> None:
+        if self.compression_thread is not None:
+            self.compression_thread.join()
+            self.compression_thread = None
+
+    def doRollover(self) -> None:
+        # Finish the previous segment first, so it gets shifted along with the others
+        self.wait_for_compression()
+        super().doRollover()
+        self.prune_segments()
+
+    def prune_segments(self) -> None:
+        """
+        Delete rotated segments past backupCount.
+
+        :return: None.
+        """
+        base = Path(self.baseFilename)
+        pattern = re.compile(re.escape(base.name) + r"\.(\d+)(\.gz)?$")
+        for path in base.parent.glob(base.name + ".*"):
+            match = pattern.match(path.name)
+            if match is not None and int(match.group(1)) > self.backupCount:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def close(self) -> None:
+        super().close()
+        self.wait_for_compression()
+
+
+def _get_queue_handler() -> LazyQueueHandler:
+    """
+    Get the shared queue handler, starting the listener thread the first time.
+
+    :return: The LazyQueueHandler every logger uses.
+    """
+    global _queue_handler, _file_handler, _console_handler, _listener
+    with _lock:
+        if _queue_handler is None:
+            formatter = logging.Formatter(LOG_FORMAT)
+            _console_handler = logging.StreamHandler()
+            _console_handler.setFormatter(fmt=formatter)
+            _file_handler = SessionRotatingFileHandler(filename=LOG_LOCATION)
+            _file_handler.setFormatter(fmt=formatter)
+            _listener = QueueListener(_queue, _console_handler, _file_handler, respect_handler_level=True)
+            _listener.start()
+            atexit.register(flush_logs)
+            _queue_handler = LazyQueueHandler(_queue)
+        return _queue_handler
+
+
+def configure_log_rotation(max_bytes: int = None, backup_count: int = None, compress: bool = None) -> None:
+    """
+    Change how log.log is rotated. Anything left as None is unchanged.
+
+    :param max_bytes: An int - rotate once log.log reaches this many bytes.
+    :param backup_count: An int - how many old segments to keep (at least 1).
+    :param compress: A bool - whether to gzip old segments.
+    :return: None.
+    """
+    _get_queue_handler()
+    _file_handler.acquire()
+    try:
+        if max_bytes is not None:
+            _file_handler.maxBytes = max_bytes
+        if backup_count is not None:
+            _file_handler.backupCount = max(backup_count, 1)
+        if compress is not None:
+            _file_handler.compress = compress
+    finally:
+        _file_handler.release()
+
+
+def start_log_session() -> None:
+    """
+    Rotate log.log so this session starts with a fresh file, keeping the last session's log as a segment.
+
+    :return: None.
+    """
+    _get_queue_handler()
+    _file_handler.acquire()
+    try:
+        if LOG_LOCATION.exists() and LOG_LOCATION.stat().st_size > 0:
+            _file_handler.doRollover()
+    finally:
+        _file_handler.release()
+
+
+def set_console_level(level: int) -> None:
+    """
+    Only show records at or above a level on the console. log.log still gets everything.
+
+    :param level: An int - a logging level like logging.WARNING.
+    :return: None.
+    """
+    _get_queue_handler()
+    _console_handler.setLevel(level)
+
+
+def flush_logs() -> None:
+    """
+    Write out every queued record and stop the listener thread. Logging still works afterwards, but records are
+    dropped. This is registered to run at exit.
+
+    :return: None.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
 
 
 def create_logger(name: str = __name__, level: int = logging.DEBUG) -> logging.getLogger:
@@ -38,26 +256,18 @@ def create_logger(name: str = __name__, level: int = logging.DEBUG) -> logging.g
     And then call `logger.debug()`, `logger.info()`, `logger.warning()`, `logger.error()`, `logger.critical()`, and
     `logger.exception` everywhere in that module.
 
+    In hot loops, pass arguments instead of using an f-string (`logger.debug("Copied %s", path)`) so nothing is
+    formatted unless the level is enabled, and the formatting happens on the listener thread.
+
     :param name: A string with the logger name. Defaults to __name__.
     :param level: A integer with the logger level. Defaults to logging.DEBUG.
     :return: A logging.getLogger which you can use as a regular logger.
     """
     logger = logging.getLogger(name=name)
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(level=level)
-    console_formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    console_handler.setFormatter(fmt=console_formatter)
-    console_handler.setLevel(level=level)
-    file_handler = logging.FileHandler(filename=LOG_LOCATION)
-    file_handler.setLevel(level=level)
-    file_handler.setFormatter(fmt=console_formatter)
-    file_handler.setLevel(level=level)
+    queue_handler = _get_queue_handler()
     logger.propagate = False
-    if console_handler not in logger.handlers:
-        logger.addHandler(hdlr=console_handler)
-    if file_handler not in logger.handlers:
-        logger.addHandler(hdlr=file_handler)
+    if queue_handler not in logger.handlers:
+        logger.addHandler(hdlr=queue_handler)
     logger.setLevel(level=level)
-    logger.debug(f"Created logger named {repr(name)} with level {repr(level)}")
-    logger.debug(f"Handlers for {repr(name)}: {repr(logger.handlers)}")
+    logger.debug("Created logger named %r with level %r", name, level)
     return logger
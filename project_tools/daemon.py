@@ -0,0 +1,250 @@
+"""
+A module for the sync daemon - a long-running process that keeps project models, project indexes and the list of
+connected drives in memory and answers sync, diff and drive requests from the command line interface over a local
+socket (see local_socket), so repeated requests skip re-parsing projects, re-listing directories and re-scanning
+drives that haven't changed.
+
+Every cache checks itself before it is used: a ProjectModel re-parses its .cpypmconfig when its modification time
+changes, a ProjectIndex re-lists a directory when its modification time changes (and re-stats its files) and the
+DriveMonitor rescans drives when something is mounted or unmounted.
+
+    python cli.py daemon
+    python cli.py --daemon sync path/to/.cpypmconfig
+
+-----------
+
+Classes list:
+
+- DriveMonitor.__init__(self)
+- SyncService.__init__(self)
+
+-----------
+
+Functions list:
+
+- serve(service: SyncService = None) -> int
+
+"""
+
+from pathlib import Path
+from threading import Lock, Thread
+from time import monotonic
+from typing import Optional
+import os
+import socket
+from project_tools import drives, local_socket, os_detect, project
+from project_tools.create_logger import create_logger
+from project_tools.project_config import ConfigValidationError
+from project_tools.project_index import ProjectIndex
+from project_tools.project_model import ProjectModel
+import logging
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+# Windows drive letters have no mount point to watch, so the drive list is just kept for this many seconds
+WINDOWS_DRIVE_CACHE_SECONDS = 2.0
+# How often the accept loop checks whether it has been asked to stop
+ACCEPT_TIMEOUT = 0.5
+# How long a connected client can stay quiet before it is dropped
+CLIENT_TIMEOUT = 60.0
+
+
+class DriveMonitor:
+    """
+    Keeps the last list_connected_drives result and only scans again when something is mounted or unmounted - that
+    changes the mount point's modification time or the device number of one of its entries, both of which cost one
+    scandir to check.
+    """
+    def __init__(self):
+        self.scans = 0
+        self._drives = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def _signature(mount_point: Path) -> tuple:
+        if os_detect.on_windows():
+            return (int(monotonic() / WINDOWS_DRIVE_CACHE_SECONDS),)
+        if os_detect.on_mac():
+            mount_point = Path("/Volumes")
+        try:
+            with os.scandir(mount_point) as entries:
+                children = sorted((entry.name, entry.stat().st_dev) for entry in entries)
+            return mount_point.stat().st_mtime_ns, tuple(children)
+        except OSError:
+            return ()
+
+    def list(self, circuitpython_only: bool = True, mount_point: Path = Path("/media")) -> list[Path]:
+        """
+        List connected drives, like drives.list_connected_drives.
+
+        :param circuitpython_only: A bool telling whether to filter out non-CircuitPython drives. Defaults to True.
+        :param mount_point: A pathlib.Path to where drives are mounted. Applies only to Linux.
+        :return: A list of pathlib.Path objects.
+        """
+        key = (circuitpython_only, Path(mount_point))
+        signature = self._signature(key[1])
+        with self._lock:
+            cached = self._drives.get(key)
+            if cached is not None and cached[0] == signature:
+                return list(cached[1])
+        connected = drives.list_connected_drives(circuitpython_only, key[1])
+        with self._lock:
+            self._drives[key] = (signature, connected)
+            self.scans += 1
+        return list(connected)
+
+
+class SyncService:
+    """
+    Answers requests - dicts with a "command" key - with result dicts. The daemon serves one over its socket; the
+    command line interface uses one directly when there is no daemon.
+
+    - {"command": "sync", "path": ..., "to": None, "record_history": True}
+    - {"command": "diff", "path": ..., "to": None}
+    - {"command": "drives", "all": False, "mount_point": "/media"}
+    - {"command": "ping"} and {"command": "stop"}
+
+    Every answer has a "result": "success", "changes" or "in sync" (diff), "no device", "stopping" or "failed" (with
+    an "error").
+    """
+    def __init__(self):
+        self.drive_monitor = DriveMonitor()
+        self.requests = 0
+        self.stopping = False
+        self.started = monotonic()
+        self._models = {}
+        self._indexes = {}
+        self._models_lock = Lock()
+        # Syncs run one at a time - two at once could write to the same device
+        self._sync_lock = Lock()
+
+    def model(self, path: Path) -> ProjectModel:
+        """
+        The ProjectModel for a .cpypmconfig file, kept between requests.
+
+        :param path: A pathlib.Path to the .cpypmconfig file.
+        :return: A ProjectModel.
+        """
+        path = Path(path).absolute()
+        with self._models_lock:
+            if path not in self._models:
+                self._models[path] = ProjectModel(path)
+            return self._models[path]
+
+    def project_index(self, model: ProjectModel) -> ProjectIndex:
+        """
+        The ProjectIndex for a project, kept between requests (and made again if its files_to_sync or patterns
+        change). It isn't refreshed here.
+
+        :param model: The project's ProjectModel.
+        :return: A ProjectIndex.
+        """
+        with self._models_lock:
+            index = self._indexes.get(model.path)
+            sync_filter = model.sync_filter
+            if index is None or not index.matches(model.project_root, model.files_to_sync, sync_filter):
+                index = ProjectIndex(model.project_root, model.files_to_sync, sync_filter)
+                self._indexes[model.path] = index
+            return index
+
+    def handle(self, request: dict) -> dict:
+        """
+        Answer a request.
+
+        :param request: A dict with a "command" key.
+        :return: A dict with a "result" key.
+        """
+        self.requests += 1
+        command = request.get("command")
+        logger.debug(f"Handling {repr(request)}")
+        try:
+            if command in ("sync", "diff"):
+                return self._sync(request, dry_run=command == "diff")
+            elif command == "drives":
+                connected = self.drive_monitor.list(not request.get("all", False),
+                                                    Path(request.get("mount_point", "/media")))
+                return {"result": "success", "drives": [str(drive) for drive in connected]}
+            elif command == "ping":
+                return {"result": "success", "pid": os.getpid(), "requests": self.requests,
+                        "uptime": monotonic() - self.started}
+            elif command == "stop":
+                self.stopping = True
+                return {"result": "stopping"}
+            raise ValueError(f"Unknown command {repr(command)}")
+        except ConfigValidationError as error:
+            return {"result": "failed", "error": f"{request['path']} is not a valid .cpypmconfig file: {error}"}
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            logger.debug("Uh oh, an exception has occurred!", exc_info=True)
+            return {"result": "failed", "error": f"{type(error).__name__}: {error}"}
+
+    def _sync(self, request: dict, dry_run: bool) -> dict:
+        model = self.model(Path(request["path"]))
+        model.refresh()
+        device = model.sync_location if request.get("to") is None else Path(request["to"])
+        if device is None:
+            raise ValueError(project.NO_SYNC_LOCATION)
+        result = {"project": model.project_name, "device": str(device)}
+        if not device.is_dir():
+            return dict(result, result="no device")
+        with self._sync_lock:
+            index = self.project_index(model)
+            index.refresh()
+            if dry_run:
+                changes = project.diff_project(model, device, index=index)
+                return dict(result, result="changes" if changes else "in sync",
+                            changes=[{"action": action, "path": path} for action, path in changes])
+            counts = project.sync_project(model, device, record_history=request.get("record_history", True),
+                                          index=index)
+        return dict(result, result="success", **counts)
+
+
+def _serve_client(service: SyncService, connection: socket.socket, token: Optional[str]) -> None:
+    with connection:
+        connection.settimeout(CLIENT_TIMEOUT)
+        if not local_socket.authenticate(connection, token):
+            logger.warning("Dropped a client that didn't send the right token")
+            return
+        try:
+            while not service.stopping:
+                request = local_socket.receive(connection)
+                if request is None:
+                    break
+                local_socket.send(connection, service.handle(request))
+        except (OSError, ValueError):
+            logger.debug("Dropped a client", exc_info=True)
+
+
+def serve(service: SyncService = None) -> int:
+    """
+    Run the daemon until a stop request comes in. Only one daemon runs per working directory.
+
+    :param service: The SyncService to answer with. Defaults to a new one.
+    :raise RuntimeError: Raises RuntimeError if a daemon is already running.
+    :raise OSError: Raises OSError if the socket couldn't be created.
+    :return: An int - the number of requests answered.
+    """
+    if service is None:
+        service = SyncService()
+    if local_socket.request(local_socket.DAEMON_SOCKET, {"command": "ping"}, ACCEPT_TIMEOUT, ACCEPT_TIMEOUT):
+        raise RuntimeError("A daemon is already running in this directory")
+    bound = local_socket.bind(local_socket.DAEMON_SOCKET)
+    if bound is None:
+        raise OSError("Could not create the daemon's socket")
+    sock, address, token = bound
+    sock.settimeout(ACCEPT_TIMEOUT)
+    logger.info(f"Daemon listening on {repr(address)}")
+    try:
+        while not service.stopping:
+            try:
+                connection, _ = sock.accept()
+            except socket.timeout:
+                continue
+            Thread(target=_serve_client, args=(service, connection, token), daemon=True).start()
+    finally:
+        sock.close()
+        try:
+            address.unlink()
+        except OSError:
+            pass
+    logger.info(f"Daemon stopped after {service.requests} requests")
+    return service.requests
@@ -12,18 +12,39 @@ No classes!
 Functions list:
 
 - list_connected_drives(circuitpython_only: bool = True, drive_mount_point: Path = "/media") -> list
+- file_system(path: Path) -> Optional[str]
+- mtime_tolerance_ns(path: Path) -> int
 
 """
 
 from pathlib import Path
 from string import ascii_uppercase
-from project_tools import os_detect
+from typing import Optional
+import subprocess
+from project_tools import metrics, os_detect, tracing
 from project_tools.create_logger import create_logger
 import logging
 
 logger = create_logger(name=__name__, level=logging.DEBUG)
 
+# How far apart two modification times can be and still count as the same, for file systems that round them - FAT
+# (which CircuitPython devices use) only keeps even seconds. Everything else is compared exactly.
+MTIME_TOLERANCES_NS = {
+    "vfat": 2 * 1000 ** 3,
+    "msdos": 2 * 1000 ** 3,
+    "fat": 2 * 1000 ** 3,
+    "fat12": 2 * 1000 ** 3,
+    "fat16": 2 * 1000 ** 3,
+    "fat32": 2 * 1000 ** 3,
+    "exfat": 2 * 1000 ** 3,
+    "hfs": 1000 ** 3,
+    "ntfs": 100
+}
 
+DRIVE_SCAN_DURATION = metrics.histogram("cpypm_drive_scan_duration_seconds", "How long listing connected drives takes")
+
+
+@tracing.traced("list_connected_drives")
 def list_connected_drives(circuitpython_only: bool = True, drive_mount_point: Path = Path("/media")) -> list[Path]:
     """
     Returns a list of connected drives. On Windows, this will be something like `[WindowsPath('C:'), ...]`.
@@ -33,6 +54,11 @@ def list_connected_drives(circuitpython_only: bool = True, drive_mount_point: Pa
       systems.
     :return: A list of pathlib.Path objects that contain the drives.
     """
+    with DRIVE_SCAN_DURATION.time():
+        return _list_connected_drives(circuitpython_only, drive_mount_point)
+
+
+def _list_connected_drives(circuitpython_only: bool, drive_mount_point: Path) -> list[Path]:
     connected_drives: list = []
     logger.debug("Testing for CircuitPython drives" if circuitpython_only else "Not testing for CircuitPython drives!")
     logger.debug(f"Drive mount point is {repr(drive_mount_point)}")
@@ -64,3 +90,57 @@ def list_connected_drives(circuitpython_only: bool = True, drive_mount_point: Pa
         raise os_detect.UnknownPlatform("Unknown platform - does not know how to search for drives")
     logger.info(f"Connected drives are {repr(connected_drives)}" + (" (CircuitPython only!)" if circuitpython_only else ""))
     return connected_drives
+
+
+def file_system(path: Path) -> Optional[str]:
+    """
+    Find out what file system a path is on, like "vfat" or "ext4" on Linux, "msdos" or "apfs" on macOS and "FAT" or
+    "NTFS" on Windows.
+
+    :param path: A pathlib.Path to something on the drive.
+    :return: A str (lowercase), or None if it couldn't be found out.
+    """
+    try:
+        path = Path(path).resolve()
+        if os_detect.on_windows():
+            import ctypes
+            name = ctypes.create_unicode_buffer(261)
+            if not ctypes.windll.kernel32.GetVolumeInformationW(ctypes.c_wchar_p(path.anchor), None, 0, None, None,
+                                                                 None, name, len(name)):
+                return None
+            return name.value.lower()
+        elif os_detect.on_mac():
+            # Lines look like "/dev/disk4s1 on /Volumes/CIRCUITPY (msdos, local, nodev, nosuid, noowners)"
+            lines = subprocess.run(["mount"], capture_output=True, text=True, timeout=5).stdout.splitlines()
+            mounts = []
+            for line in lines:
+                mount_point, _, rest = line.partition(" on ")[2].rpartition(" (")
+                mounts.append((mount_point, rest.partition(",")[0].rstrip(")")))
+        else:
+            with open("/proc/mounts") as file:
+                # Spaces in mount points are written as \040
+                mounts = [(fields[1].replace("\\040", " "), fields[2])
+                          for fields in (line.split() for line in file) if len(fields) > 2]
+    except (OSError, ValueError, subprocess.SubprocessError):
+        logger.debug(f"Could not find out the file system of {repr(path)}", exc_info=True)
+        return None
+    best = None
+    for mount_point, fs_type in mounts:
+        if (path.as_posix() == mount_point or path.as_posix().startswith(mount_point.rstrip("/") + "/")) and \
+                (best is None or len(mount_point) > len(best[0])):
+            best = (mount_point, fs_type)
+    return None if best is None else best[1].lower()
+
+
+def mtime_tolerance_ns(path: Path) -> int:
+    """
+    How far apart a modification time copied to a drive can end up from the original, for telling whether a file on
+    the drive is unchanged - 2 seconds on FAT drives, 0 on file systems that keep times exactly (or if the file system
+    couldn't be found out).
+
+    :param path: A pathlib.Path to something on the drive.
+    :return: An int - nanoseconds.
+    """
+    tolerance = MTIME_TOLERANCES_NS.get(file_system(path), 0)
+    logger.debug(f"Modification times on {repr(path)} are compared to within {tolerance} ns")
+    return tolerance
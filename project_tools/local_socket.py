@@ -0,0 +1,316 @@
+"""
+A module for talking to other processes of the application on this machine - one JSON object per line over a Unix
+socket, or a localhost TCP socket whose port is written to a file where the platform has no Unix sockets. Sockets are
+named per working directory, since that is where config.json, log.log and the sync history live.
+
+Everything lives in a directory only the current user can get into - $XDG_RUNTIME_DIR/cpypm, or a 0700 cpypm-<uid>
+directory in the temporary directory (cpypm in %LOCALAPPDATA% on Windows). Any local user can connect to a TCP port, so
+the port file also holds a random token that clients send as their first line and servers check with authenticate.
+
+This only uses the standard library (not even create_logger), so clients that just send a request start quickly.
+
+-----------
+
+Classes list:
+
+No classes!
+
+-----------
+
+Functions list:
+
+- runtime_directory() -> Path
+- socket_path(name: str) -> Path
+- port_file(name: str) -> Path
+- connect(name: str, timeout: float) -> Optional[socket.socket]
+- bind(name: str) -> Optional[tuple[socket.socket, Path, Optional[str]]]
+- authenticate(sock: socket.socket, token: Optional[str]) -> bool
+- send(sock: socket.socket, message: dict) -> None
+- receive(sock: socket.socket) -> Optional[dict]
+- request(name: str, message: dict, timeout: float, answer_timeout: Optional[float] = None) -> Optional[dict]
+
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import socket
+import stat
+import tempfile
+
+# The sockets the application uses
+INSTANCE_SOCKET = "cpypm"
+DAEMON_SOCKET = "cpypmd"
+# How long bind waits for an existing socket to accept a connection before treating it as left behind
+BIND_CHECK_TIMEOUT = 0.5
+# The longest line receive will take, so a misbehaving client can't make it buffer forever
+MAX_MESSAGE_SIZE = 1024 * 1024
+# Not every platform has these - 0 leaves the flag out
+O_NOFOLLOW = getattr(os, "O_NOFOLLOW", 0)
+O_BINARY = getattr(os, "O_BINARY", 0)
+
+
+def runtime_directory() -> Path:
+    """
+    The directory sockets, port files and lock files go in, created if needed. On POSIX it must be a real directory
+    (not a symlink) owned by the current user that nobody else can get into, or someone could swap in their own socket.
+
+    :raise OSError: Raises OSError if the directory couldn't be created or someone else could get into it.
+    :return: A pathlib.Path.
+    """
+    if os.name == "nt":
+        directory = Path(os.environ.get("LOCALAPPDATA") or Path.home()) / "cpypm"
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and Path(runtime_dir).is_dir():
+        directory = Path(runtime_dir) / "cpypm"
+    else:
+        directory = Path(tempfile.gettempdir()) / f"cpypm-{os.getuid()}"
+    try:
+        directory.mkdir(mode=0o700)
+    except FileExistsError:
+        pass
+    info = directory.lstat()
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise OSError(f"{directory} is not a private directory owned by this user, not using it")
+    return directory
+
+
+def _address_name(name: str) -> str:
+    """
+    The name of a socket, named after the working directory.
+
+    :param name: A str - what the socket is for, like "cpypm".
+    :return: A str.
+    """
+    digest = hashlib.sha1(str(Path.cwd().resolve()).encode()).hexdigest()[:16]
+    return f"{name}-{digest}"
+
+
+def socket_path(name: str) -> Path:
+    """
+    Where a Unix socket goes - in the runtime directory rather than the working directory, since socket paths are
+    limited to about 100 characters.
+
+    :param name: A str - what the socket is for, like "cpypm".
+    :raise OSError: Raises OSError if the runtime directory can't be used.
+    :return: A pathlib.Path.
+    """
+    return runtime_directory() / f"{_address_name(name)}.sock"
+
+
+def port_file(name: str) -> Path:
+    """
+    Where the port and token go on platforms without Unix sockets.
+
+    :param name: A str - what the socket is for.
+    :raise OSError: Raises OSError if the runtime directory can't be used.
+    :return: A pathlib.Path.
+    """
+    return runtime_directory() / f"{_address_name(name)}.port"
+
+
+def _open_private(path: Path, flags: int) -> int:
+    """
+    Open a file in the runtime directory, created readable by the owner only. Refuses to follow a symlink where the
+    file should be.
+
+    :param path: A pathlib.Path.
+    :param flags: An int - os.open flags on top of O_CREAT.
+    :return: An int - the file descriptor.
+    """
+    return os.open(path, flags | os.O_CREAT | O_NOFOLLOW | O_BINARY, 0o600)
+
+
+def connect(name: str, timeout: float) -> Optional[socket.socket]:
+    """
+    Connect to whoever is listening, sending the token first over TCP.
+
+    :param name: A str - what the socket is for.
+    :param timeout: A float - seconds to wait on connecting and on every read and write after.
+    :return: A connected socket.socket, or None if nothing is listening.
+    """
+    token = None
+    try:
+        if hasattr(socket, "AF_UNIX"):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            address = str(socket_path(name))
+        else:
+            listener = json.loads(port_file(name).read_text())
+            address = ("127.0.0.1", int(listener["port"]))
+            token = str(listener["token"])
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    except (OSError, ValueError, TypeError, KeyError):
+        return None
+    sock.settimeout(timeout)
+    try:
+        sock.connect(address)
+        if token is not None:
+            send(sock, {"token": token})
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+@contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    """
+    Hold an exclusive lock on a file while starting to listen, so two processes starting at once can't both decide
+    nobody is listening. The lock file is left behind on purpose - deleting it would let a third process lock a new
+    file while the second still holds the old one.
+
+    :param path: A pathlib.Path to the lock file.
+    """
+    descriptor = _open_private(path, os.O_RDWR)
+    try:
+        if os.name == "nt":
+            import msvcrt
+            # Retries for about 10 seconds before raising OSError
+            msvcrt.locking(descriptor, msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(descriptor, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                os.lseek(descriptor, 0, os.SEEK_SET)
+                msvcrt.locking(descriptor, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(descriptor, fcntl.LOCK_UN)
+    finally:
+        os.close(descriptor)
+
+
+def bind(name: str) -> Optional[tuple[socket.socket, Path, Optional[str]]]:
+    """
+    Start listening, unless someone already is. A Unix socket (or port file) left behind by a process that crashed is
+    only replaced if nothing answers on it.
+
+    :param name: A str - what the socket is for.
+    :return: A tuple of the listening socket.socket, the pathlib.Path to delete when done (the socket or the port
+     file) and the token to pass to authenticate (None for Unix sockets, which only this user can reach), or None if
+     someone else is already listening or the socket couldn't be created.
+    """
+    token = None
+    try:
+        path = socket_path(name) if hasattr(socket, "AF_UNIX") else port_file(name)
+        with _locked(path.with_suffix(".lock")):
+            existing = connect(name, BIND_CHECK_TIMEOUT)
+            if existing is not None:
+                existing.close()
+                return None
+            if hasattr(socket, "AF_UNIX"):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    sock.bind(str(path))
+                    sock.listen(8)
+                except OSError:
+                    sock.close()
+                    return None
+            else:
+                token = secrets.token_hex(32)
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                try:
+                    sock.bind(("127.0.0.1", 0))
+                    sock.listen(8)
+                    descriptor = _open_private(path, os.O_WRONLY | os.O_TRUNC)
+                    with os.fdopen(descriptor, "w") as file:
+                        json.dump({"port": sock.getsockname()[1], "token": token}, file)
+                except OSError:
+                    sock.close()
+                    return None
+    except OSError:
+        return None
+    return sock, path, token
+
+
+def authenticate(sock: socket.socket, token: Optional[str]) -> bool:
+    """
+    Check the first line a client sent over a TCP socket against the token bind made.
+
+    :param sock: A socket.socket just accepted, with a timeout set.
+    :param token: A str - the token bind returned, or None if the socket doesn't need one.
+    :return: A bool - whether the client may go on.
+    """
+    if token is None:
+        return True
+    try:
+        message = receive(sock)
+    except (OSError, ValueError):
+        return False
+    if message is None or not isinstance(message.get("token"), str):
+        return False
+    return hmac.compare_digest(message["token"].encode(), token.encode())
+
+
+def send(sock: socket.socket, message: dict) -> None:
+    """
+    Send one message.
+
+    :param sock: A connected socket.socket.
+    :param message: A dict that can be turned into JSON.
+    :return: None.
+    """
+    sock.sendall(json.dumps(message).encode() + b"\n")
+
+
+def receive(sock: socket.socket) -> Optional[dict]:
+    """
+    Receive one message.
+
+    :param sock: A connected socket.socket.
+    :raise ValueError: Raises ValueError if what was received isn't a JSON object.
+    :return: A dict, or None if the other end closed the connection.
+    """
+    # Peek first and only take up to the newline, so a message sent right behind this one stays on the socket for the
+    # next call
+    line = bytearray()
+    while not line.endswith(b"\n"):
+        peeked = sock.recv(MAX_MESSAGE_SIZE, socket.MSG_PEEK)
+        if not peeked:
+            if line:
+                raise ValueError("The connection closed in the middle of a message")
+            return None
+        end = peeked.find(b"\n")
+        line += sock.recv(len(peeked) if end < 0 else end + 1)
+        if len(line) > MAX_MESSAGE_SIZE:
+            raise ValueError(f"Message is longer than {MAX_MESSAGE_SIZE} bytes")
+    message = json.loads(line)
+    if not isinstance(message, dict):
+        raise ValueError(f"Expected a JSON object, got {repr(message)}")
+    return message
+
+
+def request(name: str, message: dict, timeout: float, answer_timeout: Optional[float] = None) -> Optional[dict]:
+    """
+    Send one message and wait for the answer.
+
+    :param name: A str - what the socket is for.
+    :param message: A dict that can be turned into JSON.
+    :param timeout: A float - seconds to wait on connecting and sending.
+    :param answer_timeout: A float - seconds to wait for the answer, or None to wait as long as it takes. Defaults to
+     None.
+    :return: The answer as a dict, or None if nothing is listening or the answer never came.
+    """
+    sock = connect(name, timeout)
+    if sock is None:
+        return None
+    try:
+        with sock:
+            send(sock, message)
+            sock.settimeout(answer_timeout)
+            return receive(sock)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,269 @@
+"""
+A module with an in-process metrics registry - counters and histograms for things like bytes synced and how long a
+drive scan takes. The metrics can be printed as a summary or served on localhost in the Prometheus text format.
+
+    from project_tools import metrics
+
+    SYNC_BYTES = metrics.counter("cpypm_sync_bytes_total", "Bytes written to devices")
+    SYNC_BYTES.inc(1024)
+
+    with metrics.histogram("cpypm_sync_duration_seconds", "How long a sync takes").time():
+        ...
+
+-----------
+
+Classes list:
+
+- Counter.__init__(self, name: str, help_text: str)
+- Histogram.__init__(self, name: str, help_text: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS)
+- Registry.__init__(self)
+
+-----------
+
+Functions list:
+
+- counter(name: str, help_text: str) -> Counter
+- histogram(name: str, help_text: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram
+- snapshot() -> dict
+- render_prometheus() -> str
+- format_stats() -> str
+- serve(port: int, host: str = "127.0.0.1") -> "ThreadingHTTPServer"
+
+"""
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock, Thread
+from time import perf_counter
+from typing import TYPE_CHECKING, Iterator
+from project_tools.create_logger import create_logger
+import logging
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+# Seconds, from a quick config read up to a sync of a big project over a slow USB connection
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Counter:
+    """
+    A number that only goes up.
+    """
+    __slots__ = ("name", "help_text", "value", "_lock")
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        """
+        Add to the counter.
+
+        :param amount: A number - how much to add. Defaults to 1.
+        :return: None.
+        """
+        with self._lock:
+            self.value += amount
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter", f"{self.name} {self.value}"]
+
+
+class Histogram:
+    """
+    Counts observations (usually durations in seconds) in buckets, and keeps their total.
+    """
+    __slots__ = ("name", "help_text", "buckets", "bucket_counts", "sum", "count", "_lock")
+
+    def __init__(self, name: str, help_text: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        # The last slot is the +Inf bucket
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        """
+        Record one observation.
+
+        :param value: A number.
+        :return: None.
+        """
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.bucket_counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """
+        Observe how many seconds the body of a with statement takes, even if it raises.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            bucket_counts = list(self.bucket_counts)
+            total, count = self.sum, self.count
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + ("+Inf", ), bucket_counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {total}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+
+class Registry:
+    """
+    Every metric in the process, by name.
+    """
+    def __init__(self):
+        self.metrics = {}
+        self._lock = Lock()
+
+    def _get_or_create(self, metric_type: type, name: str, *args):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = metric_type(name, *args)
+            elif not isinstance(metric, metric_type):
+                raise ValueError(f"{repr(name)} is already registered as a {type(metric).__name__}")
+            return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get_or_create(Counter, name, help_text)
+
+    def histogram(self, name: str, help_text: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, buckets)
+
+    def snapshot(self) -> dict:
+        """
+        The current value of every metric.
+
+        :return: A dict of counter names to values, and histogram names to dicts with count, sum and mean.
+        """
+        result = {}
+        for name, metric in sorted(list(self.metrics.items())):
+            if isinstance(metric, Counter):
+                result[name] = metric.value
+            else:
+                result[name] = {
+                    "count": metric.count,
+                    "sum": round(metric.sum, 6),
+                    "mean": round(metric.sum / metric.count, 6) if metric.count else 0
+                }
+        return result
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for _, metric in sorted(list(self.metrics.items())):
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help_text: str) -> Counter:
+    """
+    Get a counter from the registry, creating it the first time.
+
+    :param name: A str - the metric name, like "cpypm_sync_bytes_total".
+    :param help_text: A str - what the counter counts.
+    :return: A Counter.
+    """
+    return REGISTRY.counter(name, help_text)
+
+
+def histogram(name: str, help_text: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    """
+    Get a histogram from the registry, creating it the first time.
+
+    :param name: A str - the metric name, like "cpypm_sync_duration_seconds".
+    :param help_text: A str - what the histogram measures.
+    :param buckets: A tuple of upper bounds for the buckets. Defaults to DEFAULT_BUCKETS (in seconds).
+    :return: A Histogram.
+    """
+    return REGISTRY.histogram(name, help_text, buckets)
+
+
+def snapshot() -> dict:
+    """
+    The current value of every metric.
+
+    :return: A dict - see Registry.snapshot.
+    """
+    return REGISTRY.snapshot()
+
+
+def render_prometheus() -> str:
+    """
+    Every metric in the Prometheus text exposition format.
+
+    :return: A str.
+    """
+    return REGISTRY.render_prometheus()
+
+
+def format_stats() -> str:
+    """
+    A short human-readable summary of every metric, one per line.
+
+    :return: A str.
+    """
+    lines = []
+    for name, value in snapshot().items():
+        if isinstance(value, dict):
+            lines.append(f"{name}: {value['count']} observation(s), total {value['sum']:.3f}, "
+                         f"mean {value['mean']:.3f}")
+        else:
+            lines.append(f"{name}: {value}")
+    return "\n".join(lines) if lines else "No metrics recorded"
+
+
+def serve(port: int, host: str = "127.0.0.1") -> "ThreadingHTTPServer":
+    """
+    Serve the metrics at http://host:port/metrics in a background thread.
+
+    :param port: An int - the port to listen on. 0 picks a free port.
+    :param host: A str - the address to listen on. Defaults to localhost only.
+    :return: The ThreadingHTTPServer - call shutdown() on it to stop serving.
+    """
+    # http.server pulls in http.client and email, so it is only imported when the endpoint is turned on
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            logger.debug("Metrics endpoint: " + format, *args)
+
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, name="metrics-endpoint", daemon=True).start()
+    logger.info(f"Serving metrics at http://{host}:{server.server_address[1]}/metrics")
+    return server
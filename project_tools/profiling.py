@@ -0,0 +1,130 @@
+"""
+A module that profiles individual operations (a sync, creating a project...) with cProfile when profiling is turned on.
+Each profiled operation is saved as its own pstats file, and a short summary of the slowest functions is logged.
+
+    from project_tools import profiling
+
+    with profiling.profiled("sync"):
+        ...
+
+cProfile only sees the thread that starts it, so the profile covers the worker thread running the operation and not
+the Tk main loop. Open a pstats file with `python -m pstats <file>` or a viewer like snakeviz.
+
+-----------
+
+Classes list:
+
+No classes!
+
+-----------
+
+Functions list:
+
+- set_enabled(enabled: bool = True, directory: Path = None) -> None
+- is_enabled() -> bool
+- profiled(name: str, top: int = DEFAULT_TOP) -> ContextManager[Optional[Path]]
+
+"""
+
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime
+from typing import TYPE_CHECKING, Iterator, Optional
+import io
+import re
+import threading
+from project_tools.create_logger import create_logger
+import logging
+
+if TYPE_CHECKING:
+    import cProfile
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+PROFILE_DIRECTORY = Path.cwd() / "profiles"
+# How many functions to list in the log summary
+DEFAULT_TOP = 15
+
+_enabled = False
+_directory = PROFILE_DIRECTORY
+# Only one operation is profiled at a time - newer Pythons allow a single active profiler per process
+_active = threading.Lock()
+
+
+def set_enabled(enabled: bool = True, directory: Path = None) -> None:
+    """
+    Turn profiling on or off. Operations that are already running are not affected.
+
+    :param enabled: A bool - whether to profile operations. Defaults to True.
+    :param directory: A pathlib.Path - where to write pstats files. Defaults to leaving it unchanged (./profiles).
+    :return: None.
+    """
+    global _enabled, _directory
+    _enabled = enabled
+    if directory is not None:
+        _directory = directory
+    logger.info(f"Profiling {'enabled, profiles go in ' + repr(_directory) if enabled else 'disabled'}")
+
+
+def is_enabled() -> bool:
+    """
+    Whether operations are being profiled.
+
+    :return: A bool.
+    """
+    return _enabled
+
+
+@contextmanager
+def profiled(name: str, top: int = DEFAULT_TOP) -> Iterator[Optional[Path]]:
+    """
+    Profile the body of a with statement, if profiling is on. While one operation is being profiled, others (including
+    ones nested inside it) run without a profile of their own.
+
+    :param name: A str - what the operation is called, used in the file name and the log.
+    :param top: An int - how many functions to list in the log summary. Defaults to DEFAULT_TOP.
+    :return: A context manager that gives the pathlib.Path the profile will be written to, or None if the body isn't
+     being profiled.
+    """
+    if not _enabled or not _active.acquire(blocking=False):
+        yield None
+        return
+    # cProfile and pstats are only imported once something is actually profiled
+    import cProfile
+    thread = threading.current_thread()
+    file_name = f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{thread.name}"
+    path = _directory / (re.sub(r"[^\w-]", "_", file_name) + ".pstats")
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+        try:
+            yield path
+        finally:
+            profile.disable()
+            _save(profile, name, path, top)
+    finally:
+        _active.release()
+
+
+def _save(profile: "cProfile.Profile", name: str, path: Path, top: int) -> None:
+    """
+    Write a profile to a pstats file and log its slowest functions.
+
+    :param profile: The cProfile.Profile to save.
+    :param name: A str - what the operation is called.
+    :param path: A pathlib.Path - where to write the pstats file.
+    :param top: An int - how many functions to list.
+    :return: None.
+    """
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        profile.dump_stats(str(path))
+    except OSError:
+        logger.exception(f"Could not write the profile of {repr(name)} to {repr(path)}!")
+        path = None
+    import pstats
+    summary = io.StringIO()
+    stats = pstats.Stats(profile, stream=summary)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+    logger.info(f"Profile of {repr(name)} ({stats.total_tt:.3f}s) saved to {repr(path)}, top {top} functions by "
+                f"cumulative time:\n{summary.getvalue().strip()}")
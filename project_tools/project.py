@@ -5,7 +5,16 @@ This module handles CircuitPython projects.
 
 Classes list:
 
-No classes!
+- SyncCancelled(Exception)
+- SyncProgress.__init__(self, current_file: str, files_done: int, files_total: int, bytes_done: int, bytes_total: int,
+                        seconds: float)
+- SyncOptions.__init__(self, sync_location: Path = None, record_history: bool = True, dry_run: bool = False,
+                       continue_on_error: bool = False, should_cancel: Callable[[], bool] = None,
+                       index: ProjectIndex = None)
+- FileAction.__init__(self, action: str, path: str, bytes: int = 0, seconds: float = 0.0, error: str = "")
+- SyncReport.__init__(self, project_name: str, project_root: Optional[Path], device: Optional[Path],
+                      started_at: datetime, seconds: float, outcome: str, error: str, dry_run: bool, phases: dict,
+                      actions: list[FileAction], copied: int, skipped: int, deleted: int, bytes: int)
 
 -----------
 
@@ -15,19 +24,55 @@ Functions list:
 - make_new_project(parent_directory: Path, project_name: str = "Untitled", project_description: str = "",
                    autogen_gitignore: bool = True,
                    dfl_cpy_hierarchy: Path = (Path.cwd() / "default_circuitpython_hierarchy")) -> None
-- sync_project(cpypm_config_path: Path) -> None
+- sync_project(cpypm_config_path: Union[Path, ProjectModel], sync_location: Path = None,
+               record_history: bool = True, progress: Callable[[SyncProgress], None] = None,
+               should_cancel: Callable[[], bool] = None, index: ProjectIndex = None) -> dict
+- diff_project(cpypm_config_path: Union[Path, ProjectModel], sync_location: Path = None,
+               index: ProjectIndex = None) -> list[tuple[str, str]]
+- sync(project: Union[Path, ProjectModel, ProjectConfig], options: SyncOptions = None,
+       progress: Callable[[SyncProgress], None] = None) -> SyncReport
+- device_copy_matches(source: Path, size: int, mtime_ns: int, dest: Path, dest_stat: os.stat_result,
+                      mtime_tolerance_ns: int = 0, last_synced: Optional[tuple[int, int, int]] = None) -> bool
 
 """
 
 from pathlib import Path
+from datetime import datetime
+from time import perf_counter
+import errno
+import filecmp
+import os
 import shutil
+import sqlite3
 import re
-from json import loads as load_json_string, dumps as dump_json_string
+from typing import Callable, Optional, Union
+from project_tools.project_config import ProjectConfig
+from project_tools.project_model import ProjectModel
+from project_tools.project_index import DIRECTORY, ProjectIndex
+from project_tools.sync_filter import SyncFilter
+from project_tools import drives, metrics, sync_history, tracing
 from project_tools.create_logger import create_logger
 import logging
 
 logger = create_logger(name=__name__, level=logging.DEBUG)
 
+# The message of the ValueError raised when a project has nowhere to sync to
+NO_SYNC_LOCATION = "sync_location has not been filled out!"
+
+SYNC_DURATION = metrics.histogram("cpypm_sync_duration_seconds", "How long syncing a project takes")
+SYNC_FAILURES = metrics.counter("cpypm_sync_failures_total", "Syncs that raised an exception")
+SYNC_FILES_COPIED = metrics.counter("cpypm_sync_files_copied_total", "Files written to devices")
+SYNC_FILES_SKIPPED = metrics.counter("cpypm_sync_files_skipped_total",
+                                     "Files not written because the device already had them")
+SYNC_FILES_DELETED = metrics.counter("cpypm_sync_files_deleted_total", "Files deleted from devices")
+SYNC_BYTES = metrics.counter("cpypm_sync_bytes_total", "Bytes written to devices")
+
+# Actions in a sync plan (and in a SyncReport, which also has skips)
+_COPY = "copy"
+_DELETE = "delete"
+_MKDIR = "mkdir"
+_SKIP = "skip"
+
 
 def replace_sus_chars(file_name: str) -> str:
     """
@@ -39,6 +84,7 @@ def replace_sus_chars(file_name: str) -> str:
     return re.sub("[^\w\-_. ]", "_", file_name)
 
 
+@tracing.traced("make_new_project")
 def make_new_project(parent_directory: Path, project_name: str = "Untitled", project_description: str = "",
                      autogen_gitignore: bool = True,
                      dfl_cpy_hierarchy: Path = (Path.cwd() / "default_circuitpython_hierarchy")) -> Path:
@@ -64,11 +110,10 @@ def make_new_project(parent_directory: Path, project_name: str = "Untitled", pro
     project_path.rename(new_path)
     cpypm_path = new_path / ".cpypmconfig"
     logger.debug(f"Path to .cpypmconfig is {repr(cpypm_path)}")
-    cpypm_config = load_json_string(cpypm_path.read_text())
-    cpypm_config["project_name"] = project_name
-    cpypm_config["description"] = project_description
-    cpypm_config["project_root"] = str(new_path)
-    cpypm_path.write_text(dump_json_string(cpypm_config, indent=4))
+    cpypm_config = ProjectConfig.load(cpypm_path).replace(project_name=project_name,
+                                                          description=project_description,
+                                                          project_root=new_path)
+    cpypm_config.save(cpypm_path)
     logger.debug(f"Filled .cpypmconfig")
     if autogen_gitignore:
         logger.debug("Auto-generating .gitignore")
@@ -85,33 +130,749 @@ def make_new_project(parent_directory: Path, project_name: str = "Untitled", pro
     return cpypm_path
 
 
-def sync_project(cpypm_config_path: Path) -> None:
+class SyncCancelled(Exception):
     """
-    Sync a project to the CircuitPython device.
+    Raised by sync_project when should_cancel says to stop. Files already copied stay on the device.
+    """
+    pass
+
+
+class SyncProgress:
+    """
+    A snapshot of how far along a sync is, passed to sync_project's progress callback.
+    """
+    __slots__ = ("current_file", "files_done", "files_total", "bytes_done", "bytes_total", "seconds")
+
+    def __init__(self, current_file: str, files_done: int, files_total: int, bytes_done: int, bytes_total: int,
+                 seconds: float):
+        """
+        :param current_file: A str - the file being copied (relative to the project root), or "" when done.
+        :param files_done: An int - how many files have been copied.
+        :param files_total: An int - how many files need copying.
+        :param bytes_done: An int - how many bytes have been copied.
+        :param bytes_total: An int - how many bytes need copying.
+        :param seconds: A float - how long copying has been going on.
+        """
+        self.current_file = current_file
+        self.files_done = files_done
+        self.files_total = files_total
+        self.bytes_done = bytes_done
+        self.bytes_total = bytes_total
+        self.seconds = seconds
+
+    def __repr__(self) -> str:
+        return (f"<SyncProgress {self.files_done}/{self.files_total} files, {self.bytes_done}/{self.bytes_total} "
+                f"bytes, {repr(self.current_file)}>")
+
+    @property
+    def fraction(self) -> float:
+        """
+        How far along the sync is, from 0 to 1, by bytes (or by files if there are only empty files to copy).
+        """
+        if self.bytes_total > 0:
+            return self.bytes_done / self.bytes_total
+        if self.files_total > 0:
+            return self.files_done / self.files_total
+        return 1.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_done / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        """
+        About how many seconds are left, or None if nothing has been copied yet to estimate from.
+        """
+        rate = self.bytes_per_second
+        if rate <= 0:
+            return None
+        return (self.bytes_total - self.bytes_done) / rate
+
+
+def sync_project(cpypm_config_path: Union[Path, ProjectModel], sync_location: Path = None,
+                 record_history: bool = True, progress: Callable[[SyncProgress], None] = None,
+                 should_cancel: Callable[[], bool] = None, index: ProjectIndex = None) -> dict:
+    """
+    Sync a project to the CircuitPython device. Only files that differ from the copy on the device (by size or
+    modification time) are written, and files on the device that are no longer in a synced directory are deleted.
+
+    Everything is compared first, so the progress callback knows the totals from its first call.
 
-    :param cpypm_config_path: A pathlib.Path - the path to the .cpypmconfig file.
-    :raise ValueError: Raises ValueError if the sync location of the file hasn't been set.
+    :param cpypm_config_path: A pathlib.Path - the path to the .cpypmconfig file, or an already loaded ProjectModel.
+    :param sync_location: A pathlib.Path - where to sync to instead of the project's sync_location. Defaults to None.
+    :param record_history: A bool - whether to add the sync to the sync history database. Defaults to True.
+    :param progress: A function called with a SyncProgress before and after every file copied. It runs on the syncing
+     thread, so it should return quickly. Defaults to None.
+    :param should_cancel: A function checked between files - if it returns True the sync stops. Defaults to None.
+    :param index: A ProjectIndex of the project to plan from instead of walking it, which the caller keeps up to
+     date. Defaults to None.
+    :raise ValueError: Raises ValueError if the sync location of the file hasn't been set, or ConfigValidationError
+     (a subclass of ValueError) if the file doesn't match the schema.
+    :raise SyncCancelled: Raises SyncCancelled if should_cancel returned True.
+    :return: A dict with copied, skipped and deleted (file counts), bytes (copied) and seconds.
+    """
+    run = _SyncRun(progress, should_cancel)
+    _run_sync(cpypm_config_path, sync_location, record_history, run, index=index)
+    return dict(run.counts(), seconds=run.seconds)
+
+
+def diff_project(cpypm_config_path: Union[Path, ProjectModel], sync_location: Path = None,
+                 index: ProjectIndex = None) -> list[tuple[str, str]]:
+    """
+    Work out what sync_project would do, without touching the device.
+
+    :param cpypm_config_path: A pathlib.Path - the path to the .cpypmconfig file, or an already loaded ProjectModel.
+    :param sync_location: A pathlib.Path - where to compare with instead of the project's sync_location. Defaults to
+     None.
+    :param index: A ProjectIndex of the project to plan from instead of walking it. Defaults to None.
+    :raise ValueError: Raises ValueError if the sync location of the file hasn't been set, or ConfigValidationError
+     (a subclass of ValueError) if the file doesn't match the schema.
+    :return: A list of ("copy", path) and ("delete", path), with paths relative to the device and forward slashes,
+     in the order the sync would do them.
+    """
+    run = _SyncRun()
+    plan = _load_and_plan(cpypm_config_path, sync_location, run, index)
+    changes = []
+    for action in plan:
+        if action[0] == _COPY:
+            changes.append((_COPY, action[2].relative_to(run.device).as_posix()))
+        elif action[0] == _DELETE:
+            changes.append((_DELETE, action[1].relative_to(run.device).as_posix()))
+    return changes
+
+
+class SyncOptions:
+    """
+    How sync should sync.
+    """
+    __slots__ = ("sync_location", "record_history", "dry_run", "continue_on_error", "should_cancel", "index")
+
+    def __init__(self, sync_location: Path = None, record_history: bool = True, dry_run: bool = False,
+                 continue_on_error: bool = False, should_cancel: Callable[[], bool] = None,
+                 index: ProjectIndex = None):
+        """
+        :param sync_location: A pathlib.Path - where to sync to instead of the project's sync_location. Defaults to
+         None.
+        :param record_history: A bool - whether to add the sync to the sync history database. Dry runs are never
+         recorded. Defaults to True.
+        :param dry_run: A bool - whether to only work out what would change, without touching the device. Defaults to
+         False.
+        :param continue_on_error: A bool - whether to keep going when a file can't be copied or deleted (the error is
+         recorded on its FileAction) instead of stopping at the first one. Defaults to False.
+        :param should_cancel: A function checked between files - if it returns True the sync stops. Defaults to None.
+        :param index: A ProjectIndex of the project to plan from instead of walking it, which the caller keeps up to
+         date (with refresh or update). Defaults to None.
+        """
+        self.sync_location = sync_location
+        self.record_history = record_history
+        self.dry_run = dry_run
+        self.continue_on_error = continue_on_error
+        self.should_cancel = should_cancel
+        self.index = index
+
+    def __repr__(self) -> str:
+        return (f"<SyncOptions sync_location={repr(self.sync_location)} record_history={self.record_history} "
+                f"dry_run={self.dry_run} continue_on_error={self.continue_on_error}>")
+
+
+class FileAction:
+    """
+    One thing a sync did (or with a dry run, would do) on the device.
+    """
+    __slots__ = ("action", "path", "bytes", "seconds", "error")
+
+    def __init__(self, action: str, path: str, bytes: int = 0, seconds: float = 0.0, error: str = ""):
+        """
+        :param action: A str - "copy", "skip" (the device already had it), "delete" or "mkdir".
+        :param path: A str - the path relative to the device, with forward slashes.
+        :param bytes: An int - the size of the file copied or skipped. Defaults to 0.
+        :param seconds: A float - how long it took. Defaults to 0.
+        :param error: A str - why it failed, or "" if it didn't. Defaults to "".
+        """
+        self.action = action
+        self.path = path
+        self.bytes = bytes
+        self.seconds = seconds
+        self.error = error
+
+    def __repr__(self) -> str:
+        return f"<FileAction {self.action} {repr(self.path)}" + (f" failed: {self.error}>" if self.error else ">")
+
+    def to_dict(self) -> dict:
+        return {"action": self.action, "path": self.path, "bytes": self.bytes, "seconds": self.seconds,
+                "error": self.error}
+
+
+class SyncReport:
+    """
+    What sync did. Unlike sync_project, problems are reported here instead of raised - check succeeded, outcome and
+    error, and errors for the files that failed.
+    """
+    __slots__ = ("project_name", "project_root", "device", "started_at", "seconds", "outcome", "error", "dry_run",
+                 "phases", "actions", "copied", "skipped", "deleted", "bytes")
+
+    def __init__(self, project_name: str, project_root: Optional[Path], device: Optional[Path], started_at: datetime,
+                 seconds: float, outcome: str, error: str, dry_run: bool, phases: dict, actions: list[FileAction],
+                 copied: int, skipped: int, deleted: int, bytes: int):
+        """
+        :param project_name: A str - the project's name, or "" if it couldn't be loaded.
+        :param project_root: A pathlib.Path, or None if the project couldn't be loaded.
+        :param device: A pathlib.Path - where it was synced to, or None if that isn't known.
+        :param started_at: A datetime.datetime.
+        :param seconds: A float - how long the whole sync took.
+        :param outcome: A str - "success", "failed" or "cancelled".
+        :param error: A str - why it failed or was cancelled, or "".
+        :param dry_run: A bool - whether the device was left alone.
+        :param phases: A dict of seconds spent in "load", "compare", "copy" and "delete".
+        :param actions: A list of FileAction, in the order they happened.
+        :param copied: An int - files copied.
+        :param skipped: An int - files the device already had.
+        :param deleted: An int - files deleted (including the files inside deleted directories).
+        :param bytes: An int - bytes copied.
+        """
+        self.project_name = project_name
+        self.project_root = project_root
+        self.device = device
+        self.started_at = started_at
+        self.seconds = seconds
+        self.outcome = outcome
+        self.error = error
+        self.dry_run = dry_run
+        self.phases = phases
+        self.actions = actions
+        self.copied = copied
+        self.skipped = skipped
+        self.deleted = deleted
+        self.bytes = bytes
+
+    def __repr__(self) -> str:
+        return (f"<SyncReport {self.outcome} {repr(self.project_name)} -> {self.device}: {self.copied} copied, "
+                f"{self.skipped} skipped, {self.deleted} deleted>")
+
+    @property
+    def succeeded(self) -> bool:
+        return self.outcome == "success"
+
+    @property
+    def errors(self) -> list[FileAction]:
+        """
+        The actions that failed.
+        """
+        return [action for action in self.actions if action.error]
+
+    def to_dict(self) -> dict:
+        """
+        The report as a dict that can be turned into JSON.
+
+        :return: A dict.
+        """
+        return {
+            "project_name": self.project_name,
+            "project_root": None if self.project_root is None else str(self.project_root),
+            "device": None if self.device is None else str(self.device),
+            "started_at": self.started_at.isoformat(),
+            "seconds": self.seconds,
+            "outcome": self.outcome,
+            "error": self.error,
+            "dry_run": self.dry_run,
+            "phases": dict(self.phases),
+            "copied": self.copied,
+            "skipped": self.skipped,
+            "deleted": self.deleted,
+            "bytes": self.bytes,
+            "actions": [action.to_dict() for action in self.actions]
+        }
+
+
+def sync(project: Union[Path, ProjectModel, ProjectConfig], options: SyncOptions = None,
+         progress: Callable[[SyncProgress], None] = None) -> SyncReport:
+    """
+    Sync a project (or with options.dry_run, work out what syncing would do) and report on it. This is the API for
+    scripts - it does what sync_project does, but failures and cancelling end up in the SyncReport instead of being
+    raised.
+
+        report = project.sync(Path("my_project/.cpypmconfig"), SyncOptions(continue_on_error=True))
+        if not report.succeeded:
+            print(report.error, report.errors)
+
+    :param project: A pathlib.Path to a .cpypmconfig file, a ProjectModel or a ProjectConfig.
+    :param options: A SyncOptions. Defaults to SyncOptions().
+    :param progress: A function called with a SyncProgress before and after every file copied. It runs on the syncing
+     thread, so it should return quickly. Defaults to None.
+    :return: A SyncReport.
+    """
+    if options is None:
+        options = SyncOptions()
+    run = _SyncRun(progress, options.should_cancel, options.continue_on_error)
+    try:
+        _run_sync(project, options.sync_location, options.record_history, run, options.dry_run, options.index)
+    except (OSError, ValueError, SyncCancelled):
+        logger.debug("Sync did not succeed", exc_info=True)
+    return run.to_report()
+
+
+def _run_sync(cpypm_config_path: Union[Path, ProjectModel, ProjectConfig], sync_location: Optional[Path],
+              record_history: bool, run: "_SyncRun", dry_run: bool = False, index: ProjectIndex = None) -> None:
+    """
+    Sync a project, updating a _SyncRun, the metrics and (unless it's a dry run) the sync history.
+
+    :raise: Raises whatever the sync raised, after recording it in the run.
     :return: None.
     """
-    cpypm_config = load_json_string(cpypm_config_path.read_text())
-    to_sync = [Path(p) for p in cpypm_config["files_to_sync"]]
-    project_root_path = Path(cpypm_config["project_root"])
-    sync_location_path = cpypm_config["sync_location"]
+    if dry_run:
+        run.dry_run = True
+        try:
+            plan = _load_and_plan(cpypm_config_path, sync_location, run, index)
+        except BaseException as error:
+            run.finish(error)
+            raise
+        for action in plan:
+            if action[0] == _COPY:
+                run.record(_COPY, action[2], action[3])
+            else:
+                run.record(action[0], action[1])
+        run.finish()
+        return
+    with tracing.span("sync_project") as sync_span:
+        try:
+            _apply_plan(_load_and_plan(cpypm_config_path, sync_location, run, index), run)
+        except BaseException as error:
+            run.finish(error)
+            if not isinstance(error, SyncCancelled):
+                SYNC_FAILURES.inc()
+            raise
+        else:
+            run.finish()
+        finally:
+            sync_span.set(**run.counts())
+            SYNC_DURATION.observe(run.seconds)
+            if record_history and run.device is not None:
+                _record_history(run)
+    SYNC_FILES_COPIED.inc(run.copied)
+    SYNC_FILES_SKIPPED.inc(run.skipped)
+    SYNC_FILES_DELETED.inc(run.deleted)
+    SYNC_BYTES.inc(run.bytes)
+    logger.info(f"Copied {run.copied} file(s) ({run.bytes} bytes), skipped {run.skipped} unchanged file(s) and "
+                f"deleted {run.deleted} file(s) from the device in {run.seconds:.2f}s")
+
+
+class _SyncRun:
+    """
+    What happened during one sync - the counts, how long each phase took and which files were copied.
+    """
+    __slots__ = ("started_at", "start", "seconds", "project_name", "project_root", "device", "copied", "skipped",
+                 "deleted", "bytes", "phases", "files", "outcome", "error", "files_total", "bytes_total",
+                 "copy_start", "progress", "should_cancel", "continue_on_error", "actions", "dry_run",
+                 "mtime_tolerance_ns", "board", "synced", "synced_copies", "synced_deletes")
+
+    def __init__(self, progress: Callable[[SyncProgress], None] = None, should_cancel: Callable[[], bool] = None,
+                 continue_on_error: bool = False):
+        self.started_at = datetime.now()
+        self.start = perf_counter()
+        self.seconds = 0.0
+        self.project_name = ""
+        self.project_root = None
+        self.device = None
+        self.copied = 0
+        self.skipped = 0
+        self.deleted = 0
+        self.bytes = 0
+        self.phases = {"load": 0.0, "compare": 0.0, "copy": 0.0, "delete": 0.0}
+        # (path relative to the project root, bytes, seconds) of every file copied
+        self.files = []
+        self.outcome = "running"
+        self.error = ""
+        # What the plan says needs copying
+        self.files_total = 0
+        self.bytes_total = 0
+        self.copy_start = None
+        self.progress = progress
+        self.should_cancel = should_cancel
+        self.continue_on_error = continue_on_error
+        # FileAction for everything done to the device, for the SyncReport
+        self.actions = []
+        self.dry_run = False
+        # How far apart modification times on the device can be from the project's and still match
+        self.mtime_tolerance_ns = 0
+        self.board = ""
+        # On devices that round modification times - what the last syncs wrote there (SyncHistory.synced_files), or
+        # None if that isn't known, and what this sync wrote and deleted, to remember for the next one
+        self.synced = None
+        self.synced_copies = []
+        self.synced_deletes = []
+
+    def finish(self, error: BaseException = None) -> None:
+        self.seconds = perf_counter() - self.start
+        failed = sum(1 for action in self.actions if action.error)
+        if error is None and failed > 0:
+            self.outcome = "failed"
+            self.error = f"{failed} file(s) could not be synced"
+        elif error is None:
+            self.outcome = "success"
+        elif isinstance(error, SyncCancelled):
+            self.outcome = "cancelled"
+            self.error = str(error)
+        else:
+            self.outcome = "failed"
+            self.error = f"{type(error).__name__}: {error}"
+
+    def counts(self) -> dict:
+        return {"copied": self.copied, "skipped": self.skipped, "deleted": self.deleted, "bytes": self.bytes}
+
+    def record(self, action: str, path: Path, size: int = 0, seconds: float = 0.0, error: str = "") -> None:
+        try:
+            relative_path = path.relative_to(self.device).as_posix()
+        except ValueError:
+            relative_path = str(path)
+        self.actions.append(FileAction(action, relative_path, size, seconds, error))
+
+    def to_report(self) -> SyncReport:
+        return SyncReport(self.project_name, self.project_root, self.device, self.started_at, self.seconds,
+                          self.outcome, self.error, self.dry_run, dict(self.phases), list(self.actions), self.copied,
+                          self.skipped, self.deleted, self.bytes)
+
+    def report(self, current_file: str = "") -> None:
+        if self.progress is not None:
+            seconds = 0.0 if self.copy_start is None else perf_counter() - self.copy_start
+            self.progress(SyncProgress(current_file, self.copied, self.files_total, self.bytes, self.bytes_total,
+                                       seconds))
+
+
+def _record_history(run: _SyncRun) -> None:
+    """
+    Add a sync to the history database. A broken database is logged, never raised - it shouldn't fail a sync.
+
+    :param run: The _SyncRun to record.
+    :return: None.
+    """
+    try:
+        sync_history.get_history().record({
+            "started_at": run.started_at,
+            "project_name": run.project_name,
+            "project_root": run.project_root,
+            "device": run.device,
+            "board": sync_history.read_board_info(run.device),
+            "files_copied": run.copied,
+            "files_skipped": run.skipped,
+            "files_deleted": run.deleted,
+            "bytes": run.bytes,
+            "seconds": run.seconds,
+            "phases": {name: round(seconds, 6) for name, seconds in run.phases.items()},
+            "outcome": run.outcome,
+            "error": run.error
+        }, run.files)
+        if run.mtime_tolerance_ns and (run.synced_copies or run.synced_deletes):
+            sync_history.get_history().record_synced_files(run.device, run.board, run.synced_copies,
+                                                           run.synced_deletes)
+    except sqlite3.Error:
+        logger.exception("Could not record the sync in the sync history!")
+
+
+def device_copy_matches(source: Path, size: int, mtime_ns: int, dest: Path, dest_stat: os.stat_result,
+                        mtime_tolerance_ns: int = 0, last_synced: Optional[tuple[int, int, int]] = None) -> bool:
+    """
+    Whether a file on the device matches the file in the project. Syncs copy modification times over, so a file with
+    the same size and modification time hasn't changed since it was last synced. On a file system that rounds times
+    (see drives.mtime_tolerance_ns), a same-size edit saved within the rounding looks the same, so those are checked
+    against what the last sync wrote, or if that isn't known, by comparing the contents.
+
+    :param source: A pathlib.Path to the file in the project.
+    :param size: An int - the size of the file in the project.
+    :param mtime_ns: An int - the modification time of the file in the project, in nanoseconds.
+    :param dest: A pathlib.Path to the file on the device.
+    :param dest_stat: The os.stat_result of the file on the device.
+    :param mtime_tolerance_ns: An int - how far apart the modification times can be. Defaults to 0.
+    :param last_synced: A tuple of (bytes, source mtime in nanoseconds, device mtime in nanoseconds) from
+     SyncHistory.synced_files, or None if it isn't known. Defaults to None.
+    :return: A bool.
+    """
+    if dest_stat.st_size != size:
+        return False
+    if dest_stat.st_mtime_ns == mtime_ns:
+        return True
+    if abs(dest_stat.st_mtime_ns - mtime_ns) > mtime_tolerance_ns:
+        return False
+    if last_synced is not None:
+        return last_synced == (size, mtime_ns, dest_stat.st_mtime_ns)
+    try:
+        return filecmp.cmp(source, dest, shallow=False)
+    except OSError:
+        return False
+
+
+def _is_unchanged(source: Path, size: int, mtime_ns: int, dest: Path, run: "_SyncRun") -> bool:
+    """
+    Whether a file on the device already matches the source file (see device_copy_matches). A match that took
+    comparing contents is remembered for the next sync.
+
+    :param source: A pathlib.Path to the file in the project.
+    :param size: An int - the size of the file in the project.
+    :param mtime_ns: An int - the modification time of the file in the project, in nanoseconds.
+    :param dest: A pathlib.Path to the file on the device.
+    :param run: The _SyncRun to update.
+    :return: A bool.
+    """
+    try:
+        dest_stat = dest.stat()
+    except OSError:
+        return False
+    device_path = _device_path(dest, run)
+    last_synced = None if run.synced is None else run.synced.get(device_path)
+    if not device_copy_matches(source, size, mtime_ns, dest, dest_stat, run.mtime_tolerance_ns, last_synced):
+        return False
+    if run.mtime_tolerance_ns and last_synced is None:
+        run.synced_copies.append((device_path, size, mtime_ns, dest_stat.st_mtime_ns))
+    return True
+
+
+def _device_path(path: Path, run: "_SyncRun") -> str:
+    try:
+        return path.relative_to(run.device).as_posix()
+    except ValueError:
+        return str(path)
+
+
+def _relative_path(path: Path, run: _SyncRun) -> str:
+    try:
+        return path.relative_to(run.project_root).as_posix()
+    except ValueError:
+        return str(path)
+
+
+def _plan_file(source: Path, dest: Path, size: int, mtime_ns: int, run: _SyncRun, plan: list[tuple]) -> None:
+    """
+    Add copying a file to the plan, unless the device already has it.
+
+    :param source: A pathlib.Path to the file in the project.
+    :param dest: A pathlib.Path to where it goes on the device.
+    :param size: An int - the size of the file in the project.
+    :param mtime_ns: An int - the modification time of the file in the project, in nanoseconds.
+    :param run: The _SyncRun to update.
+    :param plan: The list of actions to add to.
+    :return: None.
+    """
+    if dest.is_dir() and not dest.is_symlink():
+        plan.append((_DELETE, dest))
+    elif _is_unchanged(source, size, mtime_ns, dest, run):
+        run.skipped += 1
+        run.record(_SKIP, dest, size)
+        return
+    plan.append((_COPY, source, dest, size, mtime_ns))
+    run.files_total += 1
+    run.bytes_total += size
+
+
+def _plan_directory(source: Path, dest: Path, relative_path: str, index: ProjectIndex, run: _SyncRun,
+                    plan: list[tuple]) -> None:
+    """
+    Add what it takes to make a directory on the device match a directory in the project to the plan. Things on the
+    device that the project's patterns leave out are left alone, like rsync without --delete-excluded.
+
+    :param source: A pathlib.Path to the directory in the project.
+    :param dest: A pathlib.Path to the directory on the device.
+    :param relative_path: A str - the directory relative to the project root.
+    :param index: The ProjectIndex to read the project's side from.
+    :param run: The _SyncRun to update.
+    :param plan: The list of actions to add to.
+    :return: None.
+    """
+    if dest.is_dir():
+        with os.scandir(dest) as entries:
+            on_device = {entry.name: entry.is_dir() for entry in entries}
+    else:
+        if dest.exists() or dest.is_symlink():
+            plan.append((_DELETE, dest))
+        plan.append((_MKDIR, dest))
+        on_device = {}
+    for name, kind in index.children(relative_path).items():
+        on_device.pop(name, None)
+        child = f"{relative_path}/{name}"
+        if kind == DIRECTORY:
+            _plan_directory(source / name, dest / name, child, index, run, plan)
+        else:
+            size, mtime_ns, _ = index.entry(child)
+            _plan_file(source / name, dest / name, size, mtime_ns, run, plan)
+    for name in sorted(on_device):
+        if not index.excludes(f"{relative_path}/{name}", on_device[name]):
+            plan.append((_DELETE, dest / name))
+
+
+def _copy_file(source: Path, dest: Path, size: int, mtime_ns: int, run: _SyncRun) -> None:
+    """
+    Copy one file to the device, keeping its modification time so the next sync can skip it.
+
+    :param source: A pathlib.Path to the file in the project.
+    :param dest: A pathlib.Path to where it goes on the device.
+    :param size: An int - the size of the file from when the sync was planned.
+    :param mtime_ns: An int - the modification time of the file from when the sync was planned, in nanoseconds.
+    :param run: The _SyncRun to update.
+    :return: None.
+    """
+    relative_path = _relative_path(source, run)
+    run.report(relative_path)
+    logger.debug("Copying %r to %r", source, dest)
+    start = perf_counter()
+    with tracing.span("write file", path=str(source), bytes=size):
+        shutil.copyfile(source, dest)
+        try:
+            os.utime(dest, ns=(mtime_ns, mtime_ns))
+        except OSError:
+            logger.debug("Could not set the modification time of %r", dest)
+        if run.mtime_tolerance_ns:
+            run.synced_copies.append((_device_path(dest, run), size, mtime_ns, dest.stat().st_mtime_ns))
+    seconds = perf_counter() - start
+    run.phases["copy"] += seconds
+    run.copied += 1
+    run.bytes += size
+    run.files.append((relative_path, size, seconds))
+    run.record(_COPY, dest, size, seconds)
+    run.report(relative_path)
+
+
+def _remove(path: Path, run: _SyncRun) -> None:
+    """
+    Delete a file or directory from the device. Everything in a directory that can be deleted is, and everything that
+    can't is recorded as a failed action.
+
+    :param path: A pathlib.Path to delete.
+    :param run: The _SyncRun to update.
+    :raise OSError: Raises OSError if the file, or anything in the directory, couldn't be deleted.
+    :return: None.
+    """
+    logger.debug("Deleting %r from the device", path)
+    start = perf_counter()
+    if path.is_dir() and not path.is_symlink():
+        failed = 0
+        for directory, dir_names, file_names in os.walk(path, topdown=False):
+            directory = Path(directory)
+            for name in file_names + dir_names:
+                child = directory / name
+                try:
+                    if name in file_names:
+                        child.unlink()
+                        run.deleted += 1
+                    elif child.is_symlink():
+                        child.unlink()
+                    else:
+                        child.rmdir()
+                except OSError as error:
+                    failed += 1
+                    run.record(_DELETE, child, error=f"{type(error).__name__}: {error}")
+        try:
+            path.rmdir()
+        except OSError:
+            if not failed:
+                raise
+        if failed:
+            raise OSError(errno.EIO, f"Could not delete {failed} item(s) in the directory", str(path))
+    else:
+        path.unlink()
+        run.deleted += 1
+    seconds = perf_counter() - start
+    run.phases["delete"] += seconds
+    if run.mtime_tolerance_ns:
+        run.synced_deletes.append(_device_path(path, run))
+    run.record(_DELETE, path, seconds=seconds)
+
+
+def _apply_plan(plan: list[tuple], run: _SyncRun) -> None:
+    """
+    Carry out a sync plan, stopping between actions if the sync is cancelled. A failed action stops the sync unless
+    run.continue_on_error is set, in which case it is recorded and the sync goes on.
+
+    :param plan: The list of actions from planning.
+    :param run: The _SyncRun to update.
+    :raise SyncCancelled: Raises SyncCancelled if run.should_cancel returns True.
+    :raise OSError: Raises OSError if an action failed and run.continue_on_error isn't set.
+    :return: None.
+    """
+    run.copy_start = perf_counter()
+    run.report()
+    for action in plan:
+        if run.should_cancel is not None and run.should_cancel():
+            logger.warning(f"Sync cancelled after copying {run.copied} of {run.files_total} file(s)")
+            raise SyncCancelled(f"Sync cancelled after copying {run.copied} of {run.files_total} file(s)")
+        try:
+            if action[0] == _COPY:
+                _copy_file(*action[1:], run)
+            elif action[0] == _DELETE:
+                _remove(action[1], run)
+            else:
+                action[1].mkdir(parents=True, exist_ok=True)
+                run.record(_MKDIR, action[1])
+        except OSError as error:
+            if action[0] == _COPY:
+                run.record(_COPY, action[2], action[3], error=f"{type(error).__name__}: {error}")
+            else:
+                run.record(action[0], action[1], error=f"{type(error).__name__}: {error}")
+            if not run.continue_on_error:
+                raise
+            logger.warning(f"Could not {action[0]} {repr(run.actions[-1].path)}: {error}")
+    run.report()
+
+
+def _load_and_plan(cpypm_config_path: Union[Path, ProjectModel, ProjectConfig], sync_location: Path,
+                   run: _SyncRun, index: ProjectIndex = None) -> list[tuple]:
+    """
+    Load the project and compare it with the device.
+
+    :param cpypm_config_path: A pathlib.Path to the .cpypmconfig file, a ProjectModel or a ProjectConfig (which has
+     the same attributes).
+    :param sync_location: A pathlib.Path - where to sync to instead of the project's sync_location, or None.
+    :param run: The _SyncRun to update.
+    :param index: A ProjectIndex of the project, used as it is. Defaults to None, or if it is of another project (or
+     was made with other patterns), a new one.
+    :return: A list of actions for _apply_plan.
+    """
+    start = perf_counter()
+    with tracing.span("load project"):
+        if isinstance(cpypm_config_path, ProjectModel):
+            model = cpypm_config_path
+            model.refresh()
+        elif isinstance(cpypm_config_path, ProjectConfig):
+            model = cpypm_config_path
+        else:
+            model = ProjectModel(cpypm_config_path)
+    project_root_path = model.project_root
+    sync_location_path = model.sync_location if sync_location is None else sync_location
     if sync_location_path is None:
-        raise ValueError("sync_location has not been filled out!")
+        raise ValueError(NO_SYNC_LOCATION)
     else:
-        sync_location_path = Path(sync_location_path).absolute().resolve()
-    logger.info(f"Found {len(to_sync)} items to sync!")
+        sync_location_path = sync_location_path.absolute().resolve()
+    run.project_name = model.project_name
+    run.project_root = project_root_path
+    run.device = sync_location_path
+    run.mtime_tolerance_ns = drives.mtime_tolerance_ns(sync_location_path)
+    if run.mtime_tolerance_ns:
+        run.board = sync_history.read_board_info(sync_location_path)
+        run.synced = sync_history.load_synced_files(sync_location_path, run.board)
+    run.phases["load"] = perf_counter() - start
+    logger.info(f"Found {len(model.files_to_sync)} items to sync!")
     logger.debug(f"Sync location is {repr(sync_location_path)}")
     logger.debug(f"Project root path is {repr(project_root_path)}")
-    for path in to_sync:
-        new_path = sync_location_path / path
-        path = (project_root_path / path)
-        logger.debug(f"Syncing {repr(path)} to {repr(new_path)}")
-        if path.is_file():
-            new_path.write_bytes(path.read_bytes())
-        else:
-            if new_path.exists():
-                shutil.rmtree(new_path, ignore_errors=True)
-            # new_path.mkdir(parents=True, exist_ok=True)
-            shutil.copytree(path, new_path)
+    start = perf_counter()
+    sync_filter = model.sync_filter if isinstance(model, ProjectModel) else SyncFilter.for_project(model)
+    if index is None or not index.matches(project_root_path, model.files_to_sync, sync_filter):
+        index = ProjectIndex(project_root_path, model.files_to_sync, sync_filter)
+    if index.scans == 0:
+        index.scan()
+    plan = []
+    for item in model.files_to_sync:
+        if index.entry(item) is None:
+            raise FileNotFoundError(errno.ENOENT, "No such file or directory", str(project_root_path / item))
+    with tracing.span("compare files"):
+        # Items inside other items are compared as part of the outer one
+        for item in index.roots:
+            new_path = sync_location_path / item
+            path = project_root_path / item
+            logger.debug("Comparing %r with %r", path, new_path)
+            entry = index.entry(item)
+            if entry[2] == DIRECTORY:
+                _plan_directory(path, new_path, item, index, run, plan)
+            else:
+                _plan_file(path, new_path, entry[0], entry[1], run, plan)
+    run.phases["compare"] = perf_counter() - start
+    logger.debug(f"{run.files_total} file(s) ({run.bytes_total} bytes) to copy, {run.skipped} unchanged")
+    return plan
+
@@ -0,0 +1,290 @@
+"""
+A module that defines the typed, validated contents of a .cpypmconfig file.
+
+-----------
+
+Classes list:
+
+- ConfigValidationError(ValueError)
+- ProjectConfig.__init__(self, project_name: str = "", description: str = "", project_root: Path = None,
+                         sync_location: Path = None, files_to_sync: Iterable[str] = (), extra: dict = None,
+                         include: Iterable[str] = (), exclude: Iterable[str] = (), use_gitignore: bool = False)
+
+-----------
+
+Functions list:
+
+- migrate(data: dict) -> dict
+
+"""
+
+from pathlib import Path, PurePath
+from typing import Any, Iterable
+import json
+from project_tools.create_logger import create_logger
+import logging
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+SCHEMA_VERSION = 2
+KNOWN_KEYS = ("schema_version", "project_name", "description", "project_root", "sync_location", "files_to_sync",
+              "include", "exclude", "use_gitignore")
+
+
+class ConfigValidationError(ValueError):
+    """The .cpypmconfig file does not match the schema."""
+
+
+def _migrate_from_0(data: dict) -> dict:
+    """
+    Files written before the schema was versioned. Keys could be missing or null.
+    """
+    data.setdefault("project_name", None)
+    data.setdefault("description", None)
+    data.setdefault("project_root", None)
+    data.setdefault("sync_location", None)
+    if data.get("files_to_sync") is None:
+        data["files_to_sync"] = []
+    data["schema_version"] = 1
+    return data
+
+
+def _migrate_from_1(data: dict) -> dict:
+    """
+    Files from before include and exclude patterns - nothing is left out, so they keep syncing the same files.
+    """
+    data.setdefault("include", [])
+    data.setdefault("exclude", [])
+    data.setdefault("use_gitignore", False)
+    data["schema_version"] = 2
+    return data
+
+
+MIGRATIONS = {
+    0: _migrate_from_0,
+    1: _migrate_from_1
+}
+
+
+def migrate(data: dict) -> dict:
+    """
+    Bring a parsed .cpypmconfig up to the current schema version.
+
+    :param data: A dict - the parsed file. This may be modified.
+    :raise ConfigValidationError: Raises ConfigValidationError if the file is from a newer (unknown) schema version.
+    :return: A dict that matches the current schema version.
+    """
+    version = data.get("schema_version", 0)
+    if not isinstance(version, int) or version > SCHEMA_VERSION:
+        raise ConfigValidationError(f"Unsupported schema version {repr(version)} "
+                                    f"(this version of the program understands up to {SCHEMA_VERSION})")
+    while version < SCHEMA_VERSION:
+        logger.debug(f"Migrating .cpypmconfig from schema version {version}")
+        data = MIGRATIONS[version](data)
+        version = data["schema_version"]
+    return data
+
+
+class ProjectConfig:
+    """
+    The contents of a .cpypmconfig file. Instances are immutable - use replace() to get a changed copy. Keys this
+    version doesn't know about are kept in `extra` so they survive a load and save.
+    """
+    __slots__ = ("project_name", "description", "project_root", "sync_location", "files_to_sync", "extra",
+                 "include", "exclude", "use_gitignore", "_files_to_sync_set")
+
+    def __init__(self, project_name: str = "", description: str = "", project_root: Path = None,
+                 sync_location: Path = None, files_to_sync: Iterable[str] = (), extra: dict = None,
+                 include: Iterable[str] = (), exclude: Iterable[str] = (), use_gitignore: bool = False):
+        set_attr = object.__setattr__
+        set_attr(self, "project_name", project_name or "")
+        set_attr(self, "description", description or "")
+        set_attr(self, "project_root", None if project_root is None else Path(project_root))
+        set_attr(self, "sync_location", None if not sync_location else Path(sync_location))
+        set_attr(self, "files_to_sync", tuple(files_to_sync))
+        set_attr(self, "extra", dict(extra) if extra else {})
+        # .gitignore-style patterns, see sync_filter
+        set_attr(self, "include", tuple(include))
+        set_attr(self, "exclude", tuple(exclude))
+        set_attr(self, "use_gitignore", bool(use_gitignore))
+        set_attr(self, "_files_to_sync_set", None)
+
+    def __setattr__(self, key: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable, use replace() instead")
+
+    def __delattr__(self, key: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable, use replace() instead")
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, ProjectConfig):
+            return NotImplemented
+        return (self.project_name == other.project_name and self.description == other.description and
+                self.project_root == other.project_root and self.sync_location == other.sync_location and
+                self.files_to_sync == other.files_to_sync and self.extra == other.extra and
+                self.include == other.include and self.exclude == other.exclude and
+                self.use_gitignore == other.use_gitignore)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return (f"{type(self).__name__}(project_name={repr(self.project_name)}, "
+                f"project_root={repr(self.project_root)}, sync_location={repr(self.sync_location)}, "
+                f"files_to_sync=<{len(self.files_to_sync)} item(s)>)")
+
+    def replace(self, **changes) -> "ProjectConfig":
+        """
+        Get a copy of this config with some fields changed.
+
+        :param changes: Field names and their new values.
+        :return: A new ProjectConfig.
+        """
+        fields = {
+            "project_name": self.project_name,
+            "description": self.description,
+            "project_root": self.project_root,
+            "sync_location": self.sync_location,
+            "files_to_sync": self.files_to_sync,
+            "extra": self.extra,
+            "include": self.include,
+            "exclude": self.exclude,
+            "use_gitignore": self.use_gitignore
+        }
+        for key in changes:
+            if key not in fields:
+                raise TypeError(f"{repr(key)} is not a field of {type(self).__name__}")
+        fields.update(changes)
+        return ProjectConfig(**fields)
+
+    def syncs(self, path: str) -> bool:
+        """
+        Whether a path (relative to the project root) is in files_to_sync, without a linear search.
+
+        :param path: A str - the relative path.
+        :return: A bool.
+        """
+        if self._files_to_sync_set is None:
+            object.__setattr__(self, "_files_to_sync_set", frozenset(self.files_to_sync))
+        return path in self._files_to_sync_set
+
+    @staticmethod
+    def validate(data: dict) -> None:
+        """
+        Check a parsed, migrated .cpypmconfig against the schema.
+
+        :param data: A dict - the parsed file.
+        :raise ConfigValidationError: Raises ConfigValidationError with every problem found.
+        :return: None.
+        """
+        problems = []
+        for key in ("project_name", "description", "project_root", "sync_location"):
+            if data.get(key) is not None and not isinstance(data[key], str):
+                problems.append(f"{repr(key)} must be a string or null, not {type(data[key]).__name__}")
+        files_to_sync = data.get("files_to_sync")
+        if not isinstance(files_to_sync, list):
+            problems.append(f"'files_to_sync' must be a list, not {type(files_to_sync).__name__}")
+        else:
+            for item in files_to_sync:
+                if not isinstance(item, str) or not item:
+                    problems.append(f"'files_to_sync' entries must be non-empty strings, not {repr(item)}")
+                elif PurePath(item).is_absolute() or ".." in PurePath(item).parts:
+                    problems.append(f"'files_to_sync' entry {repr(item)} must be relative to the project root")
+        for key in ("include", "exclude"):
+            patterns = data.get(key)
+            if not isinstance(patterns, list):
+                problems.append(f"{repr(key)} must be a list, not {type(patterns).__name__}")
+            elif not all(isinstance(pattern, str) and pattern.strip("/") for pattern in patterns):
+                problems.append(f"{repr(key)} entries must be non-empty strings")
+        if not isinstance(data.get("use_gitignore"), bool):
+            problems.append(f"'use_gitignore' must be true or false, not {repr(data.get('use_gitignore'))}")
+        if problems:
+            raise ConfigValidationError("Invalid .cpypmconfig: " + "; ".join(problems))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ProjectConfig":
+        """
+        Migrate, validate and convert a parsed .cpypmconfig.
+
+        :param data: A dict - the parsed file.
+        :raise ConfigValidationError: Raises ConfigValidationError if the file doesn't match the schema.
+        :return: A ProjectConfig.
+        """
+        if not isinstance(data, dict):
+            raise ConfigValidationError(f"Invalid .cpypmconfig: expected an object, not {type(data).__name__}")
+        data = migrate(dict(data))
+        cls.validate(data)
+        return cls(project_name=data["project_name"], description=data["description"],
+                   project_root=data["project_root"], sync_location=data["sync_location"],
+                   files_to_sync=data["files_to_sync"], include=data["include"], exclude=data["exclude"],
+                   use_gitignore=data["use_gitignore"],
+                   extra={key: value for key, value in data.items() if key not in KNOWN_KEYS})
+
+    def to_dict(self) -> dict:
+        """
+        Convert to something that can be dumped as JSON. Keys are always in the same order.
+
+        :return: A dict.
+        """
+        data = {
+            "schema_version": SCHEMA_VERSION,
+            "project_name": self.project_name,
+            "description": self.description,
+            "project_root": None if self.project_root is None else str(self.project_root),
+            "sync_location": None if self.sync_location is None else str(self.sync_location),
+            "files_to_sync": list(self.files_to_sync),
+            "include": list(self.include),
+            "exclude": list(self.exclude),
+            "use_gitignore": self.use_gitignore
+        }
+        data.update(self.extra)
+        return data
+
+    @classmethod
+    def loads(cls, text: str) -> "ProjectConfig":
+        """
+        Parse the text of a .cpypmconfig file.
+
+        :param text: A str - the file contents.
+        :raise ConfigValidationError: Raises ConfigValidationError if it isn't valid JSON or doesn't match the schema.
+        :return: A ProjectConfig.
+        """
+        try:
+            data = json.loads(text)
+        except json.decoder.JSONDecodeError as error:
+            raise ConfigValidationError(f"Invalid .cpypmconfig: {error}") from error
+        return cls.from_dict(data)
+
+    def dumps(self) -> str:
+        """
+        Get the text of a .cpypmconfig file. The same config always produces the same text.
+
+        :return: A str.
+        """
+        return json.dumps(self.to_dict(), indent=4)
+
+    @classmethod
+    def load(cls, path: Path) -> "ProjectConfig":
+        """
+        Read a .cpypmconfig file.
+
+        :param path: A pathlib.Path to the file.
+        :raise ConfigValidationError: Raises ConfigValidationError if the file doesn't match the schema.
+        :return: A ProjectConfig.
+        """
+        return cls.loads(path.read_text())
+
+    def save(self, path: Path) -> bool:
+        """
+        Write to a .cpypmconfig file, leaving it alone if it already has exactly this content.
+
+        :param path: A pathlib.Path to the file.
+        :return: A bool - whether the file was written.
+        """
+        text = self.dumps()
+        try:
+            if path.read_text() == text:
+                logger.debug(f"{repr(path)} is unchanged, not writing")
+                return False
+        except FileNotFoundError:
+            pass
+        path.write_text(text)
+        return True
@@ -0,0 +1,354 @@
+"""
+A module that indexes the files a project syncs - walked once with os.scandir, kept in flat arrays and brought up to
+date without walking everything again, so sync planning, the sync status view and size checks can share one copy of
+every stat.
+
+    index = ProjectIndex(model.project_root, model.files_to_sync, model.sync_filter)
+    index.update(["code.py", "lib/new_driver.py"])  # from file system events
+    index.refresh()  # or, without events, check everything
+    print(index.total_size("lib"))
+
+-----------
+
+Classes list:
+
+- ProjectIndex.__init__(self, root: Path, items: Iterable[str], exclude: Callable[[str, bool], bool] = None)
+
+-----------
+
+Functions list:
+
+No functions!
+
+"""
+
+from array import array
+from pathlib import Path, PurePath
+from threading import RLock
+from typing import Callable, Iterable, Iterator, Optional
+import os
+import stat
+from project_tools import tracing
+from project_tools.create_logger import create_logger
+import logging
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+# Entry kinds
+FILE = 0
+DIRECTORY = 1
+# The kind of a slot whose entry was removed, waiting to be reused
+_FREE = 255
+
+
+class ProjectIndex:
+    """
+    Every file and directory under a project's files_to_sync. Entries are numbered, and the number indexes parallel
+    arrays of size, modification time (in nanoseconds) and kind, so even big projects take little memory. Directories
+    are listed once when first seen and again only when their modification time changes.
+
+    It is safe to use from several threads.
+    """
+    def __init__(self, root: Path, items: Iterable[str], exclude: Callable[[str, bool], bool] = None):
+        """
+        Index a project. Nothing is read until scan, refresh or update is called.
+
+        :param root: A pathlib.Path to the project root.
+        :param items: The project's files_to_sync - paths relative to the root, with forward slashes.
+        :param exclude: A function taking a path relative to the root and whether it is a directory, returning True to
+         leave it (and everything in it) out. The items themselves are never excluded, and neither are the directories
+         leading to items inside other items - though only the way to the item is indexed in those. Defaults to None.
+        """
+        self.root = Path(root)
+        self.items = tuple(items)
+        # Items inside other items (like "lib/sub" next to "lib") are indexed as part of the outer item, so only the
+        # outermost ones are walked from
+        self.roots = tuple(item for item in dict.fromkeys(self.items)
+                           if not any(item.startswith(other + "/") for other in self.items))
+        self._nested = {}
+        for item in self.items:
+            if item in self.roots:
+                continue
+            self._nested[item] = True
+            directory = item.rpartition("/")[0]
+            while directory not in self.roots and directory not in self._nested:
+                self._nested[directory] = False
+                directory = directory.rpartition("/")[0]
+        self.exclude = exclude
+        self.scans = 0
+        self._paths = []
+        self._sizes = array("q")
+        self._mtimes = array("q")
+        self._kinds = array("B")
+        self._ids = {}
+        self._children = {}
+        self._free = []
+        # Directories that are left out but lead to a nested item, so only that way is indexed
+        self._partial = set()
+        self._scanned = False
+        self._lock = RLock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._ids
+
+    def __repr__(self) -> str:
+        return f"<ProjectIndex of {repr(self.root)} with {len(self)} entries>"
+
+    def matches(self, root: Path, items: Iterable[str], exclude: Callable[[str, bool], bool] = None) -> bool:
+        """
+        Whether this index is of the given project root, files_to_sync and exclude function (like a SyncFilter, which
+        compares equal to another with the same patterns).
+
+        :param root: A pathlib.Path.
+        :param items: The files_to_sync.
+        :param exclude: The exclude function. Defaults to None.
+        :return: A bool.
+        """
+        return Path(root) == self.root and tuple(items) == self.items and self.exclude == exclude
+
+    def excludes(self, path: str, is_dir: bool) -> bool:
+        """
+        Whether the index leaves a path out - because the exclude function says so, or because it is in a left out
+        directory that is only indexed on the way to a nested item.
+
+        :param path: A str - the path relative to the root, with forward slashes.
+        :param is_dir: A bool - whether it is a directory.
+        :return: A bool.
+        """
+        if self._nested.get(path, False):
+            return False
+        if path.rpartition("/")[0] in self._partial:
+            return not (is_dir and path in self._nested)
+        return self.exclude is not None and self.exclude(path, is_dir) and not (is_dir and path in self._nested)
+
+    def _parent(self, path: str) -> str:
+        return "" if path in self.roots else path.rpartition("/")[0]
+
+    def _add(self, path: str, path_stat: os.stat_result) -> int:
+        kind = DIRECTORY if stat.S_ISDIR(path_stat.st_mode) else FILE
+        if self._free:
+            entry = self._free.pop()
+            self._paths[entry] = path
+            self._sizes[entry] = path_stat.st_size
+            self._mtimes[entry] = path_stat.st_mtime_ns
+            self._kinds[entry] = kind
+        else:
+            entry = len(self._paths)
+            self._paths.append(path)
+            self._sizes.append(path_stat.st_size)
+            self._mtimes.append(path_stat.st_mtime_ns)
+            self._kinds.append(kind)
+        self._ids[path] = entry
+        self._children.setdefault(self._parent(path), set()).add(path)
+        if kind == DIRECTORY:
+            self._children[path] = set()
+            self._list(path)
+        return entry
+
+    def _remove(self, path: str) -> None:
+        entry = self._ids.pop(path)
+        for child in self._children.pop(path, ()):
+            self._remove(child)
+        self._children.get(self._parent(path), set()).discard(path)
+        self._partial.discard(path)
+        self._paths[entry] = ""
+        self._kinds[entry] = _FREE
+        self._free.append(entry)
+
+    def _list(self, directory: str) -> int:
+        """
+        Add a directory's new entries and drop the ones that are gone.
+
+        :return: An int - how many entries were added or removed.
+        """
+        changed = 0
+        seen = set()
+        try:
+            with os.scandir(self.root / directory) as entries:
+                for entry in entries:
+                    path = f"{directory}/{entry.name}"
+                    try:
+                        is_dir = entry.is_dir()
+                        partial = False
+                        if not self._nested.get(path, False) and (
+                                directory in self._partial or
+                                (self.exclude is not None and self.exclude(path, is_dir))):
+                            if path not in self._nested or not is_dir:
+                                continue
+                            partial = True
+                        seen.add(path)
+                        known = self._ids.get(path)
+                        if known is not None and (self._kinds[known] == DIRECTORY) == is_dir:
+                            continue
+                        if known is not None:
+                            self._remove(path)
+                        if partial:
+                            self._partial.add(path)
+                        self._add(path, entry.stat())
+                        changed += 1
+                    except OSError:
+                        seen.discard(path)
+        except OSError:
+            logger.debug(f"Could not list {repr(directory)}")
+        for path in self._children[directory] - seen:
+            self._remove(path)
+            changed += 1
+        return changed
+
+    def _check(self, path: str, recursive: bool) -> int:
+        """
+        Bring one entry up to date - add it, remove it, or update its size and time (and for a directory whose time
+        changed, its list of entries).
+
+        :param path: A str - the path relative to the root.
+        :param recursive: A bool - whether to check everything in a directory too, not just its list of entries.
+        :return: An int - how many entries changed.
+        """
+        try:
+            path_stat = os.stat(self.root / path)
+        except OSError:
+            if path in self._ids:
+                self._remove(path)
+                return 1
+            return 0
+        entry = self._ids.get(path)
+        is_dir = stat.S_ISDIR(path_stat.st_mode)
+        if entry is None or (self._kinds[entry] == DIRECTORY) != is_dir:
+            if entry is not None:
+                self._remove(path)
+            self._add(path, path_stat)
+            return 1
+        changed = 0
+        if self._sizes[entry] != path_stat.st_size or self._mtimes[entry] != path_stat.st_mtime_ns:
+            self._sizes[entry] = path_stat.st_size
+            self._mtimes[entry] = path_stat.st_mtime_ns
+            changed = 1 if not is_dir else self._list(path)
+        if is_dir and recursive:
+            for child in list(self._children[path]):
+                changed += self._check(child, True)
+        return changed
+
+    @tracing.traced("index project")
+    def scan(self) -> None:
+        """
+        Forget everything and walk the project again.
+
+        :return: None.
+        """
+        with self._lock:
+            self._paths.clear()
+            self._sizes = array("q")
+            self._mtimes = array("q")
+            self._kinds = array("B")
+            self._ids.clear()
+            self._free.clear()
+            self._partial.clear()
+            self._children = {"": set()}
+            for item in self.roots:
+                self._check(item, False)
+            self._scanned = True
+            self.scans += 1
+        logger.debug(f"Indexed {len(self)} entries under {repr(self.root)}")
+
+    def refresh(self) -> int:
+        """
+        Bring the whole index up to date - one stat per entry, and directories are only listed again if they changed.
+        Use update instead when file system events say what changed.
+
+        :return: An int - how many entries changed.
+        """
+        with self._lock:
+            if not self._scanned:
+                self.scan()
+                return len(self)
+            return sum(self._check(item, True) for item in self.roots)
+
+    def update(self, paths: Iterable[str]) -> int:
+        """
+        Bring some paths up to date, for example from file system events. Paths that were created, modified, deleted
+        or renamed (both names) can be passed - directories that appeared are walked, ones that disappeared are
+        dropped with everything in them.
+
+        :param paths: Paths relative to the project root, or absolute paths inside it.
+        :return: An int - how many entries changed.
+        """
+        changed = 0
+        with self._lock:
+            if not self._scanned:
+                self.scan()
+                return len(self)
+            for path in paths:
+                path = PurePath(path)
+                if path.is_absolute():
+                    try:
+                        path = path.relative_to(self.root.absolute())
+                    except ValueError:
+                        continue
+                path = path.as_posix()
+                if not any(path == item or path.startswith(item + "/") for item in self.roots):
+                    continue
+                # Anything below the closest known directory is new, so that directory is the one to look at
+                while path not in self._ids and path not in self.roots:
+                    path = path.rpartition("/")[0]
+                changed += self._check(path, False)
+        return changed
+
+    def entry(self, path: str) -> Optional[tuple[int, int, int]]:
+        """
+        Look up one path.
+
+        :param path: A str - the path relative to the project root, with forward slashes.
+        :return: A tuple of (size, modification time in nanoseconds, kind), or None if it isn't in the index.
+        """
+        with self._lock:
+            entry = self._ids.get(path)
+            if entry is None:
+                return None
+            return self._sizes[entry], self._mtimes[entry], self._kinds[entry]
+
+    def children(self, path: str = "") -> dict[str, int]:
+        """
+        List a directory.
+
+        :param path: A str - the directory relative to the project root, or "" for the outermost files_to_sync (see
+         roots). Defaults to "".
+        :return: A dict of entry names to kinds (names are full relative paths for the outermost files_to_sync).
+        """
+        with self._lock:
+            start = len(path) + 1 if path else 0
+            return {child[start:]: self._kinds[self._ids[child]] for child in self._children.get(path, ())}
+
+    def walk(self, path: str = "") -> Iterator[tuple[str, int, int]]:
+        """
+        Every file in a directory and the directories in it.
+
+        :param path: A str - the directory (or file) relative to the project root, or "" for the whole project.
+         Defaults to "".
+        :return: An iterator of tuples of (path relative to the project root, size, modification time in nanoseconds),
+         in no particular order.
+        """
+        with self._lock:
+            if path and path not in self._ids:
+                return
+            pending = [path] if path else list(self._children.get("", ()))
+            files = []
+            while pending:
+                current = pending.pop()
+                entry = self._ids[current]
+                if self._kinds[entry] == DIRECTORY:
+                    pending.extend(self._children[current])
+                else:
+                    files.append((current, self._sizes[entry], self._mtimes[entry]))
+        yield from files
+
+    def total_size(self, path: str = "") -> int:
+        """
+        How many bytes of files there are in a directory, for checking whether they fit on a device.
+
+        :param path: A str - the directory relative to the project root, or "" for the whole project. Defaults to "".
+        :return: An int.
+        """
+        return sum(size for _, size, _ in self.walk(path))
@@ -0,0 +1,150 @@
+"""
+A module that keeps a parsed .cpypmconfig in memory and only re-parses it when the file changes.
+
+-----------
+
+Classes list:
+
+- ProjectModel.__init__(self, cpypm_config_path: Path)
+
+-----------
+
+Functions list:
+
+No functions!
+
+"""
+
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+from project_tools.project_config import ProjectConfig
+from project_tools.sync_filter import SyncFilter
+from project_tools import metrics, tracing
+from project_tools.create_logger import create_logger
+import logging
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+PROJECT_CONFIG_READS = metrics.counter("cpypm_project_config_reads_total", ".cpypmconfig files parsed from disk")
+PROJECT_CONFIG_WRITES = metrics.counter("cpypm_project_config_writes_total", ".cpypmconfig files saved to disk")
+
+
+class ProjectModel:
+    """
+    Owns the parsed contents of a .cpypmconfig file. The file is parsed on first use and again only when its
+    modification time changes or invalidate() is called (for example, from a file watcher).
+    """
+    def __init__(self, cpypm_config_path: Path):
+        """
+        Create a project model. Nothing is read until it is needed.
+
+        :param cpypm_config_path: A pathlib.Path to the .cpypmconfig file.
+        """
+        self.path = Path(cpypm_config_path)
+        self.loads = 0
+        self._config = None
+        self._mtime_ns = None
+        self._lock = Lock()
+        # (config, .gitignore modification time, SyncFilter)
+        self._sync_filter = None
+
+    def invalidate(self) -> None:
+        """
+        Forget the cached config so the next access re-parses the file. Call this when a watch event arrives.
+
+        :return: None.
+        """
+        with self._lock:
+            self._mtime_ns = None
+
+    def refresh(self) -> bool:
+        """
+        Re-parse the file if it has changed since we last read it. This costs a single stat when nothing changed.
+
+        :raise FileNotFoundError: Raises FileNotFoundError if the .cpypmconfig file no longer exists.
+        :raise ConfigValidationError: Raises ConfigValidationError if the file doesn't match the schema.
+        :return: A bool - whether the file was (re)loaded.
+        """
+        with self._lock:
+            mtime_ns = self.path.stat().st_mtime_ns
+            if self._config is not None and mtime_ns == self._mtime_ns:
+                return False
+            logger.debug(f"Parsing {repr(self.path)}")
+            with tracing.span("load .cpypmconfig", path=str(self.path)):
+                self._config = ProjectConfig.load(self.path)
+            self._mtime_ns = mtime_ns
+            self.loads += 1
+            PROJECT_CONFIG_READS.inc()
+            return True
+
+    @property
+    def config(self) -> ProjectConfig:
+        if self._config is None:
+            self.refresh()
+        return self._config
+
+    @property
+    def project_name(self) -> str:
+        return self.config.project_name
+
+    @property
+    def description(self) -> str:
+        return self.config.description
+
+    @property
+    def project_root(self) -> Path:
+        return self.config.project_root
+
+    @property
+    def sync_location(self) -> Optional[Path]:
+        return self.config.sync_location
+
+    @property
+    def files_to_sync(self) -> tuple[str, ...]:
+        return self.config.files_to_sync
+
+    @property
+    def include(self) -> tuple[str, ...]:
+        return self.config.include
+
+    @property
+    def exclude(self) -> tuple[str, ...]:
+        return self.config.exclude
+
+    @property
+    def use_gitignore(self) -> bool:
+        return self.config.use_gitignore
+
+    @property
+    def sync_filter(self) -> Optional[SyncFilter]:
+        """
+        The project's SyncFilter (or None if it leaves nothing out), made again only when the config or the
+        .gitignore changes.
+        """
+        config = self.config
+        gitignore_mtime_ns = None
+        if config.use_gitignore and config.project_root is not None:
+            try:
+                gitignore_mtime_ns = (config.project_root / ".gitignore").stat().st_mtime_ns
+            except OSError:
+                pass
+        cached = self._sync_filter
+        if cached is None or cached[0] is not config or cached[1] != gitignore_mtime_ns:
+            cached = self._sync_filter = (config, gitignore_mtime_ns, SyncFilter.for_project(config))
+        return cached[2]
+
+    def save(self, config: ProjectConfig) -> None:
+        """
+        Write a config to the file and keep it as the cached copy, so it doesn't get parsed again.
+
+        :param config: A ProjectConfig - the new config.
+        :return: None.
+        """
+        with self._lock:
+            logger.debug(f"Saving {repr(self.path)}")
+            with tracing.span("save .cpypmconfig", path=str(self.path)):
+                config.save(self.path)
+            PROJECT_CONFIG_WRITES.inc()
+            self._config = config
+            self._mtime_ns = self.path.stat().st_mtime_ns
@@ -0,0 +1,183 @@
+"""
+A module that keeps the list of recently opened projects along with cached information about each one.
+
+-----------
+
+Classes list:
+
+- RecentProjects.__init__(self, store: ConfigStore, limit: int = 10)
+
+-----------
+
+Functions list:
+
+No functions!
+
+"""
+
+from pathlib import Path
+from datetime import datetime
+from threading import RLock
+from typing import Optional
+from project_tools.config_store import ConfigStore
+from project_tools.project_config import ProjectConfig
+from project_tools.create_logger import create_logger
+import logging
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+PATHS_KEY = "opened_recent"
+METADATA_KEY = "opened_recent_metadata"
+
+
+class RecentProjects:
+    """
+    The recent projects list, stored in a ConfigStore. Every entry has cached metadata (project name, last sync time,
+    last known device and whether the .cpypmconfig still exists) so building a menu never touches the disk. Only
+    refresh() reads the projects, and it is safe to call from a background thread - every change to the stored list
+    and metadata is made under one lock, so changes from other threads aren't lost.
+    """
+    def __init__(self, store: ConfigStore, limit: int = 10):
+        """
+        :param store: The ConfigStore to keep the list in.
+        :param limit: An int - how many projects to remember. Defaults to 10.
+        """
+        self.store = store
+        self.limit = limit
+        self._lock = RLock()
+
+    def paths(self) -> list[Path]:
+        """
+        Get the recent projects, most recent first.
+
+        :return: A list of pathlib.Path to .cpypmconfig files.
+        """
+        return [Path(p) for p in self.store.get(PATHS_KEY) or []]
+
+    def metadata(self, path: Path) -> dict:
+        """
+        Get the cached metadata of a recent project. Does not touch the disk.
+
+        :param path: A pathlib.Path to the .cpypmconfig file.
+        :return: A dict with the keys "project_name", "last_sync", "last_device" and "exists".
+        """
+        entry = (self.store.get(METADATA_KEY) or {}).get(str(path), {})
+        return {
+            "project_name": entry.get("project_name"),
+            "last_sync": entry.get("last_sync"),
+            "last_device": entry.get("last_device"),
+            "exists": entry.get("exists", True)
+        }
+
+    def label(self, path: Path) -> str:
+        """
+        Get a menu label for a recent project from the cached metadata.
+
+        :param path: A pathlib.Path to the .cpypmconfig file.
+        :return: A str.
+        """
+        metadata = self.metadata(path)
+        label = f"{metadata['project_name']} ({path})" if metadata["project_name"] else str(path)
+        if metadata["last_sync"]:
+            label += f" - last synced {metadata['last_sync']}"
+        return label
+
+    def _update_metadata(self, path: Path, **changes) -> None:
+        with self._lock:
+            all_metadata = self.store.get(METADATA_KEY) or {}
+            all_metadata.setdefault(str(path), {}).update(changes)
+            self.store.set(METADATA_KEY, all_metadata)
+
+    def add(self, path: Path, config: Optional[ProjectConfig] = None) -> None:
+        """
+        Move a project to the top of the list (adding it if needed).
+
+        :param path: A pathlib.Path to the .cpypmconfig file.
+        :param config: The project's ProjectConfig, if it is already loaded, to fill in the metadata.
+        :return: None.
+        """
+        changes = {"exists": True}
+        if config is not None:
+            changes["project_name"] = config.project_name
+            if config.sync_location is not None:
+                changes["last_device"] = str(config.sync_location)
+        with self._lock:
+            paths = [p for p in self.store.get(PATHS_KEY) or [] if p != str(path)]
+            paths.insert(0, str(path))
+            dropped = paths[self.limit:]
+            self.store.set(PATHS_KEY, paths[:self.limit])
+            self._update_metadata(path, **changes)
+            if dropped:
+                self._forget(dropped)
+
+    def record_sync(self, path: Path, device: Path) -> None:
+        """
+        Remember that a project was just synced.
+
+        :param path: A pathlib.Path to the .cpypmconfig file.
+        :param device: A pathlib.Path to the device it was synced to.
+        :return: None.
+        """
+        self._update_metadata(path, last_sync=datetime.now().isoformat(sep=" ", timespec="seconds"),
+                              last_device=str(device))
+
+    def _forget(self, paths: list[str]) -> None:
+        with self._lock:
+            all_metadata = self.store.get(METADATA_KEY) or {}
+            for path in paths:
+                all_metadata.pop(path, None)
+            self.store.set(METADATA_KEY, all_metadata)
+
+    def clear(self) -> None:
+        """
+        Forget every recent project.
+
+        :return: None.
+        """
+        with self._lock:
+            self.store.set(PATHS_KEY, [])
+            self.store.set(METADATA_KEY, {})
+
+    def refresh(self, prune: bool = True) -> list[Path]:
+        """
+        Re-read every recent project from disk and update the cached metadata. This blocks, so call it from a
+        background thread.
+
+        :param prune: A bool - whether to drop projects whose .cpypmconfig no longer exists. Defaults to True.
+        :return: A list of pathlib.Path of the projects that were pruned.
+        """
+        paths = self.paths()
+        refreshed = {}
+        pruned = []
+        for path in paths:
+            try:
+                config = ProjectConfig.load(path)
+            except FileNotFoundError:
+                logger.debug(f"Recent project {repr(path)} no longer exists")
+                refreshed[str(path)] = {"exists": False}
+                if prune:
+                    pruned.append(str(path))
+                continue
+            except (OSError, ValueError):
+                logger.warning(f"Could not read recent project {repr(path)}")
+                refreshed[str(path)] = {"exists": path.exists()}
+                continue
+            refreshed[str(path)] = {"exists": True, "project_name": config.project_name}
+            if config.sync_location is not None:
+                refreshed[str(path)]["known_device"] = str(config.sync_location)
+        # Merge into what's stored now, in case projects were added or synced while we were reading - under the lock,
+        # so nothing can be added between reading the stored list and writing it back
+        with self._lock:
+            current = [p for p in self.store.get(PATHS_KEY) or [] if p not in pruned]
+            all_metadata = self.store.get(METADATA_KEY) or {}
+            for path, changes in refreshed.items():
+                entry = all_metadata.setdefault(path, {})
+                known_device = changes.pop("known_device", None)
+                if known_device is not None and not entry.get("last_device"):
+                    entry["last_device"] = known_device
+                entry.update(changes)
+            self.store.set(PATHS_KEY, current)
+            self.store.set(METADATA_KEY, {p: m for p, m in all_metadata.items() if p in current})
+        if pruned:
+            logger.info(f"Pruned {len(pruned)} missing recent project(s): {repr(pruned)}")
+        return [Path(p) for p in pruned]
@@ -0,0 +1,134 @@
+"""
+A module that keeps one instance of the application per working directory (the instances would otherwise share and
+clobber config.json and log.log). The first instance listens on a local socket - later launches hand their
+.cpypmconfig path to it and exit.
+
+    if single_instance.hand_off(path):
+        raise SystemExit(0)
+    server = single_instance.listen()
+
+-----------
+
+Classes list:
+
+- InstanceServer.__init__(self, sock: socket.socket, address: Path, token: Optional[str] = None)
+
+-----------
+
+Functions list:
+
+- hand_off(path: Optional[Path], timeout: float = HAND_OFF_TIMEOUT) -> bool
+- listen() -> Optional[InstanceServer]
+
+"""
+
+from pathlib import Path
+from typing import Optional
+import socket
+from project_tools import local_socket
+from project_tools.create_logger import create_logger
+import logging
+
+# Not set up with create_logger until listen is called, so a launch that hands its path off never opens log.log
+logger = logging.getLogger(__name__)
+
+# How long a launch waits for the running instance to answer before starting on its own
+HAND_OFF_TIMEOUT = 1.0
+# How long the running instance waits for a connected launch to send its request - accept_request runs on the Tk
+# main loop, and a launch sends its request as soon as it connects, so this is kept short
+REQUEST_TIMEOUT = 0.05
+
+
+def hand_off(path: Optional[Path], timeout: float = HAND_OFF_TIMEOUT) -> bool:
+    """
+    Ask the running instance to open a project (or just to come to the front).
+
+    :param path: A pathlib.Path to a .cpypmconfig file, or None.
+    :param timeout: A float - seconds to wait for the running instance. Defaults to HAND_OFF_TIMEOUT.
+    :return: A bool - whether a running instance took the request. If False, this process should start normally.
+    """
+    request = {"open": None if path is None else str(path.absolute())}
+    answer = local_socket.request(local_socket.INSTANCE_SOCKET, request, timeout, timeout)
+    if answer is None or answer.get("result") != "ok":
+        return False
+    logger.info(f"Handed {repr(request)} to the running instance")
+    return True
+
+
+class InstanceServer:
+    """
+    The running instance's end of the socket. Its accept_request is meant to be called whenever the socket is readable
+    (tk's createfilehandler, or polling), so no thread is needed.
+    """
+    def __init__(self, sock: socket.socket, address: Path, token: Optional[str] = None):
+        """
+        :param sock: A listening, non-blocking socket.socket.
+        :param address: The pathlib.Path of the Unix socket or the port file, deleted on close.
+        :param token: The token later launches must send first, from local_socket.bind. Defaults to None.
+        """
+        self.socket = sock
+        self.address = address
+        self.token = token
+
+    def fileno(self) -> int:
+        return self.socket.fileno()
+
+    def accept_request(self) -> Optional[dict]:
+        """
+        Take one request from a later launch, if one is waiting.
+
+        :return: A dict like {"open": "/path/to/.cpypmconfig"} ("open" is None to just come to the front), or None if
+         nothing was waiting or the request was broken.
+        """
+        try:
+            connection, _ = self.socket.accept()
+        except (BlockingIOError, InterruptedError):
+            return None
+        except OSError:
+            logger.exception("Could not accept a connection from another instance!")
+            return None
+        with connection:
+            connection.settimeout(REQUEST_TIMEOUT)
+            if not local_socket.authenticate(connection, self.token):
+                logger.warning("Dropped a connection that didn't send the right token")
+                return None
+            try:
+                request = local_socket.receive(connection)
+                if request is None or not isinstance(request.get("open"), (str, type(None))):
+                    raise ValueError(f"Unexpected request {repr(request)}")
+                local_socket.send(connection, {"result": "ok"})
+            except (OSError, ValueError):
+                logger.exception("Got a broken request from another instance!")
+                return None
+        logger.info(f"Got {repr(request)} from another instance")
+        return request
+
+    def close(self) -> None:
+        """
+        Stop listening, so the next launch becomes the running instance.
+
+        :return: None.
+        """
+        self.socket.close()
+        try:
+            self.address.unlink()
+        except OSError:
+            pass
+
+
+def listen() -> Optional[InstanceServer]:
+    """
+    Become the running instance. Call this after hand_off returns False.
+
+    :return: An InstanceServer, or None if another instance started listening in the meantime (try hand_off again) or
+     the socket couldn't be created (run without single-instance mode).
+    """
+    create_logger(name=__name__, level=logging.DEBUG)
+    bound = local_socket.bind(local_socket.INSTANCE_SOCKET)
+    if bound is None:
+        logger.warning("Could not listen for other instances, another instance may have just started")
+        return None
+    sock, address, token = bound
+    sock.setblocking(False)
+    logger.info(f"Listening for other instances on {repr(address)}")
+    return InstanceServer(sock, address, token)
@@ -0,0 +1,181 @@
+"""
+A module that decides which files in a project's synced directories are left out of syncs - the project's exclude
+patterns, its .gitignore (if use_gitignore is on) and its include patterns, which bring back anything the other two
+left out. Patterns use .gitignore syntax:
+
+- `*` and `?` match within a name, `**` matches any number of directories and `[abc]` matches one character
+- a pattern ending in `/` only matches directories
+- a pattern with a `/` anywhere but the end is relative to the project root, otherwise it matches at any depth
+- in .gitignore, `!` brings back something an earlier pattern left out and `#` starts a comment
+
+Only the .gitignore at the project root is read. As with git, nothing inside a left out directory can be brought back.
+
+-----------
+
+Classes list:
+
+- SyncFilter.__init__(self, exclude: Iterable[str] = (), include: Iterable[str] = (), gitignore: Iterable[str] = ())
+
+-----------
+
+Functions list:
+
+- translate(pattern: str) -> tuple[str, bool]
+
+"""
+
+from typing import Any, Iterable, Optional
+import re
+from project_tools.create_logger import create_logger
+import logging
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+
+def translate(pattern: str) -> tuple[str, bool]:
+    """
+    Turn one .gitignore-style pattern into a regular expression for paths relative to the project root.
+
+    :param pattern: A str - the pattern, without a leading "!".
+    :return: A tuple of the regular expression (a str) and whether the pattern only matches directories.
+    """
+    directories_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    parts = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+            continue
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+            continue
+        elif char == "*":
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            characters = pattern[i + 1:end]
+            if characters.startswith("!"):
+                characters = "^" + characters[1:]
+            parts.append("[" + characters.replace("\\", "\\\\") + "]")
+            i = end
+        elif char == "\\" and i + 1 < len(pattern):
+            parts.append(re.escape(pattern[i + 1]))
+            i += 1
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    return ("" if anchored else "(?:.*/)?") + "".join(parts), directories_only
+
+
+class SyncFilter:
+    """
+    A compiled set of patterns, called like `sync_filter(path, is_dir)` - which is what ProjectIndex takes as its
+    exclude function. Every pattern goes into one regular expression per kind of path (the last matching pattern wins,
+    like in .gitignore), so checking a path costs one match no matter how many patterns there are.
+    """
+    def __init__(self, exclude: Iterable[str] = (), include: Iterable[str] = (), gitignore: Iterable[str] = ()):
+        """
+        :param exclude: Patterns to leave out.
+        :param include: Patterns to sync even if they would be left out.
+        :param gitignore: The lines of a .gitignore file, applied after exclude. Defaults to ().
+        """
+        rules = [(pattern, False) for pattern in exclude]
+        for line in gitignore:
+            line = line.rstrip("\r\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            # Trailing spaces are ignored unless they are escaped
+            line = re.sub(r"(?<!\\) +$", "", line)
+            if line.startswith("!"):
+                rules.append((line[1:], True))
+            else:
+                rules.append((line[1:] if line.startswith("\\") else line, False))
+        rules += [(pattern, True) for pattern in include]
+        self.rules = tuple((pattern, included) for pattern, included in rules if pattern.strip("/"))
+        self._files = self._compile(False)
+        self._directories = self._compile(True)
+
+    def _compile(self, for_directories: bool) -> Optional[re.Pattern]:
+        alternatives = []
+        # Alternatives are tried in order, so the last pattern goes first
+        for number in range(len(self.rules) - 1, -1, -1):
+            regex, directories_only = translate(self.rules[number][0])
+            if directories_only and not for_directories:
+                continue
+            alternatives.append(f"(?P<rule{number}>{regex})")
+        if not alternatives:
+            return None
+        return re.compile("|".join(alternatives), re.DOTALL)
+
+    @classmethod
+    def for_project(cls, config: Any) -> Optional["SyncFilter"]:
+        """
+        Make the filter for a project.
+
+        :param config: A ProjectConfig (or ProjectModel).
+        :return: A SyncFilter, or None if the project leaves nothing out.
+        """
+        gitignore = ()
+        if config.use_gitignore and config.project_root is not None:
+            try:
+                gitignore = (config.project_root / ".gitignore").read_text(errors="replace").splitlines()
+            except OSError:
+                logger.debug(f"Could not read the .gitignore in {repr(config.project_root)}")
+        if not config.exclude and not config.include and not gitignore:
+            return None
+        return cls(config.exclude, config.include, gitignore)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, SyncFilter):
+            return NotImplemented
+        return self.rules == other.rules
+
+    def __hash__(self) -> int:
+        return hash(self.rules)
+
+    def __repr__(self) -> str:
+        return f"<SyncFilter with {len(self.rules)} pattern(s)>"
+
+    def __call__(self, path: str, is_dir: bool) -> bool:
+        """
+        Whether a path is left out. Only the path itself is checked, not the directories it is in - walks don't go
+        into left out directories.
+
+        :param path: A str - the path relative to the project root, with forward slashes.
+        :param is_dir: A bool - whether it is a directory.
+        :return: A bool.
+        """
+        regex = self._directories if is_dir else self._files
+        if regex is None:
+            return False
+        match = regex.fullmatch(path)
+        if match is None:
+            return False
+        return not self.rules[int(match.lastgroup[4:])][1]
+
+    def excludes_path(self, path: str, is_dir: bool = False, start: str = "") -> bool:
+        """
+        Whether a path, or any directory it is in below start, is left out.
+
+        :param path: A str - the path relative to the project root, with forward slashes.
+        :param is_dir: A bool - whether it is a directory. Defaults to False.
+        :param start: A str - a directory that path is in (like the synced item it came from), which isn't checked.
+         Defaults to "".
+        :return: A bool.
+        """
+        if self(path, is_dir):
+            return True
+        directory = path.rpartition("/")[0]
+        while len(directory) > len(start):
+            if self(directory, True):
+                return True
+            directory = directory.rpartition("/")[0]
+        return False
@@ -0,0 +1,299 @@
+"""
+A module that records every sync in a local SQLite database, so trends (a library suddenly doubling in size, a sync
+getting slower) can be spotted after the "Syncing files..." dialog is long gone. It also remembers the exact
+modification times behind every file synced to a FAT device, since FAT only keeps even seconds (see
+SyncHistory.synced_files).
+
+-----------
+
+Classes list:
+
+- SyncHistory.__init__(self, path: Path = HISTORY_LOCATION)
+
+-----------
+
+Functions list:
+
+- read_board_info(device: Path) -> str
+- get_history() -> SyncHistory
+- load_synced_files(device: Path, board: str) -> Optional[dict[str, tuple[int, int, int]]]
+
+"""
+
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+import json
+import sqlite3
+from project_tools.create_logger import create_logger
+import logging
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+HISTORY_LOCATION = Path.cwd() / "sync_history.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    project_name TEXT NOT NULL,
+    project_root TEXT NOT NULL,
+    device TEXT NOT NULL,
+    board TEXT NOT NULL,
+    files_copied INTEGER NOT NULL,
+    files_skipped INTEGER NOT NULL,
+    files_deleted INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    phases TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    error TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_project ON runs (project_root, started_at);
+CREATE TABLE IF NOT EXISTS files (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_by_run ON files (run_id);
+CREATE TABLE IF NOT EXISTS synced_files (
+    device TEXT NOT NULL,
+    board TEXT NOT NULL,
+    path TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    source_mtime_ns INTEGER NOT NULL,
+    device_mtime_ns INTEGER NOT NULL,
+    PRIMARY KEY (device, board, path)
+);
+"""
+
+_history = None
+_history_lock = Lock()
+
+
+def read_board_info(device: Path) -> str:
+    """
+    Get the first line of a CircuitPython device's boot_out.txt, which names the CircuitPython version and the board.
+
+    :param device: A pathlib.Path to the device.
+    :return: A str, or "" if there is no readable boot_out.txt.
+    """
+    try:
+        with (device / "boot_out.txt").open(errors="replace") as file:
+            return file.readline().strip()
+    except OSError:
+        return ""
+
+
+class SyncHistory:
+    """
+    The sync history database. One connection is shared between threads, behind a lock.
+    """
+    def __init__(self, path: Path = HISTORY_LOCATION):
+        """
+        Open (and create, if needed) a sync history database.
+
+        :param path: A pathlib.Path to the database file. Defaults to ./sync_history.sqlite3.
+        """
+        self.path = path
+        self._lock = Lock()
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        with self._connection:
+            self._connection.execute("PRAGMA foreign_keys = ON")
+            self._connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def record(self, run: dict, files: list[tuple[str, int, float]] = ()) -> int:
+        """
+        Add a sync to the history.
+
+        :param run: A dict with started_at (a datetime), project_name, project_root, device, board, files_copied,
+         files_skipped, files_deleted, bytes, seconds, phases (a dict of phase names to seconds), outcome and error.
+        :param files: A list of (path relative to the project root, bytes, seconds) for every file copied.
+        :return: An int - the id of the new run.
+        """
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO runs (started_at, project_name, project_root, device, board, files_copied, files_skipped, "
+                "files_deleted, bytes, seconds, phases, outcome, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run["started_at"].isoformat(timespec="seconds"), run["project_name"], str(run["project_root"]),
+                 str(run["device"]), run["board"], run["files_copied"], run["files_skipped"], run["files_deleted"],
+                 run["bytes"], run["seconds"], json.dumps(run["phases"]), run["outcome"], run["error"])
+            )
+            run_id = cursor.lastrowid
+            self._connection.executemany("INSERT INTO files (run_id, path, bytes, seconds) VALUES (?, ?, ?, ?)",
+                                         [(run_id, path, size, seconds) for path, size, seconds in files])
+        logger.debug(f"Recorded sync run {run_id} with {len(files)} copied file(s)")
+        return run_id
+
+    def synced_files(self, device: Path, board: str) -> dict[str, tuple[int, int, int]]:
+        """
+        What the last syncs wrote to a device. A FAT device rounds modification times to 2 seconds, so a same-size
+        edit saved within 2 seconds of the synced version can't be told apart by the device's times alone - but the
+        exact time of the source file that was copied, and the time the device ended up with, can be.
+
+        :param device: A pathlib.Path to the device.
+        :param board: A str - the device's read_board_info, so another board mounted at the same place doesn't match.
+        :return: A dict of paths relative to the device to tuples of (bytes, source mtime in nanoseconds, device mtime
+         in nanoseconds).
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT path, bytes, source_mtime_ns, device_mtime_ns FROM synced_files WHERE device = ? AND board = ?",
+                (str(device), board)
+            ).fetchall()
+        return {row["path"]: (row["bytes"], row["source_mtime_ns"], row["device_mtime_ns"]) for row in rows}
+
+    def record_synced_files(self, device: Path, board: str, copied: list[tuple[str, int, int, int]],
+                            deleted: list[str] = ()) -> None:
+        """
+        Remember what a sync wrote to (and deleted from) a device, for synced_files.
+
+        :param device: A pathlib.Path to the device.
+        :param board: A str - the device's read_board_info.
+        :param copied: A list of (path relative to the device, bytes, source mtime in nanoseconds, device mtime in
+         nanoseconds).
+        :param deleted: A list of paths relative to the device of deleted files and directories. Defaults to ().
+        :return: None.
+        """
+        with self._lock, self._connection:
+            for path in deleted:
+                self._connection.execute(
+                    "DELETE FROM synced_files WHERE device = ? AND board = ? AND (path = ? OR substr(path, 1, ?) = ?)",
+                    (str(device), board, path, len(path) + 1, path + "/")
+                )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO synced_files (device, board, path, bytes, source_mtime_ns, device_mtime_ns) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(str(device), board, path, size, source_mtime_ns, device_mtime_ns)
+                 for path, size, source_mtime_ns, device_mtime_ns in copied]
+            )
+
+    def runs(self, project_root: Optional[Path] = None, limit: int = 20) -> list[dict]:
+        """
+        The most recent syncs, newest first.
+
+        :param project_root: A pathlib.Path - only include syncs of this project. Defaults to None (every project).
+        :param limit: An int - how many syncs to return. Defaults to 20.
+        :return: A list of dicts with the same keys record() takes, plus id. phases is decoded back into a dict.
+        """
+        query = "SELECT * FROM runs"
+        params = []
+        if project_root is not None:
+            query += " WHERE project_root = ?"
+            params.append(str(project_root))
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._connection.execute(query, params).fetchall()
+        runs = []
+        for row in rows:
+            run = dict(row)
+            run["phases"] = json.loads(run["phases"])
+            runs.append(run)
+        return runs
+
+    def slowest_files(self, project_root: Optional[Path] = None, limit: int = 10) -> list[dict]:
+        """
+        The files that took the longest to copy, on average, along with the largest size they have been copied at.
+
+        :param project_root: A pathlib.Path - only include this project. Defaults to None (every project).
+        :param limit: An int - how many files to return. Defaults to 10.
+        :return: A list of dicts with path, copies, mean_seconds and bytes (the largest size), slowest first.
+        """
+        query = ("SELECT runs.project_name, files.path, COUNT(*) AS copies, AVG(files.seconds) AS mean_seconds, "
+                 "MAX(files.bytes) AS bytes FROM files JOIN runs ON runs.id = files.run_id")
+        params = []
+        if project_root is not None:
+            query += " WHERE runs.project_root = ?"
+            params.append(str(project_root))
+        query += " GROUP BY runs.project_root, files.path ORDER BY mean_seconds DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._connection.execute(query, params).fetchall()]
+
+    def trends(self, project_root: Optional[Path] = None, limit: int = 14) -> list[dict]:
+        """
+        Successful syncs summarized per day, so growth in size or time stands out.
+
+        :param project_root: A pathlib.Path - only include this project. Defaults to None (every project).
+        :param limit: An int - how many days to return. Defaults to 14.
+        :return: A list of dicts with day, syncs, mean_seconds and mean_bytes, newest first.
+        """
+        query = ("SELECT substr(started_at, 1, 10) AS day, COUNT(*) AS syncs, AVG(seconds) AS mean_seconds, "
+                 "AVG(bytes) AS mean_bytes FROM runs WHERE outcome = 'success'")
+        params = []
+        if project_root is not None:
+            query += " AND project_root = ?"
+            params.append(str(project_root))
+        query += " GROUP BY day ORDER BY day DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._connection.execute(query, params).fetchall()]
+
+    def format_report(self, project_root: Optional[Path] = None, limit: int = 10) -> str:
+        """
+        A plain-text report of recent syncs, daily trends and the slowest files.
+
+        :param project_root: A pathlib.Path - only include this project. Defaults to None (every project).
+        :param limit: An int - how many rows to show in each section. Defaults to 10.
+        :return: A str.
+        """
+        lines = ["Recent syncs:"]
+        runs = self.runs(project_root, limit)
+        for run in runs:
+            phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in run["phases"].items())
+            lines.append(f"  {run['started_at']}  {run['project_name']} -> {run['device']}  {run['outcome']}  "
+                         f"{run['seconds']:.2f}s  {run['files_copied']} copied, {run['files_skipped']} skipped, "
+                         f"{run['files_deleted']} deleted, {run['bytes'] / 1024:.1f} kB  ({phases})")
+            if run["board"]:
+                lines.append(f"      {run['board']}")
+            if run["error"]:
+                lines.append(f"      {run['error']}")
+        if not runs:
+            lines.append("  No syncs recorded yet")
+        lines += ["", "Daily trends (successful syncs):"]
+        for day in self.trends(project_root, limit):
+            lines.append(f"  {day['day']}  {day['syncs']} sync(s), mean {day['mean_seconds']:.2f}s, "
+                         f"mean {day['mean_bytes'] / 1024:.1f} kB copied")
+        lines += ["", "Slowest files:"]
+        for file in self.slowest_files(project_root, limit):
+            lines.append(f"  {file['mean_seconds'] * 1000:8.1f} ms  {file['bytes'] / 1024:8.1f} kB  "
+                         f"{file['project_name']}: {file['path']} ({file['copies']} copies)")
+        return "\n".join(lines)
+
+
+def get_history() -> SyncHistory:
+    """
+    Get the shared sync history, opening it the first time.
+
+    :return: A SyncHistory.
+    """
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = SyncHistory(HISTORY_LOCATION)
+        return _history
+
+
+def load_synced_files(device: Path, board: str) -> Optional[dict[str, tuple[int, int, int]]]:
+    """
+    What the last syncs wrote to a device (see SyncHistory.synced_files), without creating the sync history if there
+    isn't one yet. A broken database is logged, never raised.
+
+    :param device: A pathlib.Path to the device.
+    :param board: A str - the device's read_board_info.
+    :return: A dict like SyncHistory.synced_files returns, or None if there is no history to read.
+    """
+    if not HISTORY_LOCATION.exists():
+        return None
+    try:
+        return get_history().synced_files(device, board)
+    except sqlite3.Error:
+        logger.exception("Could not read the synced files from the sync history!")
+        return None
@@ -0,0 +1,269 @@
+"""
+A module that works out, file by file, whether a project's synced files match what is on the device - the same rule
+sync_project uses to decide what to copy.
+
+-----------
+
+Classes list:
+
+- DirectoryIndex.__init__(self)
+- SyncStatus.__init__(self, synced: tuple[str, ...], device_connected: bool, sync_filter: SyncFilter = None)
+
+-----------
+
+Functions list:
+
+- compute_sync_status(config: ProjectConfig, device: Path = None, project_index: ProjectIndex = None) -> SyncStatus
+
+"""
+
+from pathlib import Path
+from threading import Lock
+from typing import Iterator, Optional
+import os
+from project_tools.project_config import ProjectConfig
+from project_tools.project_index import ProjectIndex
+from project_tools.sync_filter import SyncFilter
+from project_tools import drives, project, sync_history, tracing
+from project_tools.create_logger import create_logger
+import logging
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+IN_SYNC = "in sync"
+MODIFIED = "modified"
+NEW = "new"
+DEVICE_ONLY = "device only"
+NOT_SYNCED = "not synced"
+EXCLUDED = "excluded"
+UNKNOWN = "unknown"
+
+# Statuses that mean the next sync will change something on the device
+OUT_OF_DATE = (MODIFIED, NEW, DEVICE_ONLY)
+
+
+class DirectoryIndex:
+    """
+    Caches directory listings, re-reading a directory only when its modification time changes (which happens when
+    something in it is added, removed or renamed). File sizes and times are always read fresh.
+    """
+    def __init__(self):
+        self._listings = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def list(self, directory: Path) -> dict[str, bool]:
+        """
+        List a directory.
+
+        :param directory: A pathlib.Path to the directory.
+        :return: A dict of entry names to whether they are directories, or an empty dict if it can't be read.
+        """
+        key = str(directory)
+        try:
+            mtime_ns = os.stat(key).st_mtime_ns
+        except OSError:
+            return {}
+        with self._lock:
+            cached = self._listings.get(key)
+            if cached is not None and cached[0] == mtime_ns:
+                self.hits += 1
+                return cached[1]
+        entries = {}
+        try:
+            with os.scandir(key) as iterator:
+                for entry in iterator:
+                    try:
+                        entries[entry.name] = entry.is_dir()
+                    except OSError:
+                        continue
+        except OSError:
+            return {}
+        with self._lock:
+            self.misses += 1
+            self._listings[key] = (mtime_ns, entries)
+        return entries
+
+    def walk_files(self, directory: Path, prefix: str = "") -> Iterator[tuple[str, Path]]:
+        """
+        Every file under a directory.
+
+        :param directory: A pathlib.Path to the directory.
+        :param prefix: A str - put in front of every relative path. Defaults to "".
+        :return: An iterator of (relative path with forward slashes, absolute pathlib.Path).
+        """
+        for name, is_dir in self.list(directory).items():
+            relative_path = prefix + name
+            if is_dir:
+                yield from self.walk_files(directory / name, relative_path + "/")
+            else:
+                yield relative_path, directory / name
+
+
+def _stat(path: Path) -> Optional[os.stat_result]:
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+class SyncStatus:
+    """
+    The sync status of every file under the project's synced files and directories, plus counts per directory.
+    """
+    __slots__ = ("synced", "device_connected", "sync_filter", "files", "directories")
+
+    def __init__(self, synced: tuple[str, ...], device_connected: bool, sync_filter: SyncFilter = None):
+        """
+        :param synced: A tuple of the project's files_to_sync.
+        :param device_connected: A bool - whether the device could be compared against.
+        :param sync_filter: The project's SyncFilter, or None if it leaves nothing out. Defaults to None.
+        """
+        self.synced = synced
+        self.device_connected = device_connected
+        self.sync_filter = sync_filter
+        # Relative path (with forward slashes) -> status
+        self.files = {}
+        # Relative path of a directory ("" for the project root) -> {status: count}
+        self.directories = {}
+
+    def add(self, relative_path: str, status: str) -> None:
+        self.files[relative_path] = status
+        parent = relative_path
+        while True:
+            parent = parent.rpartition("/")[0]
+            counts = self.directories.setdefault(parent, {})
+            counts[status] = counts.get(status, 0) + 1
+            if not parent:
+                break
+
+    def is_synced(self, relative_path: str) -> bool:
+        """
+        Whether a path is (or is inside) one of the project's files_to_sync.
+
+        :param relative_path: A str - the path relative to the project root, with forward slashes.
+        :return: A bool.
+        """
+        return any(relative_path == item or relative_path.startswith(item + "/") for item in self.synced)
+
+    def is_excluded(self, relative_path: str, is_dir: bool = False) -> bool:
+        """
+        Whether a path inside one of the project's files_to_sync is left out by the project's patterns.
+
+        :param relative_path: A str - the path relative to the project root, with forward slashes.
+        :param is_dir: A bool - whether it is a directory. Defaults to False.
+        :return: A bool.
+        """
+        if self.sync_filter is None:
+            return False
+        # Only the innermost item counts - an item is synced even if it is inside a left out directory
+        items = [item for item in self.synced if relative_path == item or relative_path.startswith(item + "/")]
+        if not items:
+            return False
+        item = max(items, key=len)
+        return item != relative_path and self.sync_filter.excludes_path(relative_path, is_dir, item)
+
+    def status(self, relative_path: str) -> str:
+        """
+        The status of a file.
+
+        :param relative_path: A str - the path relative to the project root, with forward slashes.
+        :return: A str - one of the status constants.
+        """
+        status = self.files.get(relative_path)
+        if status is not None:
+            return status
+        if not self.is_synced(relative_path):
+            return NOT_SYNCED
+        return EXCLUDED if self.is_excluded(relative_path) else UNKNOWN
+
+    def directory_summary(self, relative_path: str) -> str:
+        """
+        A short description of a directory's status, like "3 modified, 1 new".
+
+        :param relative_path: A str - the directory relative to the project root ("" for the root).
+        :return: A str.
+        """
+        counts = self.directories.get(relative_path)
+        if not counts and self.is_excluded(relative_path, True):
+            return EXCLUDED
+        if not counts:
+            return "" if self.is_synced(relative_path) or not relative_path else NOT_SYNCED
+        out_of_date = [f"{counts[status]} {status}" for status in OUT_OF_DATE if status in counts]
+        if out_of_date:
+            return ", ".join(out_of_date)
+        return IN_SYNC if IN_SYNC in counts else ", ".join(f"{count} {status}" for status, count in counts.items())
+
+    def device_only_children(self, relative_path: str) -> dict[str, bool]:
+        """
+        Things in a directory that are only on the device, so a tree view can show them next to the project's files.
+
+        :param relative_path: A str - the directory relative to the project root ("" for the root).
+        :return: A dict of names to whether they are directories.
+        """
+        prefix = relative_path + "/" if relative_path else ""
+        children = {}
+        for path, status in self.files.items():
+            if status == DEVICE_ONLY and path.startswith(prefix):
+                name, _, rest = path[len(prefix):].partition("/")
+                children[name] = children.get(name, False) or bool(rest)
+        return children
+
+
+@tracing.traced("compute_sync_status")
+def compute_sync_status(config: ProjectConfig, device: Path = None, project_index: ProjectIndex = None) -> SyncStatus:
+    """
+    Compare a project's synced files with the device. Only the files_to_sync are walked, so big directories that
+    aren't synced (like .git) cost nothing, and files the project's patterns leave out are skipped on both sides.
+    The device is always listed fresh - FAT and Windows don't reliably update a directory's modification time, so a
+    listing cached by it could miss files added to the device since.
+
+    :param config: The project's ProjectConfig.
+    :param device: A pathlib.Path - the device to compare against. Defaults to the project's sync_location.
+    :param project_index: An up to date ProjectIndex of the project, to read the project's side from. Defaults to
+     None, or if it is of another project (or was made with other patterns), a new one.
+    :return: A SyncStatus.
+    """
+    device_index = DirectoryIndex()
+    device = config.sync_location if device is None else device
+    device_connected = device is not None and device.is_dir()
+    mtime_tolerance_ns = drives.mtime_tolerance_ns(device) if device_connected else 0
+    synced = None
+    if mtime_tolerance_ns:
+        synced = sync_history.load_synced_files(device, sync_history.read_board_info(device))
+    root = config.project_root
+    sync_filter = SyncFilter.for_project(config)
+    result = SyncStatus(config.files_to_sync, device_connected, sync_filter)
+    if project_index is None or not project_index.matches(root, config.files_to_sync, sync_filter):
+        project_index = ProjectIndex(root, config.files_to_sync, sync_filter)
+        project_index.scan()
+    # Items inside other items are compared as part of the outer one
+    for item in project_index.roots:
+        source = root / item
+        seen = set()
+        project_files = project_index.walk(item)
+        for relative_path, size, mtime_ns in project_files:
+            seen.add(relative_path)
+            if not device_connected:
+                result.add(relative_path, UNKNOWN)
+                continue
+            dest_stat = _stat(device / relative_path)
+            if dest_stat is None:
+                result.add(relative_path, NEW)
+            elif project.device_copy_matches(root / relative_path, size, mtime_ns, device / relative_path, dest_stat,
+                                             mtime_tolerance_ns, None if synced is None else synced.get(relative_path)):
+                result.add(relative_path, IN_SYNC)
+            else:
+                result.add(relative_path, MODIFIED)
+        if device_connected and source.is_dir():
+            for relative_path, _ in device_index.walk_files(device / item, item + "/"):
+                if relative_path in seen:
+                    continue
+                # Syncs leave these alone on the device
+                if result.is_excluded(relative_path):
+                    continue
+                result.add(relative_path, DEVICE_ONLY)
+    logger.debug(f"Computed the sync status of {len(result.files)} file(s) "
+                 f"({device_index.misses} device directory listing(s))")
+    return result
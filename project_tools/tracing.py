@@ -0,0 +1,192 @@
+"""
+A module for tracing where time goes, with nestable spans that can be exported as Chrome trace-event JSON (open the
+file in chrome://tracing or https://ui.perfetto.dev). Tracing is off by default, and then a span costs a single
+function call that returns a shared do-nothing object.
+
+    from project_tools import tracing
+
+    with tracing.span("sync_project", files=12):
+        ...
+
+-----------
+
+Classes list:
+
+- Span.__init__(self, name: str, category: str, args: dict)
+
+-----------
+
+Functions list:
+
+- span(name: str, category: str = "cpypm", **args) -> Union[Span, _NullSpan]
+- traced(name: str = None, category: str = "cpypm") -> Callable
+- enable(directory: Path = TRACE_DIRECTORY) -> Path
+- is_enabled() -> bool
+- export_chrome_trace(path: Path) -> Path
+
+"""
+
+from pathlib import Path
+from datetime import datetime
+from functools import wraps
+from time import perf_counter_ns
+from typing import Callable, Union
+import atexit
+import json
+import os
+import threading
+from project_tools.create_logger import create_logger
+import logging
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+TRACE_DIRECTORY = Path.cwd() / "traces"
+
+_enabled = False
+_session_path = None
+_events = []
+_thread_names = {}
+_origin_ns = perf_counter_ns()
+
+
+class _NullSpan:
+    """
+    What span() returns while tracing is off.
+    """
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *_) -> None:
+        return None
+
+    def set(self, **args) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """
+    A timed region. Use it as a context manager - the event is recorded when it exits.
+    """
+    __slots__ = ("name", "category", "args", "start_ns")
+
+    def __init__(self, name: str, category: str, args: dict):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start_ns = 0
+
+    def __enter__(self) -> "Span":
+        self.start_ns = perf_counter_ns()
+        return self
+
+    def __exit__(self, err_type=None, err_value=None, err_traceback=None) -> None:
+        end_ns = perf_counter_ns()
+        thread = threading.current_thread()
+        _thread_names.setdefault(thread.ident, thread.name)
+        if err_type is not None:
+            self.args["error"] = err_type.__name__
+        # list.append is atomic, so spans can end on any thread without a lock
+        _events.append({
+            "name": self.name,
+            "cat": self.category,
+            "ph": "X",
+            "ts": (self.start_ns - _origin_ns) / 1000,
+            "dur": (end_ns - self.start_ns) / 1000,
+            "pid": os.getpid(),
+            "tid": thread.ident,
+            "args": self.args
+        })
+
+    def set(self, **args) -> None:
+        """
+        Attach more information to the span, for things only known once it is running.
+
+        :param args: Names and values to show in the trace viewer.
+        :return: None.
+        """
+        self.args.update(args)
+
+
+def span(name: str, category: str = "cpypm", **args) -> Union[Span, _NullSpan]:
+    """
+    Time a region of code. Spans nest naturally - a span started inside another one shows up below it.
+
+    :param name: A str - what to call the span in the trace viewer.
+    :param category: A str - the trace-event category. Defaults to "cpypm".
+    :param args: Names and values to show in the trace viewer.
+    :return: A context manager.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, category, args)
+
+
+def traced(name: str = None, category: str = "cpypm") -> Callable:
+    """
+    A decorator that wraps every call of a function in a span.
+
+    :param name: A str - what to call the span. Defaults to the function's qualified name.
+    :param category: A str - the trace-event category. Defaults to "cpypm".
+    :return: A decorator.
+    """
+    def decorator(function: Callable) -> Callable:
+        span_name = name or function.__qualname__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with Span(span_name, category, {}):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def is_enabled() -> bool:
+    """
+    Whether spans are being recorded.
+
+    :return: A bool.
+    """
+    return _enabled
+
+
+def export_chrome_trace(path: Path) -> Path:
+    """
+    Write everything recorded so far as Chrome trace-event JSON.
+
+    :param path: A pathlib.Path - where to write the trace.
+    :return: The pathlib.Path written to.
+    """
+    events = list(_events)
+    metadata = [
+        {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": ident, "args": {"name": thread_name}}
+        for ident, thread_name in list(_thread_names.items())
+    ]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"traceEvents": metadata + events, "displayTimeUnit": "ms"}))
+    logger.info(f"Wrote {len(events)} trace event(s) to {repr(path)}")
+    return path
+
+
+def enable(directory: Path = TRACE_DIRECTORY) -> Path:
+    """
+    Start recording spans. The trace for this session is written to its own file when the program exits.
+
+    :param directory: A pathlib.Path - the directory to put the trace in. Defaults to ./traces.
+    :return: The pathlib.Path the trace will be written to.
+    """
+    global _enabled, _session_path
+    if not _enabled:
+        _enabled = True
+        _session_path = directory / f"trace-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.json"
+        atexit.register(export_chrome_trace, _session_path)
+        logger.info(f"Tracing enabled, the trace will be written to {repr(_session_path)} on exit")
+    return _session_path
@@ -0,0 +1,324 @@
+"""
+A module that handles workspaces - a file listing many CircuitPython projects and the devices they get synced to.
+
+-----------
+
+Classes list:
+
+- WorkspaceProject.__init__(self, cpypm_config_path: Path, device: Path = None)
+- ProjectSyncResult.__init__(self, project: WorkspaceProject, status: str, reason: str = "", project_name: str = "",
+                             device: Path = None, seconds: float = 0, error: str = None, fingerprint: str = None)
+- WorkspaceReport.__init__(self, results: list[ProjectSyncResult], seconds: float)
+- Workspace.__init__(self, path: Path, projects: list[WorkspaceProject] = None, state: dict = None)
+
+-----------
+
+Functions list:
+
+- source_fingerprint(config: ProjectConfig) -> str
+- sync_workspace(workspace: Workspace, force: bool = False, max_workers: int = None) -> WorkspaceReport
+
+"""
+
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from time import perf_counter
+import hashlib
+import json
+import os
+from project_tools import project
+from project_tools.project_config import ProjectConfig
+from project_tools.project_model import ProjectModel
+from project_tools.create_logger import create_logger
+import logging
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+WORKSPACE_SCHEMA_VERSION = 1
+
+
+def source_fingerprint(config: ProjectConfig) -> str:
+    """
+    A cheap fingerprint of everything a project would sync, built from the path, size and modification time of every
+    file (no file contents are read). It changes whenever a file is added, removed or modified.
+
+    :param config: A ProjectConfig - the project.
+    :return: A str - a hex digest.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for item in sorted(config.files_to_sync):
+        root = config.project_root / item
+        if root.is_file():
+            stat = root.stat()
+            digest.update(f"{item}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+            continue
+        for dir_path, dir_names, file_names in os.walk(root):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                path = Path(dir_path) / file_name
+                stat = path.stat()
+                relative = path.relative_to(config.project_root).as_posix()
+                digest.update(f"{relative}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+class WorkspaceProject:
+    """
+    A project in a workspace. If device is None, the project's own sync_location is used.
+    """
+    __slots__ = ("cpypm_config_path", "device")
+
+    def __init__(self, cpypm_config_path: Path, device: Path = None):
+        self.cpypm_config_path = Path(cpypm_config_path)
+        self.device = None if device is None else Path(device)
+
+    def __repr__(self) -> str:
+        return f"WorkspaceProject({repr(self.cpypm_config_path)}, device={repr(self.device)})"
+
+
+class ProjectSyncResult:
+    """
+    What happened to one project in a batch sync. status is one of "synced", "skipped" or "failed".
+    """
+    __slots__ = ("project", "status", "reason", "project_name", "device", "seconds", "error", "fingerprint")
+
+    def __init__(self, project: WorkspaceProject, status: str, reason: str = "", project_name: str = "",
+                 device: Path = None, seconds: float = 0, error: str = None, fingerprint: str = None):
+        self.project = project
+        self.status = status
+        self.reason = reason
+        self.project_name = project_name
+        self.device = device
+        self.seconds = seconds
+        self.error = error
+        self.fingerprint = fingerprint
+
+    def to_dict(self) -> dict:
+        return {
+            "project": str(self.project.cpypm_config_path),
+            "project_name": self.project_name,
+            "device": None if self.device is None else str(self.device),
+            "status": self.status,
+            "reason": self.reason,
+            "seconds": round(self.seconds, 4),
+            "error": self.error
+        }
+
+
+class WorkspaceReport:
+    """
+    The consolidated result of a batch sync.
+    """
+    def __init__(self, results: list[ProjectSyncResult], seconds: float):
+        self.results = results
+        self.seconds = seconds
+
+    @property
+    def succeeded(self) -> bool:
+        return all(result.status != "failed" for result in self.results)
+
+    def count(self, status: str) -> int:
+        return sum(1 for result in self.results if result.status == status)
+
+    def to_dict(self) -> dict:
+        return {
+            "seconds": round(self.seconds, 4),
+            "synced": self.count("synced"),
+            "skipped": self.count("skipped"),
+            "failed": self.count("failed"),
+            "projects": [result.to_dict() for result in self.results]
+        }
+
+    def format(self) -> str:
+        """
+        A plain-text table of the report, one line per project.
+
+        :return: A str.
+        """
+        lines = []
+        for result in self.results:
+            name = result.project_name or result.project.cpypm_config_path.parent.name
+            line = f"{result.status.upper():<8} {name:<24} {result.seconds:>8.2f}s  " \
+                   f"{result.device if result.device is not None else '(no device)'}"
+            if result.reason:
+                line += f" - {result.reason}"
+            lines.append(line)
+        lines.append(f"{self.count('synced')} synced, {self.count('skipped')} skipped, {self.count('failed')} failed "
+                     f"in {self.seconds:.2f}s")
+        return "\n".join(lines)
+
+
+class Workspace:
+    """
+    A list of projects and their target devices, saved as JSON (usually in a .cpypmworkspace file). The workspace
+    also remembers the source fingerprint of every project at its last successful sync so unchanged projects can
+    be skipped.
+    """
+    def __init__(self, path: Path, projects: list[WorkspaceProject] = None, state: dict = None):
+        self.path = Path(path)
+        self.projects = [] if projects is None else list(projects)
+        self.state = {} if state is None else dict(state)
+
+    @classmethod
+    def load(cls, path: Path) -> "Workspace":
+        """
+        Load a workspace file.
+
+        :param path: A pathlib.Path to the workspace file.
+        :raise ValueError: Raises ValueError if the file isn't a valid workspace.
+        :return: A Workspace.
+        """
+        data = json.loads(path.read_text())
+        if not isinstance(data, dict) or not isinstance(data.get("projects"), list):
+            raise ValueError(f"{repr(path)} is not a valid workspace file!")
+        projects = []
+        for entry in data["projects"]:
+            if isinstance(entry, str):
+                entry = {"path": entry}
+            if not isinstance(entry, dict) or not isinstance(entry.get("path"), str):
+                raise ValueError(f"Invalid project entry {repr(entry)} in {repr(path)}")
+            # Relative project paths are relative to the workspace file
+            projects.append(WorkspaceProject(path.parent / entry["path"], entry.get("device")))
+        return cls(path, projects, data.get("state", {}))
+
+    def save(self) -> None:
+        """
+        Write the workspace file.
+
+        :return: None.
+        """
+        data = {
+            "schema_version": WORKSPACE_SCHEMA_VERSION,
+            "projects": [
+                {"path": str(p.cpypm_config_path), "device": None if p.device is None else str(p.device)}
+                for p in self.projects
+            ],
+            "state": self.state
+        }
+        self.path.write_text(json.dumps(data, indent=4))
+
+    def add_project(self, cpypm_config_path: Path, device: Path = None) -> None:
+        """
+        Add a project, or change its device if it is already in the workspace.
+
+        :param cpypm_config_path: A pathlib.Path to the project's .cpypmconfig file.
+        :param device: A pathlib.Path to the device to sync to, or None to use the project's sync_location.
+        :return: None.
+        """
+        for p in self.projects:
+            if p.cpypm_config_path == Path(cpypm_config_path):
+                p.device = None if device is None else Path(device)
+                return
+        self.projects.append(WorkspaceProject(cpypm_config_path, device))
+
+    def remove_project(self, cpypm_config_path: Path) -> None:
+        """
+        Remove a project from the workspace.
+
+        :param cpypm_config_path: A pathlib.Path to the project's .cpypmconfig file.
+        :return: None.
+        """
+        self.projects = [p for p in self.projects if p.cpypm_config_path != Path(cpypm_config_path)]
+        self.state.pop(str(cpypm_config_path), None)
+
+
+def _plan_project(workspace: Workspace, ws_project: WorkspaceProject, force: bool) -> tuple:
+    """
+    Decide whether one project needs syncing.
+
+    :return: A tuple of (ProjectModel or None, device or None, fingerprint or None, ProjectSyncResult if it should be
+     skipped or None if it should be synced).
+    """
+    try:
+        model = ProjectModel(ws_project.cpypm_config_path)
+        config = model.config
+    except (OSError, ValueError) as error:
+        return None, None, None, ProjectSyncResult(ws_project, "failed", "could not load .cpypmconfig",
+                                                   error=str(error))
+    if config.project_root is None:
+        return model, None, None, ProjectSyncResult(ws_project, "failed", "project_root is not set",
+                                                    config.project_name)
+    device = ws_project.device if ws_project.device is not None else config.sync_location
+    if device is None:
+        return model, None, None, ProjectSyncResult(ws_project, "skipped", "no device set", config.project_name)
+    if not device.exists():
+        return model, device, None, ProjectSyncResult(ws_project, "skipped", "device not connected",
+                                                      config.project_name, device)
+    try:
+        fingerprint = source_fingerprint(config)
+    except OSError as error:
+        return model, device, None, ProjectSyncResult(ws_project, "failed", "could not read sources",
+                                                      config.project_name, device, error=str(error))
+    last = workspace.state.get(str(ws_project.cpypm_config_path), {})
+    if not force and last.get("fingerprint") == fingerprint and last.get("device") == str(device):
+        return model, device, fingerprint, ProjectSyncResult(ws_project, "skipped", "sources unchanged",
+                                                             config.project_name, device)
+    return model, device, fingerprint, None
+
+
+def _sync_device_queue(queue: list) -> list[ProjectSyncResult]:
+    """
+    Sync projects that share a device one after another.
+
+    :param queue: A list of (WorkspaceProject, ProjectModel, device, fingerprint) tuples.
+    :return: A list of ProjectSyncResult.
+    """
+    results = []
+    for ws_project, model, device, fingerprint in queue:
+        start = perf_counter()
+        try:
+            project.sync_project(model, sync_location=device)
+        except Exception as error:
+            logger.exception(f"Failed to sync {repr(ws_project.cpypm_config_path)}")
+            result = ProjectSyncResult(ws_project, "failed", "sync failed", model.project_name, device,
+                                       perf_counter() - start, str(error))
+        else:
+            result = ProjectSyncResult(ws_project, "synced", "", model.project_name, device, perf_counter() - start,
+                                       fingerprint=fingerprint)
+        results.append(result)
+    return results
+
+
+def sync_workspace(workspace: Workspace, force: bool = False, max_workers: int = None) -> WorkspaceReport:
+    """
+    Sync every project in a workspace whose sources changed since its last successful sync. Projects on different
+    devices are synced concurrently, projects that share a device are synced one after another. The workspace's state
+    is updated and saved afterwards.
+
+    :param workspace: The Workspace to sync.
+    :param force: A bool - sync every project even if its sources haven't changed. Defaults to False.
+    :param max_workers: An int - how many devices to write to at once. Defaults to one per device.
+    :return: A WorkspaceReport.
+    """
+    start = perf_counter()
+    results: dict[int, ProjectSyncResult] = {}
+    queues: dict[Path, list] = {}
+    order: dict[int, int] = {}
+    for index, ws_project in enumerate(workspace.projects):
+        model, device, fingerprint, skipped = _plan_project(workspace, ws_project, force)
+        if skipped is not None:
+            logger.info(f"Skipping {repr(ws_project.cpypm_config_path)}: {skipped.reason}")
+            results[index] = skipped
+            continue
+        key = device.absolute().resolve()
+        queues.setdefault(key, []).append((ws_project, model, device, fingerprint))
+        order[id(ws_project)] = index
+    logger.info(f"Syncing {sum(len(q) for q in queues.values())} project(s) to {len(queues)} device(s)")
+    if queues:
+        with ThreadPoolExecutor(max_workers=max_workers or len(queues),
+                                thread_name_prefix="workspace-sync") as executor:
+            for device_results in executor.map(_sync_device_queue, queues.values()):
+                for result in device_results:
+                    results[order[id(result.project)]] = result
+                    if result.status == "synced":
+                        workspace.state[str(result.project.cpypm_config_path)] = {
+                            "fingerprint": result.fingerprint,
+                            "device": str(result.device),
+                            "synced_at": datetime.now().isoformat(timespec="seconds")
+                        }
+    workspace.save()
+    report = WorkspaceReport([results[index] for index in sorted(results)], perf_counter() - start)
+    logger.info(f"Workspace sync finished: {report.count('synced')} synced, {report.count('skipped')} skipped, "
+                f"{report.count('failed')} failed in {report.seconds:.2f}s")
+    return report